@@ -0,0 +1,253 @@
+"""
+Ключи подписи JWT и быстрая проверка токенов.
+
+По умолчанию токены подписываются общим секретом SECRET_KEY (ALGORITHM, обычно HS256).
+Если задан JWT_KEYS_DIR, используются асимметричные ключи: каталог содержит файлы <kid>.pem -
+закрытые ключи Ed25519 (EdDSA) или EC P-256 (ES256) либо только открытые ключи. Подписывает
+ключ JWT_ACTIVE_KID, его kid пишется в заголовок токена; проверяются токены любого ключа из каталога.
+Другим сервисам (воркерам, шлюзу) достаточно открытых ключей - каталога public/, который создаёт
+generate, или GET /users/jwks.json, - общий секрет им не нужен.
+
+Ротация: новый ключ кладётся в каталог всех сервисов, затем JWT_ACTIVE_KID переключается на него;
+старый ключ удаляется, когда истекут подписанные им refresh-токены. Токен с незнакомым kid
+перечитывает каталог не чаще JWT_KEYS_RELOAD_INTERVAL.
+
+Ключи загружаются один раз и держатся уже разобранными объектами cryptography. Недавно проверенные
+токены запоминаются в LRU (JWT_VERIFY_CACHE_SIZE) по полной строке токена вместе с подписью,
+поэтому повторная проверка "горячего" токена до его exp обходится без криптографии.
+
+Генерация ключа:
+    python -m app.auth.keys generate --kid 2026-10 --alg EdDSA --dir keys/
+"""
+import argparse
+import base64
+import sys
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+
+from app.utils import (ALGORITHM, JWT_ACTIVE_KID, JWT_KEYS_DIR, JWT_KEYS_RELOAD_INTERVAL, JWT_VERIFY_CACHE_SIZE,
+                       SECRET_KEY)
+
+ALGORITHMS = ("EdDSA", "ES256")
+
+# Опции разбираются один раз, а не при каждом decode; exp обязателен для всех токенов
+_jwt = jwt.PyJWT(options={"require": ["exp"]})
+
+
+@dataclass(frozen=True)
+class VerificationKey:
+    algorithm: str
+    key: object
+
+
+@dataclass(frozen=True)
+class KeySet:
+    """
+    Разобранные ключи: kid -> ключ проверки и ключ подписи активного kid.
+    В режиме общего секрета kid нет - единственный ключ лежит под None.
+    """
+    verification: dict[str | None, VerificationKey]
+    signing_kid: str | None
+    signing_key: object
+    signing_algorithm: str
+
+
+def _algorithm_for(key) -> str:
+    if isinstance(key, (ed25519.Ed25519PrivateKey, ed25519.Ed25519PublicKey)):
+        return "EdDSA"
+    if isinstance(key, (ec.EllipticCurvePrivateKey, ec.EllipticCurvePublicKey)) and key.curve.name == "secp256r1":
+        return "ES256"
+    raise ValueError(f"Unsupported JWT key type {type(key).__name__}: expected Ed25519 or EC P-256")
+
+
+def load_key_set(keys_dir: str | None = JWT_KEYS_DIR, active_kid: str | None = JWT_ACTIVE_KID) -> KeySet:
+    """
+    Описание: Читает ключи из каталога keys_dir (файлы <kid>.pem) или, если каталог не задан,
+              строит набор из общего секрета SECRET_KEY.
+    Аргументы:
+        keys_dir: каталог с PEM-ключами
+        active_kid: kid ключа подписи; None - процесс только проверяет токены
+    Возвращает:
+        KeySet: разобранные ключи
+    Исключения:
+        ValueError: неподдерживаемый тип ключа, активный ключ не найден или не закрытый
+    """
+    if not keys_dir:
+        return KeySet({None: VerificationKey(ALGORITHM, SECRET_KEY)}, None, SECRET_KEY, ALGORITHM)
+
+    verification, private = {}, {}
+    for path in sorted(Path(keys_dir).glob("*.pem")):
+        data = path.read_bytes()
+        if b"PRIVATE KEY" in data:
+            key = serialization.load_pem_private_key(data, password=None)
+            private[path.stem] = key
+            public = key.public_key()
+        else:
+            public = serialization.load_pem_public_key(data)
+        verification[path.stem] = VerificationKey(_algorithm_for(public), public)
+
+    if active_kid is None:
+        return KeySet(verification, None, None, "")
+    if active_kid not in private:
+        raise ValueError(f"JWT_ACTIVE_KID {active_kid!r}: no private key {active_kid}.pem in {keys_dir}")
+    return KeySet(verification, active_kid, private[active_kid], verification[active_kid].algorithm)
+
+
+_key_set: KeySet | None = None
+_reloaded_at = 0.0
+# Полная строка токена -> (payload, exp); совпадение строки означает совпадение подписи
+_verified: OrderedDict[str, tuple[dict, float]] = OrderedDict()
+# Сегмент заголовка -> ключ проверки; заголовки задаёт клиент, поэтому размер ограничен
+_keys_by_header: dict[str, VerificationKey] = {}
+_HEADER_CACHE_SIZE = 64
+
+
+def get_key_set() -> KeySet:
+    """
+    Описание: Набор ключей процесса, загружается при первом обращении.
+    """
+    global _key_set, _reloaded_at
+    if _key_set is None:
+        _key_set = load_key_set()
+        _reloaded_at = time.monotonic()
+    return _key_set
+
+
+def reload_key_set() -> KeySet:
+    """
+    Описание: Перечитывает каталог ключей и сбрасывает кэш проверенных токенов -
+              токены удалённого ключа не должны проходить по кэшу.
+    """
+    global _key_set, _reloaded_at
+    _key_set = load_key_set()
+    _reloaded_at = time.monotonic()
+    _verified.clear()
+    _keys_by_header.clear()
+    return _key_set
+
+
+def encode_token(payload: dict) -> str:
+    """
+    Описание: Подписывает payload активным ключом; kid попадает в заголовок токена.
+    Исключения:
+        RuntimeError: у процесса нет ключа подписи (задан только каталог открытых ключей)
+    """
+    key_set = get_key_set()
+    if key_set.signing_key is None:
+        raise RuntimeError("JWT_ACTIVE_KID is not set: this process can only verify tokens")
+    headers = {"kid": key_set.signing_kid} if key_set.signing_kid else None
+    return _jwt.encode(payload, key_set.signing_key, algorithm=key_set.signing_algorithm, headers=headers)
+
+
+def _verification_key(token: str) -> VerificationKey:
+    # Заголовок у всех токенов одного ключа одинаков: ключ ищется по сырому сегменту без base64 и JSON
+    header = token.partition(".")[0]
+    key = _keys_by_header.get(header)
+    if key is not None:
+        return key
+    kid = jwt.get_unverified_header(token).get("kid")
+    key = get_key_set().verification.get(kid)
+    if key is None and JWT_KEYS_DIR and time.monotonic() - _reloaded_at >= JWT_KEYS_RELOAD_INTERVAL:
+        # Токен подписан ключом, выпущенным после старта процесса
+        key = reload_key_set().verification.get(kid)
+    if key is None:
+        raise jwt.InvalidKeyError(f"Unknown signing key {kid!r}")
+    if len(_keys_by_header) < _HEADER_CACHE_SIZE:
+        _keys_by_header[header] = key
+    return key
+
+
+def decode_token(token: str, use_cache: bool = True) -> dict:
+    """
+    Описание: Проверяет подпись и срок действия токена и возвращает payload.
+              Токен, уже проверенный и ещё не истёкший, берётся из LRU без проверки подписи.
+    Аргументы:
+        token: JWT
+        use_cache: искать в кэше и класть в него (refresh-токены проверяются всегда)
+    Возвращает:
+        dict: payload токена (общий с кэшем - не изменять)
+    Исключения:
+        jwt.ExpiredSignatureError: срок действия истёк
+        jwt.PyJWTError: подпись неверна, ключ неизвестен или токен повреждён
+    """
+    if use_cache and JWT_VERIFY_CACHE_SIZE:
+        cached = _verified.get(token)
+        if cached is not None:
+            if cached[1] > time.time():
+                _verified.move_to_end(token)
+                return cached[0]
+            del _verified[token]
+
+    key = _verification_key(token)
+    payload = _jwt.decode(token, key.key, algorithms=[key.algorithm])
+
+    if use_cache and JWT_VERIFY_CACHE_SIZE:
+        _verified[token] = (payload, payload["exp"])
+        if len(_verified) > JWT_VERIFY_CACHE_SIZE:
+            _verified.popitem(last=False)
+    return payload
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def jwks() -> dict:
+    """
+    Описание: Открытые ключи в формате JWKS (RFC 7517) для проверки токенов другими сервисами.
+              В режиме общего секрета список пуст - секрет не публикуется.
+    """
+    keys = []
+    for kid, key in get_key_set().verification.items():
+        if kid is None:
+            continue
+        if key.algorithm == "EdDSA":
+            raw = key.key.public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw)
+            keys.append({"kty": "OKP", "crv": "Ed25519", "x": _b64(raw), "kid": kid, "alg": "EdDSA", "use": "sig"})
+        else:
+            numbers = key.key.public_numbers()
+            keys.append({"kty": "EC", "crv": "P-256", "x": _b64(numbers.x.to_bytes(32, "big")),
+                         "y": _b64(numbers.y.to_bytes(32, "big")), "kid": kid, "alg": "ES256", "use": "sig"})
+    return {"keys": keys}
+
+
+def generate_key(algorithm: str):
+    """
+    Описание: Новый закрытый ключ для алгоритма EdDSA (Ed25519) или ES256 (P-256).
+    """
+    return ed25519.Ed25519PrivateKey.generate() if algorithm == "EdDSA" else ec.generate_private_key(ec.SECP256R1())
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.auth.keys", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    generate = commands.add_parser("generate", help="создать ключ <dir>/<kid>.pem и открытый <dir>/public/<kid>.pem")
+    generate.add_argument("--kid", required=True)
+    generate.add_argument("--alg", choices=ALGORITHMS, default="EdDSA")
+    generate.add_argument("--dir", default=".", help="каталог для ключей")
+    args = parser.parse_args()
+
+    key = generate_key(args.alg)
+    directory = Path(args.dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    private_path = directory / f"{args.kid}.pem"
+    private_path.write_bytes(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                               serialization.NoEncryption()))
+    private_path.chmod(0o600)
+    # Открытый ключ - для JWT_KEYS_DIR сервисов, которые только проверяют токены
+    (directory / "public").mkdir(exist_ok=True)
+    (directory / "public" / f"{args.kid}.pem").write_bytes(key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo))
+    print(f"{private_path} ({args.alg})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""
+Конвейер входа по паролю.
+
+1. Экспоненциальная задержка по аккаунту: после LOGIN_FREE_FAILURES неудач за скользящее окно
+   LOGIN_FAILURE_WINDOW каждая следующая попытка ждёт LOGIN_BACKOFF_BASE * 2^n секунд
+   (не больше LOGIN_BACKOFF_MAX). Пока задержка не прошла, попытка отклоняется с 429
+   до запроса к базе и хеширования. Неудачи считаются по введённому email, в том числе
+   несуществующему, - иначе по задержке можно было бы отличить настоящие аккаунты.
+2. Ровно одна проверка Argon2 в пуле хеширования: для неизвестного email - против фиктивного хеша,
+   так что время ответа одинаково, а нагрузка на попытку ограничена.
+
+Счётчики живут в памяти процесса (у каждого воркера gunicorn свои), число отслеживаемых
+email ограничено LOGIN_TRACKED_ACCOUNTS.
+"""
+import time
+from collections import OrderedDict, deque
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.auth.password import verify_password_async
+from app.models.users import User as UserModel
+from app.utils import (LOGIN_BACKOFF_BASE, LOGIN_BACKOFF_MAX, LOGIN_FAILURE_WINDOW, LOGIN_FREE_FAILURES,
+                       LOGIN_TRACKED_ACCOUNTS)
+
+
+class LoginThrottled(Exception):
+    """Аккаунт в экспоненциальной задержке после неудачных попыток."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(retry_after)
+        self.retry_after = retry_after
+
+
+class FailureTracker:
+    """
+    Неудачные попытки входа по аккаунту в скользящем окне: email -> время неудач.
+    Отслеживается не больше max_accounts email, давно не встречавшиеся вытесняются.
+    """
+
+    def __init__(self, window: float = LOGIN_FAILURE_WINDOW, free_failures: int = LOGIN_FREE_FAILURES,
+                 base: float = LOGIN_BACKOFF_BASE, max_delay: float = LOGIN_BACKOFF_MAX,
+                 max_accounts: int = LOGIN_TRACKED_ACCOUNTS):
+        self.window = window
+        self.free_failures = free_failures
+        self.base = base
+        self.max_delay = max_delay
+        self.max_accounts = max_accounts
+        self._failures: OrderedDict[str, deque[float]] = OrderedDict()
+
+    def _recent(self, account: str, now: float) -> deque[float] | None:
+        failures = self._failures.get(account)
+        if failures is None:
+            return None
+        while failures and failures[0] <= now - self.window:
+            failures.popleft()
+        if not failures:
+            del self._failures[account]
+            return None
+        return failures
+
+    def retry_after(self, account: str) -> float:
+        """
+        Описание: Сколько секунд аккаунт ещё должен ждать; 0 - попытка разрешена.
+        """
+        now = time.monotonic()
+        failures = self._recent(account, now)
+        if failures is None or len(failures) < self.free_failures:
+            return 0.0
+        delay = min(self.base * 2 ** (len(failures) - self.free_failures), self.max_delay)
+        return max(0.0, failures[-1] + delay - now)
+
+    def record_failure(self, account: str) -> None:
+        now = time.monotonic()
+        failures = self._recent(account, now)
+        if failures is None:
+            failures = self._failures[account] = deque()
+            if len(self._failures) > self.max_accounts:
+                self._failures.popitem(last=False)
+        else:
+            self._failures.move_to_end(account)
+        failures.append(now)
+
+    def reset(self, account: str) -> None:
+        self._failures.pop(account, None)
+
+
+failures = FailureTracker()
+
+
+def _account_key(email: str) -> str:
+    return email.strip().lower()
+
+
+async def authenticate(db: AsyncSession, email: str, password: str) -> UserModel | None:
+    """
+    Описание: Проверяет email и пароль с задержкой по аккаунту и одной проверкой Argon2 на попытку.
+    Аргументы:
+        db: асинхронная сессия SQLAlchemy
+        email: введённый email
+        password: введённый пароль
+    Возвращает:
+        UserModel | None: пользователь или None, если email или пароль неверны
+    Исключения:
+        LoginThrottled: аккаунт в задержке после неудачных попыток
+        PasswordHashBusy: пул хеширования перегружен
+    """
+    account = _account_key(email)
+    retry_after = failures.retry_after(account)
+    if retry_after:
+        raise LoginThrottled(retry_after)
+
+    user = await db.scalar(select(UserModel).where(UserModel.email == email))
+    if not await verify_password_async(password, user.hashed_password if user else None):
+        failures.record_failure(account)
+        return None
+    failures.reset(account)
+    return user
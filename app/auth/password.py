@@ -1,14 +1,27 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from argon2 import PasswordHasher, exceptions
 from datetime import datetime,timedelta,timezone
-import jwt
 
-from app.utils import SECRET_KEY,ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, REFRESH_TOKEN_EXPIRE_DAYS
+from app.auth.keys import encode_token
+from app.utils import (ACCESS_TOKEN_EXPIRE_MINUTES, REFRESH_TOKEN_EXPIRE_DAYS, PASSWORD_HASH_WORKERS,
+                       PASSWORD_HASH_MAX_PENDING)
 
 
 
 # Создаём экземпляр PasswordHasher с настройками по умолчанию
 ph = PasswordHasher()
 
+# Argon2 занимает сотни миллисекунд CPU: хеширование идёт в отдельных потоках (cffi отпускает GIL),
+# а не в цикле событий, и не больше PASSWORD_HASH_MAX_PENDING операций на процесс одновременно
+_hash_pool = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="argon2")
+_pending = 0
+_dummy_hash: str | None = None
+
+
+class PasswordHashBusy(Exception):
+    """Очередь хеширования паролей заполнена - запрос нужно отклонить, а не ставить в очередь."""
+
 
 def  hash_password(password:str) -> str:
     """
@@ -64,7 +77,7 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     else:
         expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    encoded_jwt = encode_token(to_encode)
     return encoded_jwt
 
 
@@ -83,4 +96,50 @@ def create_refresh_token(data: dict, expires_delta: timedelta | None = None):
     else:
         expire = datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)  # дольше жизни
     to_encode.update({"exp": expire, "type": "refresh"})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
\ No newline at end of file
+    return encode_token(to_encode)
+
+
+async def _run_in_hash_pool(func, *args):
+    global _pending
+    if _pending >= PASSWORD_HASH_MAX_PENDING:
+        raise PasswordHashBusy()
+    _pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_pool, func, *args)
+    finally:
+        _pending -= 1
+
+
+async def hash_password_async(password: str) -> str:
+    """
+    Описание: hash_password в пуле хеширования, не блокируя цикл событий.
+    Исключения:
+        PasswordHashBusy: пул перегружен
+    """
+    return await _run_in_hash_pool(hash_password, password)
+
+
+async def warm_up_hash_pool() -> None:
+    """
+    Описание: Готовит фиктивный хеш при старте воркера, чтобы и первая попытка входа
+              с неизвестным email стоила ровно одну проверку Argon2.
+    """
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = await _run_in_hash_pool(hash_password, "dummy-password-for-unknown-users")
+
+
+async def verify_password_async(plain_password: str, hashed_password: str | None) -> bool:
+    """
+    Описание: verify_password в пуле хеширования. Без хеша (пользователь не найден) пароль
+              проверяется против фиктивного хеша с теми же параметрами Argon2 - время ответа
+              не выдаёт, существует ли аккаунт, - и результат всегда False.
+    Исключения:
+        PasswordHashBusy: пул перегружен
+    """
+    if hashed_password is not None:
+        return await _run_in_hash_pool(verify_password, plain_password, hashed_password)
+    await warm_up_hash_pool()
+    await _run_in_hash_pool(verify_password, plain_password, _dummy_hash)
+    return False
+
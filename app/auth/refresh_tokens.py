@@ -0,0 +1,209 @@
+"""
+Ротация refresh-токенов и отзыв семейств.
+
+Вход создаёт семейство (refresh_token_families) и refresh-токен с claims fam (ID семейства)
+и jti. POST /users/refresh-token принимает только текущий jti семейства и выдаёт новый;
+повторное предъявление старого jti значит, что токен украден или утёк, - семейство отзывается.
+Выход (POST /users/logout) тоже отзывает семейство.
+
+Access-токены несут тот же fam, и отзыв действует и на них. Чтобы не ходить в базу
+на каждом запросе, каждый воркер держит фильтр Блума отозванных семейств: промах фильтра
+(обычный случай) означает "не отозвано" без запроса, попадание подтверждается запросом.
+Фильтр догружается инкрементально раз в JWT_REVOCATION_SYNC_INTERVAL и пересобирается целиком
+раз в JWT_REVOCATION_REBUILD_INTERVAL, тогда же пачками удаляются истёкшие семейства.
+Отзыв в другом воркере начинает действовать не позже чем через JWT_REVOCATION_SYNC_INTERVAL.
+"""
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from loguru import logger
+from sqlalchemy import func, insert, select, text, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.database import async_session_maker
+from app.models import RefreshTokenFamily
+from app.utils import (JWT_REVOCATION_BLOOM_BITS, JWT_REVOCATION_REBUILD_INTERVAL, JWT_REVOCATION_SYNC_INTERVAL,
+                       REFRESH_TOKEN_EXPIRE_DAYS, REFRESH_TOKEN_SWEEP_BATCH)
+
+# Запас на транзакции, которые зафиксировались позже, чем прошла предыдущая подгрузка
+_SYNC_OVERLAP = timedelta(seconds=60)
+
+_DELETE_EXPIRED_SQL = text("""
+    WITH expired AS (
+        DELETE FROM refresh_token_families
+        WHERE family_id IN (
+            SELECT family_id FROM refresh_token_families
+            WHERE expires_at < now()
+            ORDER BY expires_at
+            LIMIT :batch_size
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING 1
+    )
+    SELECT count(*) FROM expired
+""")
+
+
+class BloomFilter:
+    """
+    Фильтр Блума по UUID. ID семейств случайны (uuid4), поэтому позиции битов
+    берутся прямо из 128 бит UUID двойным хешированием, без отдельной хеш-функции.
+    """
+
+    def __init__(self, bits: int = JWT_REVOCATION_BLOOM_BITS, hashes: int = 7):
+        self.bits = bits
+        self.hashes = hashes
+        self._array = bytearray((bits + 7) // 8)
+
+    def _positions(self, value: uuid.UUID):
+        h1, h2 = value.int & 0xFFFFFFFFFFFFFFFF, (value.int >> 64) | 1
+        return ((h1 + i * h2) % self.bits for i in range(self.hashes))
+
+    def add(self, value: uuid.UUID) -> None:
+        for position in self._positions(value):
+            self._array[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value: uuid.UUID) -> bool:
+        return all(self._array[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+_revoked = BloomFilter()
+_synced_at: datetime | None = None
+
+
+def refresh_expires_at() -> datetime:
+    return datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+
+
+async def start_family(db: AsyncSession, user_id: int) -> tuple[uuid.UUID, uuid.UUID]:
+    """
+    Описание: Создаёт семейство refresh-токенов для нового входа (commit делает вызывающий).
+    Возвращает:
+        tuple[UUID, UUID]: ID семейства и jti первого refresh-токена
+    """
+    family_id, jti = uuid.uuid4(), uuid.uuid4()
+    await db.execute(insert(RefreshTokenFamily).values(family_id=family_id, user_id=user_id, jti=jti,
+                                                       expires_at=refresh_expires_at()))
+    return family_id, jti
+
+
+async def revoke_family(db: AsyncSession, family_id: uuid.UUID) -> None:
+    """
+    Описание: Отзывает семейство (commit делает вызывающий). В фильтр текущего воркера
+              семейство попадает сразу, остальные воркеры подгрузят его при синхронизации.
+    """
+    await db.execute(update(RefreshTokenFamily)
+                     .where(RefreshTokenFamily.family_id == family_id, RefreshTokenFamily.revoked_at.is_(None))
+                     .values(revoked_at=func.now()))
+    _revoked.add(family_id)
+
+
+async def rotate(db: AsyncSession, family_id: uuid.UUID, jti: uuid.UUID) -> tuple[int, uuid.UUID] | None:
+    """
+    Описание: Меняет текущий jti семейства на новый и продлевает семейство.
+              Старый jti у живого семейства - повторное использование: семейство отзывается.
+              commit делает вызывающий - в том числе после отзыва.
+    Возвращает:
+        tuple[int, UUID] | None: ID пользователя и новый jti; None - токен не принят
+    """
+    new_jti = uuid.uuid4()
+    user_id = await db.scalar(
+        update(RefreshTokenFamily)
+        .where(RefreshTokenFamily.family_id == family_id, RefreshTokenFamily.jti == jti,
+               RefreshTokenFamily.revoked_at.is_(None), RefreshTokenFamily.expires_at > func.now())
+        .values(jti=new_jti, expires_at=refresh_expires_at())
+        .returning(RefreshTokenFamily.user_id)
+    )
+    if user_id is not None:
+        return user_id, new_jti
+
+    reused = await db.scalar(select(RefreshTokenFamily.user_id).where(
+        RefreshTokenFamily.family_id == family_id, RefreshTokenFamily.jti != jti,
+        RefreshTokenFamily.revoked_at.is_(None)))
+    if reused is not None:
+        logger.warning(f"Refresh token reuse detected for user {reused}, family {family_id} revoked")
+        await revoke_family(db, family_id)
+    return None
+
+
+async def is_revoked(db: AsyncSession, family: str) -> bool:
+    """
+    Описание: Отозвано ли семейство токена. Без запроса к базе, если семейства нет в фильтре.
+    Аргументы:
+        family: claim fam из токена
+    """
+    try:
+        family_id = uuid.UUID(family)
+    except (TypeError, ValueError):
+        return True
+    if family_id not in _revoked:
+        return False
+    revoked_at = await db.scalar(select(RefreshTokenFamily.revoked_at)
+                                 .where(RefreshTokenFamily.family_id == family_id))
+    return revoked_at is not None
+
+
+async def sync_revocations(full: bool = False) -> int:
+    """
+    Описание: Догружает в фильтр семейства, отозванные после прошлой синхронизации
+              (с запасом _SYNC_OVERLAP), или при full строит фильтр заново по всем отзывам -
+              так из него уходят удалённые семейства.
+    Возвращает:
+        int: сколько семейств загружено
+    """
+    global _revoked, _synced_at
+    async with async_session_maker() as db:
+        now = await db.scalar(select(func.now()))
+        query = select(RefreshTokenFamily.family_id).where(RefreshTokenFamily.revoked_at.is_not(None))
+        if not full and _synced_at is not None:
+            query = query.where(RefreshTokenFamily.revoked_at >= _synced_at - _SYNC_OVERLAP)
+        family_ids = (await db.scalars(query)).all()
+
+    target = BloomFilter() if full or _synced_at is None else _revoked
+    for family_id in family_ids:
+        target.add(family_id)
+    _revoked, _synced_at = target, now
+    return len(family_ids)
+
+
+async def delete_expired_families(batch_size: int = REFRESH_TOKEN_SWEEP_BATCH) -> int:
+    """
+    Описание: Удаляет истёкшие семейства пачками по batch_size, каждая пачка - отдельная транзакция.
+              Access-токены таких семейств к этому времени тоже истекли.
+    Возвращает:
+        int: сколько семейств удалено
+    """
+    total = 0
+    while True:
+        async with async_session_maker() as db:
+            deleted = await db.scalar(_DELETE_EXPIRED_SQL, {"batch_size": batch_size})
+            await db.commit()
+        total += deleted
+        if deleted < batch_size:
+            return total
+
+
+async def run_revocation_sync(interval: float = JWT_REVOCATION_SYNC_INTERVAL,
+                              rebuild_interval: float = JWT_REVOCATION_REBUILD_INTERVAL) -> None:
+    """
+    Описание: Фоновая задача воркера: раз в interval секунд догружает отзывы в фильтр,
+              раз в rebuild_interval удаляет истёкшие семейства и пересобирает фильтр.
+              Ошибки БД не останавливают цикл. Запускается и отменяется в lifespan приложения.
+    """
+    loop = asyncio.get_running_loop()
+    rebuilt_at = None
+    while True:
+        try:
+            if rebuilt_at is None or loop.time() - rebuilt_at >= rebuild_interval:
+                deleted = await delete_expired_families()
+                if deleted:
+                    logger.info(f"Deleted {deleted} expired refresh token families")
+                await sync_revocations(full=True)
+                rebuilt_at = loop.time()
+            else:
+                await sync_revocations()
+        except (OSError, SQLAlchemyError) as e:
+            logger.warning(f"Refresh token revocation sync failed: {e}")
+        await asyncio.sleep(interval)
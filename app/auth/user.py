@@ -4,7 +4,8 @@ from fastapi import Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
-from app.utils import SECRET_KEY, ALGORITHM
+from app.auth.keys import decode_token
+from app.auth.refresh_tokens import is_revoked
 from app.models.users import User as UserModel
 from app.db.db_depends import get_async_db
 
@@ -24,7 +25,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession
     Возвращает:
         UserModel: Объект аутентифицированного пользователя
     Исключения:
-        401 Unauthorized: Если токен невалиден, просрочен или пользователь не найден/неактивен
+        401 Unauthorized: Если токен невалиден, просрочен, отозван или пользователь не найден/неактивен
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -32,9 +33,9 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
         email = payload.get('sub')
-        if email is None:
+        if email is None or payload.get("type") == "refresh":
             raise credentials_exception
 
     except jwt.ExpiredSignatureError:
@@ -46,6 +47,10 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession
     except jwt.PyJWTError:
         raise credentials_exception
 
+    # Семейство отзывается выходом или повторным использованием refresh token; промах фильтра - без запроса
+    if payload.get("fam") is not None and await is_revoked(db, payload["fam"]):
+        raise credentials_exception
+
     user = await db.scalar(select(UserModel).where(UserModel.email == email, UserModel.is_active == True))
 
     if user is None:
@@ -96,3 +101,20 @@ async def get_current_admin(current_user: UserModel = Depends(get_current_user))
     if current_user.role != "admin":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only admin can perform this action")
     return current_user
+
+
+async def get_current_seller_or_admin(current_user: UserModel = Depends(get_current_user)):
+    """
+    Описание: Проверяет, что аутентифицированный пользователь - продавец или администратор.
+    Аргументы:
+        current_user: аутентифицированный пользователь из зависимости get_current_user
+    Возвращает:
+        UserModel: Объект пользователя с ролью "seller" или "admin"
+    Исключения:
+        403 Forbidden: Если у пользователя другая роль
+        401 Unauthorized: Если пользователь не аутентифицирован (наследуется от get_current_user)
+    """
+    if current_user.role not in ("seller", "admin"):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
+                            detail="Only sellers and admins can perform this action")
+    return current_user
@@ -0,0 +1,383 @@
+"""
+Двухуровневый кэш: LRU в памяти воркера перед общим хранилищем.
+
+Кэш в памяти процесса дублируется в каждом воркере gunicorn и пустеет при перезапуске. Здесь
+чтение идёт сначала в локальный LRU (CACHE_LOCAL_SIZE записей, не дольше CACHE_LOCAL_TTL секунд),
+затем в общее хранилище (CACHE_BACKEND):
+    memory   - общего хранилища нет, только LRU процесса с полным TTL (разработка, один воркер)
+    postgres - UNLOGGED-таблица cache_entries, без дополнительных сервисов
+    redis    - Redis по CACHE_REDIS_URL (сервис redis в docker-compose.prod.yml)
+Значения сериализуются в msgpack: dict, list, строки, числа, а также Decimal, datetime/date
+и строки SQLAlchemy (как dict). Значение из локального уровня общее для всех запросов воркера -
+его нельзя изменять.
+
+Защита от лавины при истечении записи - вероятностное досрочное обновление (XFetch): вместе со
+значением хранится, сколько оно считалось (delta), и каждое чтение с вероятностью, растущей к концу
+срока, пересчитывает значение заранее (now - delta * CACHE_EARLY_BETA * ln(random) >= срок).
+Остальные читатели в это время получают ещё действующее значение.
+
+Инвалидация - по тегам ("product:12", "category:3"): invalidate_tags удаляет из общего хранилища
+все записи с этими тегами и чистит локальный LRU своего воркера; локальные копии в других
+воркерах доживают не дольше CACHE_LOCAL_TTL.
+
+Общее хранилище создаётся в lifespan (init_cache), а не при импорте; до этого кэш - только локальный LRU.
+Если общее хранилище недоступно, кэш работает как промах - значение считается заново, API не падает.
+Попадания по уровням, промахи, досрочные обновления и ошибки хранилища по каждому пространству
+имён раз в CACHE_MAINTENANCE_INTERVAL пишутся в лог.
+
+Использование:
+    related = Cache("related", ttl=300)
+    rows = await related.get_or_load(product_id, lambda: load(product_id), tags=[f"product:{product_id}"])
+    await invalidate_tags(f"product:{product_id}")
+"""
+import asyncio
+import math
+import random
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Awaitable, Callable, Iterable
+
+import msgpack
+from loguru import logger
+from sqlalchemy import ARRAY, Float, LargeBinary, Text, bindparam, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.db.database import async_session_maker
+from app.utils import (CACHE_BACKEND, CACHE_EARLY_BETA, CACHE_LOCAL_SIZE, CACHE_LOCAL_TTL,
+                       CACHE_MAINTENANCE_INTERVAL, CACHE_REDIS_URL)
+
+# Ошибки общего хранилища, при которых кэш работает как промах; init_cache добавляет ошибки клиента Redis
+_backend_errors: tuple[type[Exception], ...] = (OSError, SQLAlchemyError)
+
+_EXT_DECIMAL = 1
+_EXT_DATETIME = 2
+_EXT_DATE = 3
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return msgpack.ExtType(_EXT_DECIMAL, str(value).encode())
+    if isinstance(value, datetime):
+        return msgpack.ExtType(_EXT_DATETIME, value.isoformat().encode())
+    if isinstance(value, date):
+        return msgpack.ExtType(_EXT_DATE, value.isoformat().encode())
+    if hasattr(value, "_asdict"):  # Row SQLAlchemy, namedtuple
+        return value._asdict()
+    raise TypeError(f"Cannot cache value of type {type(value).__name__}")
+
+
+def _ext_hook(code: int, data: bytes) -> Any:
+    if code == _EXT_DECIMAL:
+        return Decimal(data.decode())
+    if code == _EXT_DATETIME:
+        return datetime.fromisoformat(data.decode())
+    if code == _EXT_DATE:
+        return date.fromisoformat(data.decode())
+    return msgpack.ExtType(code, data)
+
+
+def dumps(value: Any) -> bytes:
+    return msgpack.packb(value, default=_default, use_bin_type=True)
+
+
+def loads(data: bytes) -> Any:
+    return msgpack.unpackb(data, ext_hook=_ext_hook, raw=False, strict_map_key=False)
+
+
+@dataclass(frozen=True)
+class Entry:
+    value: Any
+    expires_at: float  # time.time(): срок общий для всех воркеров
+    delta: float  # сколько секунд считалось значение
+    tags: tuple[str, ...]
+
+    def refresh_early(self, now: float, beta: float) -> bool:
+        # 1 - random(): логарифм нуля не нужен
+        return now - self.delta * beta * math.log(1 - random.random()) >= self.expires_at
+
+
+_SELECT_SQL = text("SELECT value FROM cache_entries WHERE key = :key AND expires_at > now()")
+_UPSERT_SQL = text("""
+    INSERT INTO cache_entries (key, value, tags, expires_at)
+    VALUES (:key, :value, :tags, now() + make_interval(secs => :ttl))
+    ON CONFLICT (key) DO UPDATE SET value = excluded.value, tags = excluded.tags, expires_at = excluded.expires_at
+""").bindparams(bindparam("value", type_=LargeBinary), bindparam("tags", type_=ARRAY(Text)),
+                bindparam("ttl", type_=Float))
+_INVALIDATE_SQL = text("DELETE FROM cache_entries WHERE tags && :tags").bindparams(
+    bindparam("tags", type_=ARRAY(Text)))
+_SWEEP_SQL = text("DELETE FROM cache_entries WHERE expires_at < now()")
+
+
+class PostgresBackend:
+    """
+    Общие записи в UNLOGGED-таблице cache_entries; теги - массив с GIN-индексом.
+    Истёкшие записи не читаются и удаляются фоновой задачей sweep.
+    """
+
+    async def get(self, key: str) -> bytes | None:
+        async with async_session_maker() as db:
+            return await db.scalar(_SELECT_SQL, {"key": key})
+
+    async def set(self, key: str, value: bytes, ttl: float, tags: tuple[str, ...]) -> None:
+        async with async_session_maker() as db:
+            await db.execute(_UPSERT_SQL, {"key": key, "value": value, "tags": list(tags), "ttl": ttl})
+            await db.commit()
+
+    async def invalidate(self, tags: tuple[str, ...]) -> int:
+        async with async_session_maker() as db:
+            result = await db.execute(_INVALIDATE_SQL, {"tags": list(tags)})
+            await db.commit()
+        return result.rowcount
+
+    async def sweep(self) -> int:
+        async with async_session_maker() as db:
+            result = await db.execute(_SWEEP_SQL)
+            await db.commit()
+        return result.rowcount
+
+    async def close(self) -> None:
+        pass
+
+
+class RedisBackend:
+    """
+    Общие записи в Redis: значение с TTL и множество ключей на каждый тег.
+    Множество тега живёт не меньше самой долгой из его записей; ключи, успевшие истечь, в нём безвредны.
+    """
+    _KEY_PREFIX = "cache:"
+    _TAG_PREFIX = "cache-tag:"
+
+    def __init__(self, url: str = CACHE_REDIS_URL):
+        # Клиент Redis - около 100 мс импорта: загружается, только если выбран этот backend
+        try:
+            from redis import asyncio as redis_asyncio
+            from redis.exceptions import RedisError
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND=redis requires the redis package") from None
+        self.errors = (RedisError,)
+        self._client = redis_asyncio.from_url(url)
+
+    async def get(self, key: str) -> bytes | None:
+        return await self._client.get(self._KEY_PREFIX + key)
+
+    async def set(self, key: str, value: bytes, ttl: float, tags: tuple[str, ...]) -> None:
+        async with self._client.pipeline(transaction=False) as pipe:
+            pipe.set(self._KEY_PREFIX + key, value, px=max(1, int(ttl * 1000)))
+            for tag in tags:
+                pipe.sadd(self._TAG_PREFIX + tag, key)
+                # NX ставит срок новому множеству, GT только продлевает существующее
+                pipe.expire(self._TAG_PREFIX + tag, math.ceil(ttl), nx=True)
+                pipe.expire(self._TAG_PREFIX + tag, math.ceil(ttl), gt=True)
+            await pipe.execute()
+
+    async def invalidate(self, tags: tuple[str, ...]) -> int:
+        deleted = 0
+        for tag in tags:
+            keys = await self._client.smembers(self._TAG_PREFIX + tag)
+            deleted += await self._client.delete(self._TAG_PREFIX + tag,
+                                                 *(self._KEY_PREFIX + key.decode() for key in keys))
+        return deleted
+
+    async def sweep(self) -> int:
+        # Сроки записей соблюдает сам Redis
+        return 0
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+BACKENDS = {"memory": lambda: None, "postgres": PostgresBackend, "redis": RedisBackend}
+# Общее хранилище процесса, создаётся в init_cache; None - только локальный уровень
+_backend: PostgresBackend | RedisBackend | None = None
+
+# Счётчики процесса: (пространство, local | shared | miss | early | error) -> запросов
+stats: Counter[tuple[str, str]] = Counter()
+# Все кэши процесса: invalidate_tags чистит их локальные уровни
+_caches: list["Cache"] = []
+
+
+class Cache:
+    """
+    Пространство имён кэша со своим TTL и локальным LRU. Ключи пространства не пересекаются с другими,
+    теги - общие для всех пространств.
+    """
+
+    def __init__(self, namespace: str, ttl: float, local_size: int = CACHE_LOCAL_SIZE,
+                 local_ttl: float = CACHE_LOCAL_TTL, beta: float = CACHE_EARLY_BETA):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.local_size = local_size
+        self.local_ttl = local_ttl
+        self.beta = beta
+        self._local: OrderedDict[str, tuple[float, Entry]] = OrderedDict()
+        _caches.append(self)
+
+    async def get_or_load(self, key: Any, loader: Callable[[], Awaitable[Any]],
+                          tags: Iterable[str] | Callable[[Any], Iterable[str]] = (), ttl: float | None = None) -> Any:
+        """
+        Описание: Значение по ключу; при промахе или досрочном обновлении - loader(), результат сохраняется.
+        Аргументы:
+            key: ключ внутри пространства (приводится к строке)
+            loader: корутина без аргументов, считающая значение
+            tags: теги для invalidate_tags или функция "значение -> теги", если они известны только после loader
+            ttl: срок записи в секундах, по умолчанию - TTL пространства
+        Возвращает:
+            значение из кэша или от loader
+        """
+        key = str(key)
+        entry = await self._read(key)
+        if entry is not None:
+            if not entry.refresh_early(time.time(), self.beta):
+                return entry.value
+            stats[self.namespace, "early"] += 1
+        started = time.perf_counter()
+        value = await loader()
+        delta = time.perf_counter() - started
+        await self.set(key, value, tags(value) if callable(tags) else tags, ttl, delta=delta)
+        return value
+
+    async def set(self, key: Any, value: Any, tags: Iterable[str] = (), ttl: float | None = None,
+                  delta: float = 0.0) -> None:
+        """
+        Описание: Сохраняет значение в оба уровня. Ошибка общего хранилища не пробрасывается.
+        """
+        key, ttl = str(key), ttl or self.ttl
+        entry = Entry(value, time.time() + ttl, delta, tuple(tags))
+        self._put_local(key, entry)
+        if _backend is None:
+            return
+        try:
+            await _backend.set(self._full_key(key), dumps([value, entry.expires_at, delta, list(entry.tags)]),
+                              ttl, entry.tags)
+        except _backend_errors as e:
+            stats[self.namespace, "error"] += 1
+            logger.warning(f"Cache {self.namespace} write failed: {e}")
+
+    async def _read(self, key: str) -> Entry | None:
+        now = time.time()
+        local = self._local.get(key)
+        if local is not None:
+            if local[0] > now:
+                self._local.move_to_end(key)
+                stats[self.namespace, "local"] += 1
+                return local[1]
+            del self._local[key]
+        if _backend is None:
+            stats[self.namespace, "miss"] += 1
+            return None
+        try:
+            data = await _backend.get(self._full_key(key))
+        except _backend_errors as e:
+            stats[self.namespace, "error"] += 1
+            logger.warning(f"Cache {self.namespace} read failed: {e}")
+            return None
+        if data is None:
+            stats[self.namespace, "miss"] += 1
+            return None
+        value, expires_at, delta, tags = loads(data)
+        entry = Entry(value, expires_at, delta, tuple(tags))
+        if entry.expires_at <= now:
+            stats[self.namespace, "miss"] += 1
+            return None
+        stats[self.namespace, "shared"] += 1
+        self._put_local(key, entry)
+        return entry
+
+    def _put_local(self, key: str, entry: Entry) -> None:
+        # Без общего хранилища локальный уровень - единственный и держит запись весь срок
+        local_ttl = self.local_ttl if _backend is not None else self.ttl
+        self._local[key] = (min(entry.expires_at, time.time() + local_ttl), entry)
+        self._local.move_to_end(key)
+        if len(self._local) > self.local_size:
+            self._local.popitem(last=False)
+
+    def _drop_local(self, tags: frozenset[str]) -> None:
+        for key in [key for key, (_, entry) in self._local.items() if tags.intersection(entry.tags)]:
+            del self._local[key]
+
+    def _full_key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+
+def init_cache(name: str = CACHE_BACKEND) -> PostgresBackend | RedisBackend | None:
+    """
+    Описание: Создаёт общее хранилище процесса (клиент Redis - здесь, а не при импорте).
+              Повторный вызов возвращает уже созданное.
+    Аргументы:
+        name: ключ BACKENDS (CACHE_BACKEND)
+    Возвращает:
+        PostgresBackend | RedisBackend | None: хранилище; None - только локальный уровень
+    Исключения:
+        ValueError: неизвестное хранилище - воркер не стартует с опечаткой в настройке
+    """
+    global _backend, _backend_errors
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown CACHE_BACKEND {name!r}, expected one of: {', '.join(BACKENDS)}")
+    if _backend is None:
+        _backend = BACKENDS[name]()
+        _backend_errors = (OSError, SQLAlchemyError, *getattr(_backend, "errors", ()))
+    return _backend
+
+
+async def invalidate_tags(*tags: str) -> None:
+    """
+    Описание: Удаляет записи с любым из тегов из общего хранилища и из локальных уровней этого процесса.
+              Вызывается после commit изменения; ошибка хранилища только логируется.
+    """
+    if not tags:
+        return
+    for cache in _caches:
+        cache._drop_local(frozenset(tags))
+    if _backend is None:
+        return
+    try:
+        await _backend.invalidate(tags)
+    except _backend_errors as e:
+        logger.warning(f"Cache invalidation of {', '.join(tags)} failed: {e}")
+
+
+def take_stats() -> dict[str, dict[str, int]]:
+    """
+    Описание: Забирает счётчики с последнего вызова и обнуляет их.
+    Возвращает:
+        dict: пространство имён -> {local, shared, miss, early, error}
+    """
+    report: dict[str, dict[str, int]] = {}
+    for (namespace, outcome), count in stats.items():
+        report.setdefault(namespace, dict.fromkeys(("local", "shared", "miss", "early", "error"), 0))[outcome] = count
+    stats.clear()
+    return report
+
+
+async def close_cache() -> None:
+    """
+    Описание: Закрывает соединения общего хранилища при остановке приложения.
+    """
+    global _backend
+    if _backend is not None:
+        await _backend.close()
+        _backend = None
+
+
+async def run_cache_maintenance(interval: float = CACHE_MAINTENANCE_INTERVAL) -> None:
+    """
+    Описание: Фоновая задача воркера: раз в interval секунд удаляет истёкшие записи общего хранилища
+              и пишет в лог попадания и промахи по пространствам имён. Ошибки хранилища не останавливают цикл.
+              Запускается и отменяется в lifespan приложения.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        for namespace, counts in take_stats().items():
+            reads = counts["local"] + counts["shared"] + counts["miss"]
+            hits = counts["local"] + counts["shared"]
+            logger.info(f"Cache {namespace}: {reads} reads, hit rate {100 * hits / reads if reads else 0:.1f}% "
+                        f"(local {counts['local']}, shared {counts['shared']}), {counts['miss']} misses, "
+                        f"{counts['early']} early refreshes, {counts['error']} backend errors")
+        if _backend is not None:
+            try:
+                await _backend.sweep()
+            except _backend_errors as e:
+                logger.warning(f"Cache sweep failed: {e}")
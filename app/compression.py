@@ -0,0 +1,272 @@
+import gzip
+import hashlib
+import zlib
+from collections import OrderedDict
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.utils import (COMPRESSION_ENCODINGS, COMPRESSION_MIN_SIZE, COMPRESSION_CONTENT_TYPES,
+                       COMPRESSION_GZIP_LEVEL, COMPRESSION_BROTLI_QUALITY, COMPRESSION_ZSTD_LEVEL,
+                       COMPRESSION_CACHE_MAX_BYTES, COMPRESSION_THREAD_MIN_SIZE)
+
+try:
+    import brotli
+except ImportError:  # brotli не установлен - кодировка "br" просто не предлагается
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def available_encodings() -> set[str]:
+    """
+    Описание: Возвращает кодировки, для которых установлены библиотеки сжатия.
+    """
+    encodings = {"gzip"}
+    if brotli is not None:
+        encodings.add("br")
+    if zstandard is not None:
+        encodings.add("zstd")
+    return encodings
+
+
+def parse_accept_encoding(header: str) -> dict[str, float]:
+    """
+    Описание: Разбирает заголовок Accept-Encoding в словарь {кодировка: q}.
+    Аргументы:
+        header: значение заголовка, например "gzip, br;q=0.9, *;q=0"
+    Возвращает:
+        dict[str, float]: веса кодировок (q=0 означает явный запрет)
+    """
+    weights = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[name] = q
+    return weights
+
+
+def choose_encoding(header: str, preferred: list[str]) -> str | None:
+    """
+    Описание: Выбирает кодировку ответа по Accept-Encoding клиента.
+              При равных весах побеждает порядок сервера (preferred).
+    Аргументы:
+        header: значение заголовка Accept-Encoding
+        preferred: кодировки сервера в порядке приоритета
+    Возвращает:
+        str | None: выбранная кодировка или None, если сжимать не нужно
+    """
+    if not header:
+        return None
+    weights = parse_accept_encoding(header)
+    wildcard = weights.get("*", 0.0)
+    best, best_q = None, 0.0
+    for encoding in preferred:
+        q = weights.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class _StreamCompressor:
+    """Потоковый компрессор: сбрасывает данные после каждого чанка, чтобы клиент получал их сразу."""
+
+    def __init__(self, encoding: str, levels: dict[str, int]):
+        self.encoding = encoding
+        if encoding == "gzip":
+            self._obj = zlib.compressobj(levels["gzip"], zlib.DEFLATED, 31)
+        elif encoding == "br":
+            self._obj = brotli.Compressor(quality=levels["br"])
+        else:
+            self._obj = zstandard.ZstdCompressor(level=levels["zstd"]).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "gzip":
+            return self._obj.compress(data) + self._obj.flush(zlib.Z_SYNC_FLUSH)
+        if self.encoding == "br":
+            return self._obj.process(data) + self._obj.flush()
+        return self._obj.compress(data) + self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        if self.encoding == "gzip":
+            return self._obj.flush()
+        if self.encoding == "br":
+            return self._obj.finish()
+        return self._obj.flush()
+
+
+class CompressedBodyCache:
+    """
+    LRU уже сжатых тел ответов с ограничением по суммарному размеру.
+    Одинаковые ответы (страницы каталога, списки отзывов) сжимаются один раз,
+    повторно тратится только хеширование тела.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._items: OrderedDict[tuple[str, bytes], bytes] = OrderedDict()
+
+    def get(self, encoding: str, body: bytes) -> tuple[tuple[str, bytes], bytes | None]:
+        key = (encoding, hashlib.blake2b(body, digest_size=16).digest())
+        value = self._items.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._items.move_to_end(key)
+        return key, value
+
+    def put(self, key: tuple[str, bytes], value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        self._items[key] = value
+        self.size += len(value)
+        while self.size > self.max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self.size -= len(evicted)
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware сжатия ответов (zstd / br / gzip).
+    Кодировка выбирается по Accept-Encoding, сжимаются только ответы из списка
+    content-type и не меньше min_size байт. Потоковые ответы сжимаются по чанкам.
+    """
+
+    def __init__(self, app: ASGIApp, encodings: list[str] | None = None, min_size: int = COMPRESSION_MIN_SIZE,
+                 content_types: list[str] | None = None, gzip_level: int = COMPRESSION_GZIP_LEVEL,
+                 brotli_quality: int = COMPRESSION_BROTLI_QUALITY, zstd_level: int = COMPRESSION_ZSTD_LEVEL,
+                 cache_max_bytes: int = COMPRESSION_CACHE_MAX_BYTES,
+                 thread_min_size: int = COMPRESSION_THREAD_MIN_SIZE):
+        self.app = app
+        supported = available_encodings()
+        self.encodings = [e for e in (encodings or COMPRESSION_ENCODINGS) if e in supported]
+        self.min_size = min_size
+        self.content_types = frozenset(content_types or COMPRESSION_CONTENT_TYPES)
+        self.levels = {"gzip": gzip_level, "br": brotli_quality, "zstd": zstd_level}
+        self.cache = CompressedBodyCache(cache_max_bytes) if cache_max_bytes > 0 else None
+        self.thread_min_size = thread_min_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+    def _encode(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "gzip":
+            return gzip.compress(body, compresslevel=self.levels["gzip"], mtime=0)
+        if encoding == "br":
+            return brotli.compress(body, quality=self.levels["br"])
+        return zstandard.ZstdCompressor(level=self.levels["zstd"]).compress(body)
+
+    async def compress(self, body: bytes, encoding: str) -> bytes:
+        """
+        Описание: Сжимает тело ответа целиком, используя кэш сжатых тел, если он включён.
+                  Тела от thread_min_size байт сжимаются в пуле потоков: мегабайтный ответ занимает
+                  компрессор на десятки миллисекунд, и в цикле событий это время стояли бы все запросы.
+                  Кэш трогается только из цикла событий.
+        """
+        key = None
+        if self.cache is not None:
+            key, cached = self.cache.get(encoding, body)
+            if cached is not None:
+                return cached
+        if len(body) >= self.thread_min_size:
+            compressed = await run_in_threadpool(self._encode, body, encoding)
+        else:
+            compressed = self._encode(body, encoding)
+        if key is not None:
+            self.cache.put(key, compressed)
+        return compressed
+
+    def should_compress(self, headers: Headers, status: int) -> bool:
+        if status < 200 or status in (204, 304):
+            return False
+        if "content-encoding" in headers or "no-transform" in headers.get("cache-control", ""):
+            return False
+        media_type = headers.get("content-type", "").split(";", 1)[0].strip().lower()
+        return media_type in self.content_types
+
+
+class _CompressionResponder:
+    """Перехватывает сообщения ответа одного запроса и решает, сжимать ли их."""
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self._send = send
+        self.start_message: Message | None = None
+        self.passthrough = False
+        self.stream: _StreamCompressor | None = None
+
+    def _mark_encoded(self, headers: MutableHeaders) -> None:
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        # Сжатое представление не побайтово равно исходному - сильный ETag становится слабым
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = "W/" + etag
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.stream is not None:
+            chunk = self.stream.compress(body) if body else b""
+            if not more_body:
+                chunk += self.stream.finish()
+            await self._send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+            return
+
+        start = self.start_message
+        headers = MutableHeaders(raw=start["headers"])
+        if not self.middleware.should_compress(headers, start["status"]) or (
+                not more_body and len(body) < self.middleware.min_size):
+            self.passthrough = True
+            await self._send(start)
+            await self._send(message)
+            return
+
+        self._mark_encoded(headers)
+        if not more_body:
+            compressed = await self.middleware.compress(body, self.encoding)
+            headers["Content-Length"] = str(len(compressed))
+            await self._send(start)
+            await self._send({"type": "http.response.body", "body": compressed})
+            return
+
+        # Потоковый ответ: длина заранее неизвестна
+        del headers["Content-Length"]
+        self.stream = _StreamCompressor(self.encoding, self.middleware.levels)
+        await self._send(start)
+        await self._send({"type": "http.response.body", "body": self.stream.compress(body), "more_body": True})
@@ -12,6 +12,12 @@ class Settings(BaseSettings):
     DB_NAME: str
     DB_USER: str
     DB_PASSWORD: str
+    # Параметры пула соединений
+    DB_ECHO: bool = False
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    # Сколько соединений открыть заранее при старте воркера
+    DB_POOL_WARMUP: int = 5
 
     model_config = SettingsConfigDict(
         env_file=BASE_DIR / ".env",
@@ -28,6 +34,8 @@ class Settings(BaseSettings):
 
 @lru_cache
 def get_settings() -> Settings:
+    """
+    Описание: Создаёт настройки при первом обращении (а не при импорте модуля),
+              поэтому модули приложения импортируются без .env.
+    """
     return Settings()
-
-settings = get_settings()
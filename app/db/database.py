@@ -1,20 +1,73 @@
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker,AsyncSession
-from sqlalchemy.orm import  DeclarativeBase
+import asyncio
 
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession, AsyncEngine
+from sqlalchemy.orm import DeclarativeBase
 
-from app.db.config import settings
+from app.db.config import get_settings
 
 
-DATABASE_URL = settings.db_url
+# Engine создаётся в lifespan приложения (init_engine), а не при импорте
+_engine: AsyncEngine | None = None
 
+#Настраиваем фабрику сессий, bind задаётся в init_engine
+async_session_maker = async_sessionmaker(expire_on_commit=False, class_=AsyncSession)
 
-# Создаём Engine
-async_engine = create_async_engine(DATABASE_URL, echo=True)
-
-#Настраиваем фабрику сессий
-async_session_maker = async_sessionmaker(bind=async_engine, expire_on_commit=False,class_=AsyncSession)
 
 class Base(DeclarativeBase):
     pass
 
 
+def init_engine() -> AsyncEngine:
+    """
+    Описание: Создаёт Engine по настройкам и привязывает к нему фабрику сессий.
+              Повторный вызов возвращает уже созданный Engine.
+    Возвращает:
+        AsyncEngine: Engine приложения
+    """
+    global _engine
+    if _engine is None:
+        settings = get_settings()
+        _engine = create_async_engine(settings.db_url, echo=settings.DB_ECHO, pool_size=settings.DB_POOL_SIZE,
+                                      max_overflow=settings.DB_MAX_OVERFLOW, pool_pre_ping=True)
+        async_session_maker.configure(bind=_engine)
+    return _engine
+
+
+def get_engine() -> AsyncEngine:
+    """
+    Описание: Возвращает Engine приложения, создавая его при необходимости.
+    """
+    return _engine or init_engine()
+
+
+async def warm_up_pool(connections: int) -> None:
+    """
+    Описание: Заранее открывает соединения пула, чтобы первые запросы
+              после старта воркера не платили за установку соединения.
+              Недоступная база не мешает старту - ошибка только логируется.
+    Аргументы:
+        connections: Количество соединений для открытия
+    """
+    engine = get_engine()
+
+    async def _ping():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    try:
+        await asyncio.gather(*(_ping() for _ in range(connections)))
+    except (OSError, SQLAlchemyError) as e:
+        logger.warning(f"Database pool warm-up failed: {e}")
+
+
+async def dispose_engine() -> None:
+    """
+    Описание: Закрывает все соединения пула при остановке приложения.
+    """
+    global _engine
+    if _engine is not None:
+        await _engine.dispose()
+        _engine = None
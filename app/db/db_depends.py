@@ -10,4 +10,15 @@ async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
         yield session
 
 
-
+async def get_asyncpg_connection(session: AsyncSession):
+    """
+    Описание: Возвращает asyncpg-соединение, на котором идёт транзакция сессии.
+              Нужно для COPY (copy_records_to_table / copy_from_query), которых нет в SQLAlchemy.
+    Аргументы:
+        session: асинхронная сессия SQLAlchemy
+    Возвращает:
+        asyncpg.Connection: соединение драйвера
+    """
+    connection = await session.connection()
+    raw_connection = await connection.get_raw_connection()
+    return raw_connection.driver_connection
@@ -0,0 +1,106 @@
+"""
+Фасеты каталога: сколько видимых товаров в каждой категории (с подкатегориями),
+ценовой корзине, у каждого продавца и в наличии.
+
+Без фильтров счётчики читаются из product_facets, которую триггеры на product_listing
+поддерживают в той же транзакции, что и изменение товара. С фильтрами или поиском фасеты
+считаются точно одним запросом: подходящие строки product_listing выбираются один раз (CTE),
+а группировки по категориям, корзинам и продавцам объединяются через UNION ALL.
+"""
+from sqlalchemy import Select, func, literal, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import CategoryClosure, ProductFacet, ProductListing
+
+# Границы ценовых корзин; совпадают с SQL-функцией product_price_bucket (миграция f5c19b7e2a08)
+PRICE_BUCKET_BOUNDS = (500, 1000, 2500, 5000, 10000, 25000, 50000, 100000)
+
+
+def price_bucket_range(bucket: int) -> tuple[float, float | None]:
+    """
+    Описание: Границы ценовой корзины [min, max) по её номеру из width_bucket.
+    """
+    low = PRICE_BUCKET_BOUNDS[bucket - 1] if bucket > 0 else 0
+    high = PRICE_BUCKET_BOUNDS[bucket] if bucket < len(PRICE_BUCKET_BOUNDS) else None
+    return low, high
+
+
+def _precomputed_statement(seller_limit: int) -> Select:
+    category = (
+        select(literal("category").label("facet"), CategoryClosure.ancestor_id.label("value"),
+               func.sum(ProductFacet.products).label("products"), func.sum(ProductFacet.in_stock).label("in_stock"))
+        .select_from(ProductFacet)
+        .join(CategoryClosure, CategoryClosure.descendant_id == ProductFacet.value)
+        .where(ProductFacet.facet == "category")
+        .group_by(CategoryClosure.ancestor_id)
+    )
+    price = (select(ProductFacet.facet, ProductFacet.value, ProductFacet.products, ProductFacet.in_stock)
+             .where(ProductFacet.facet == "price"))
+    sellers = (select(ProductFacet.facet, ProductFacet.value, ProductFacet.products, ProductFacet.in_stock)
+               .where(ProductFacet.facet == "seller", ProductFacet.products > 0)
+               .order_by(ProductFacet.products.desc(), ProductFacet.value).limit(seller_limit).subquery())
+    return union_all(category, price, select(sellers))
+
+
+def _query_statement(filters: list, seller_limit: int) -> Select:
+    matched = select(ProductListing.category_id, ProductListing.seller_id, ProductListing.price,
+                     ProductListing.stock).where(*filters).cte("matched")
+    products = func.count()
+    in_stock = func.count().filter(matched.c.stock > 0)
+    bucket = func.product_price_bucket(matched.c.price)
+
+    category = (select(literal("category"), CategoryClosure.ancestor_id, products, in_stock)
+                .select_from(matched)
+                .join(CategoryClosure, CategoryClosure.descendant_id == matched.c.category_id)
+                .group_by(CategoryClosure.ancestor_id))
+    price = select(literal("price"), bucket, products, in_stock).group_by(bucket)
+    sellers = (select(literal("seller"), matched.c.seller_id, products.label("products"), in_stock)
+               .group_by(matched.c.seller_id)
+               .order_by(products.desc(), matched.c.seller_id).limit(seller_limit).subquery())
+    return union_all(category, price, select(sellers))
+
+
+async def product_facets(db: AsyncSession, filters: list | None, seller_limit: int) -> dict:
+    """
+    Описание: Считает фасеты каталога одним запросом.
+    Аргументы:
+        db: сессия
+        filters: условия WHERE по product_listing (catalog_filters и поиск);
+                 None - без фильтров, счётчики из product_facets
+        seller_limit: сколько продавцов с наибольшим числом товаров вернуть
+    Возвращает:
+        dict: данные для схемы ProductFacets
+    """
+    statement = _query_statement(filters, seller_limit) if filters else _precomputed_statement(seller_limit)
+    rows = (await db.execute(statement)).all()
+
+    categories, sellers, buckets = [], [], {}
+    for facet, value, products, in_stock in rows:
+        if not products:
+            continue
+        if facet == "category":
+            categories.append({"category_id": value, "products": products, "in_stock": in_stock})
+        elif facet == "seller":
+            sellers.append({"seller_id": value, "products": products, "in_stock": in_stock})
+        else:
+            buckets[value] = (products, in_stock)
+
+    # Все корзины в ответе, в том числе пустые - витрина показывает постоянную шкалу цен
+    price_buckets = []
+    for bucket in range(len(PRICE_BUCKET_BOUNDS) + 1):
+        low, high = price_bucket_range(bucket)
+        products, in_stock = buckets.get(bucket, (0, 0))
+        price_buckets.append({"min_price": low, "max_price": high, "products": products, "in_stock": in_stock})
+
+    # Каждый товар ровно в одной ценовой корзине - их сумма и есть итог
+    total = sum(products for products, _ in buckets.values())
+    total_in_stock = sum(in_stock for _, in_stock in buckets.values())
+    categories.sort(key=lambda item: (-item["products"], item["category_id"]))
+    sellers.sort(key=lambda item: (-item["products"], item["seller_id"]))
+    return {
+        "total": total,
+        "stock": {"in_stock": total_in_stock, "out_of_stock": total - total_in_stock},
+        "categories": categories,
+        "price_buckets": price_buckets,
+        "sellers": sellers,
+    }
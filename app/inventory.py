@@ -0,0 +1,201 @@
+import asyncio
+from datetime import timedelta
+
+from loguru import logger
+from sqlalchemy import delete, func, insert, select, text, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import invalidate_tags
+from app.db.database import async_session_maker
+from app.models import CartItem as CartItemModel, LowStockEvent, Product as ProductModel, StockReservation
+from app.schemas.products import INT4_MAX
+from app.utils import LOW_STOCK_THRESHOLD, RESERVATION_SWEEP_BATCH, RESERVATION_SWEEP_INTERVAL
+
+# Возврат просроченных резервов одним запросом: пачка строк забирается с SKIP LOCKED,
+# чтобы несколько воркеров не ждали друг друга, остатки возвращаются агрегатом по товару
+_RELEASE_EXPIRED_SQL = text("""
+    WITH expired AS (
+        DELETE FROM stock_reservations
+        WHERE id IN (
+            SELECT id FROM stock_reservations
+            WHERE expires_at < now()
+            ORDER BY expires_at
+            LIMIT :batch_size
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING product_id, quantity
+    ), locked AS (
+        -- Товары блокируются в порядке id, как в reserve_cart: иначе встречные блокировки дают deadlock
+        SELECT p.id, e.quantity
+        FROM products AS p
+        JOIN (SELECT product_id, sum(quantity) AS quantity FROM expired GROUP BY product_id) AS e
+            ON e.product_id = p.id
+        ORDER BY p.id
+        FOR UPDATE OF p
+    ), restored AS (
+        UPDATE products AS p
+        SET stock = p.stock + l.quantity
+        FROM locked AS l
+        WHERE p.id = l.id
+    )
+    SELECT (SELECT count(*) FROM expired), (SELECT coalesce(array_agg(id), '{}') FROM locked)
+""")
+
+
+class InsufficientStock(Exception):
+    """Остатка товара не хватает для списания или резерва."""
+
+    def __init__(self, product_id: int):
+        super().__init__(product_id)
+        self.product_id = product_id
+
+
+async def decrement_stock(db: AsyncSession, product_id: int, quantity: int) -> int | None:
+    """
+    Описание: Атомарно списывает quantity единиц товара одним условным UPDATE
+              (stock >= quantity проверяется под блокировкой строки, без SELECT перед UPDATE).
+              При пересечении порога LOW_STOCK_THRESHOLD пишет событие в ленту продавца.
+    Аргументы:
+        product_id: ID активного товара
+        quantity: сколько списать (больше 0)
+    Возвращает:
+        int | None: новый остаток или None, если товара нет или остатка не хватает
+    """
+    row = (await db.execute(
+        update(ProductModel)
+        .where(ProductModel.id == product_id, ProductModel.is_active == True, ProductModel.stock >= quantity)
+        .values(stock=ProductModel.stock - quantity)
+        .returning(ProductModel.stock, ProductModel.seller_id)
+        .execution_options(synchronize_session=False)
+    )).first()
+    if row is None:
+        return None
+    stock, seller_id = row
+    if stock <= LOW_STOCK_THRESHOLD < stock + quantity:
+        await db.execute(insert(LowStockEvent).values(product_id=product_id, seller_id=seller_id, stock=stock,
+                                                      threshold=LOW_STOCK_THRESHOLD))
+    return stock
+
+
+async def increment_stock(db: AsyncSession, product_id: int, quantity: int) -> int | None:
+    """
+    Описание: Атомарно возвращает quantity единиц товара на склад.
+    Аргументы:
+        product_id: ID товара
+        quantity: сколько вернуть (больше 0)
+    Возвращает:
+        int | None: новый остаток или None, если товара нет или остаток превысил бы INT4_MAX
+    """
+    return await db.scalar(
+        update(ProductModel)
+        # Граница колонки integer проверяется в условии: переполнение - промах, а не ошибка БД
+        .where(ProductModel.id == product_id, ProductModel.stock <= INT4_MAX - quantity)
+        .values(stock=ProductModel.stock + quantity)
+        .returning(ProductModel.stock)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def release_reservations(db: AsyncSession, user_id: int) -> list[int]:
+    """
+    Описание: Снимает все резервы пользователя и возвращает их количество на склад.
+              Транзакцию фиксирует вызывающий код, он же после фиксации сбрасывает кэш товаров.
+    Возвращает:
+        list[int]: ID товаров, чьи резервы сняты
+    """
+    released = (await db.execute(
+        delete(StockReservation)
+        .where(StockReservation.user_id == user_id)
+        .returning(StockReservation.product_id, StockReservation.quantity)
+    )).all()
+    for product_id, quantity in sorted(released):
+        await increment_stock(db, product_id, quantity)
+    return [product_id for product_id, _ in released]
+
+
+async def reserve_cart(db: AsyncSession, user_id: int, ttl_minutes: int) -> list[StockReservation]:
+    """
+    Описание: Резервирует всё содержимое корзины на ttl_minutes: списывает остатки
+              и записывает резервы. Всё или ничего - при нехватке любого товара
+              транзакция откатывается. Повторный вызов приводит резерв к текущей корзине и продлевает срок.
+              После фиксации сбрасывается кэш товаров с изменившимся остатком.
+              Товары списываются в порядке product_id, поэтому две корзины с общими
+              товарами не блокируют друг друга взаимно.
+    Аргументы:
+        user_id: ID владельца корзины
+        ttl_minutes: срок жизни резерва в минутах
+    Возвращает:
+        list[StockReservation]: созданные резервы (пустой список для пустой корзины)
+    Исключения:
+        InsufficientStock: остатка товара не хватает (после отката транзакции)
+    """
+    reserved = dict((await db.execute(
+        delete(StockReservation)
+        .where(StockReservation.user_id == user_id)
+        .returning(StockReservation.product_id, StockReservation.quantity)
+    )).all())
+    cart = dict((await db.execute(
+        select(CartItemModel.product_id, CartItemModel.quantity).where(CartItemModel.user_id == user_id)
+    )).all())
+
+    # Списывается только разница с прежним резервом, чтобы продление не гоняло остаток
+    # туда-обратно и не порождало лишних событий "мало на складе"
+    changed = []
+    for product_id in sorted(reserved.keys() | cart.keys()):
+        diff = cart.get(product_id, 0) - reserved.get(product_id, 0)
+        if diff:
+            changed.append(product_id)
+        if diff > 0 and await decrement_stock(db, product_id, diff) is None:
+            await db.rollback()
+            raise InsufficientStock(product_id)
+        if diff < 0:
+            await increment_stock(db, product_id, -diff)
+    if not cart:
+        await db.commit()
+        await invalidate_tags(*(f"product:{product_id}" for product_id in changed))
+        return []
+
+    expires_at = func.now() + timedelta(minutes=ttl_minutes)
+    reservations = (await db.scalars(
+        insert(StockReservation)
+        .values([{"user_id": user_id, "product_id": product_id, "quantity": quantity, "expires_at": expires_at}
+                 for product_id, quantity in cart.items()])
+        .returning(StockReservation)
+    )).all()
+    await db.commit()
+    await invalidate_tags(*(f"product:{product_id}" for product_id in changed))
+    return list(reservations)
+
+
+async def release_expired_reservations(batch_size: int = RESERVATION_SWEEP_BATCH) -> int:
+    """
+    Описание: Возвращает на склад все просроченные резервы пачками по batch_size,
+              каждая пачка - отдельная короткая транзакция, после которой сбрасывается кэш её товаров.
+    Возвращает:
+        int: сколько резервов снято
+    """
+    total = 0
+    while True:
+        async with async_session_maker() as session:
+            released, product_ids = (await session.execute(_RELEASE_EXPIRED_SQL, {"batch_size": batch_size})).one()
+            await session.commit()
+        await invalidate_tags(*(f"product:{product_id}" for product_id in product_ids))
+        total += released
+        if released < batch_size:
+            return total
+
+
+async def run_reservation_sweeper(interval: float = RESERVATION_SWEEP_INTERVAL) -> None:
+    """
+    Описание: Фоновая задача воркера: раз в interval секунд снимает просроченные резервы.
+              Ошибки БД не останавливают цикл. Запускается и отменяется в lifespan приложения.
+    """
+    while True:
+        try:
+            released = await release_expired_reservations()
+            if released:
+                logger.info(f"Released {released} expired stock reservations")
+        except (OSError, SQLAlchemyError) as e:
+            logger.warning(f"Reservation sweep failed: {e}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,281 @@
+"""
+Фоновая очередь задач на Postgres (outbox).
+
+Обработчик запроса ставит задачу через enqueue() в своей транзакции - задача появляется в jobs
+только вместе с бизнес-записью и не теряется, если процесс упадёт после ответа. Воркер забирает
+готовые задачи пачкой (FOR UPDATE SKIP LOCKED - несколько воркеров не ждут друг друга), выполняет
+каждую в отдельной транзакции и удаляет её в той же транзакции, что и эффект обработчика.
+Ошибка - повтор с экспоненциальной задержкой, после max_attempts задача остаётся со статусом failed;
+для периодической задачи при этом ставится следующий запуск через её обычный интервал.
+Упавший воркер не теряет задачи: по истечении аренды (JOB_LEASE_SECONDS) их заберёт другой,
+поэтому обработчики должны быть идемпотентны.
+
+Воркер запускается в lifespan приложения (JOBS_IN_APP=true) или отдельным процессом:
+    python -m app.jobs [--batch 50 --concurrency 4]
+    python -m app.jobs --drain        # выполнить все готовые задачи и выйти
+"""
+import argparse
+import asyncio
+import random
+import signal
+import sys
+from collections.abc import Awaitable, Callable
+from datetime import timedelta
+
+from loguru import logger
+from sqlalchemy import delete, func, text, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.database import async_session_maker, dispose_engine, init_engine
+from app.log import setup_logging, shutdown_logging
+from app.models import Job, Product as ProductModel
+from app.ranking import refresh_popularity
+from app.routers.router_depens import recalculate_rating
+from app.search_query import rebuild_search_terms
+from app.utils import (JOB_BATCH_SIZE, JOB_CONCURRENCY, JOB_LEASE_SECONDS, JOB_POLL_INTERVAL, JOB_RETRY_BASE,
+                       JOB_RETRY_MAX, POPULARITY_REFRESH_INTERVAL, RELATED_REFRESH_INTERVAL,
+                       SEARCH_TERMS_REFRESH_INTERVAL)
+
+Handler = Callable[[AsyncSession, dict], Awaitable[None]]
+HANDLERS: dict[str, Handler] = {}
+# Периодические задачи сами ставят следующий запуск; при старте воркера цепочка создаётся,
+# если её ещё нет (dedupe_key схлопывает повторы). Значение - интервал в секундах: с ним следующий запуск
+# ставится и тогда, когда задача исчерпала попытки
+PERIODIC_JOBS = {
+    "refresh_related_products": RELATED_REFRESH_INTERVAL,
+    "refresh_popularity": POPULARITY_REFRESH_INTERVAL,
+    "refresh_search_terms": SEARCH_TERMS_REFRESH_INTERVAL,
+}
+
+# Готовые задачи (и задачи с истёкшей арендой) переводятся в running одним запросом;
+# run_at становится сроком аренды, attempts считает и попытки упавших воркеров
+_DEQUEUE_SQL = text("""
+    UPDATE jobs AS j
+    SET status = 'running', attempts = j.attempts + 1, run_at = now() + make_interval(secs => :lease)
+    WHERE j.id IN (
+        SELECT id FROM jobs
+        WHERE status IN ('queued', 'running') AND run_at <= now()
+        ORDER BY run_at, id
+        LIMIT :batch_size
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING j.id, j.kind, j.payload, j.attempts, j.max_attempts
+""")
+
+
+def job_handler(kind: str) -> Callable[[Handler], Handler]:
+    """
+    Описание: Регистрирует обработчик задач вида kind. Обработчик получает сессию и payload,
+              не фиксирует транзакцию сам - это делает воркер вместе с удалением задачи.
+    """
+    def register(handler: Handler) -> Handler:
+        HANDLERS[kind] = handler
+        return handler
+    return register
+
+
+async def enqueue(db: AsyncSession, kind: str, payload: dict | None = None, dedupe_key: str | None = None,
+                  delay: timedelta | None = None) -> None:
+    """
+    Описание: Ставит задачу в очередь в текущей транзакции сессии (commit делает вызывающий).
+    Аргументы:
+        db: сессия бизнес-транзакции
+        kind: вид задачи, для которого зарегистрирован обработчик
+        payload: данные задачи (JSON)
+        dedupe_key: ключ схлопывания - пока задача с тем же kind и ключом ждёт в очереди,
+                    повторная постановка ничего не добавляет
+        delay: отложить выполнение
+    """
+    statement = insert(Job).values(kind=kind, payload=payload or {}, dedupe_key=dedupe_key,
+                                   run_at=func.now() + delay if delay else func.now())
+    if dedupe_key is not None:
+        statement = statement.on_conflict_do_nothing(
+            index_elements=["kind", "dedupe_key"],
+            index_where=text("status = 'queued' AND dedupe_key IS NOT NULL"),
+        )
+    await db.execute(statement)
+
+
+def retry_delay(attempts: int) -> float:
+    """
+    Описание: Задержка перед повтором: экспонента от JOB_RETRY_BASE с потолком JOB_RETRY_MAX
+              и случайным разбросом, чтобы упавшие разом задачи не повторялись разом.
+    """
+    return min(JOB_RETRY_BASE * 2 ** (attempts - 1), JOB_RETRY_MAX) * random.uniform(0.5, 1.0)
+
+
+async def _fail(job_id: int, kind: str, attempts: int, max_attempts: int, error: str, final: bool = False) -> None:
+    exhausted = final or attempts >= max_attempts
+    async with async_session_maker() as db:
+        # dedupe_key снимается: пока задача ждёт повтора, новая постановка с тем же ключом не должна схлопываться
+        failed = await db.execute(update(Job).where(Job.id == job_id, Job.status == "running").values(
+            status="failed" if exhausted else "queued", dedupe_key=None, last_error=error[-2000:],
+            run_at=func.now() + timedelta(seconds=0 if exhausted else retry_delay(attempts)),
+        ))
+        if exhausted and failed.rowcount and kind in PERIODIC_JOBS:
+            # Проваленная периодическая задача не ставит следующую сама: без этого цепочка оборвалась бы
+            # до перезапуска воркера
+            await enqueue(db, kind, dedupe_key=kind, delay=timedelta(seconds=PERIODIC_JOBS[kind]))
+        await db.commit()
+    if exhausted:
+        logger.error(f"Job {job_id} failed after {attempts} attempts: {error}")
+    else:
+        logger.warning(f"Job {job_id} attempt {attempts} failed, will retry: {error}")
+
+
+async def _run_job(job_id: int, kind: str, payload: dict, attempts: int, max_attempts: int) -> None:
+    if attempts > max_attempts:
+        # Аренда истекла на последней попытке - воркер упал или завис посреди обработки
+        await _fail(job_id, kind, attempts - 1, max_attempts, "lease expired", final=True)
+        return
+    handler = HANDLERS.get(kind)
+    if handler is None:
+        await _fail(job_id, kind, attempts, max_attempts, f"no handler for job kind {kind!r}", final=True)
+        return
+    try:
+        async with async_session_maker() as db:
+            await handler(db, payload)
+            await db.execute(delete(Job).where(Job.id == job_id))
+            await db.commit()
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        await _fail(job_id, kind, attempts, max_attempts, f"{type(e).__name__}: {e}")
+
+
+async def process_batch(batch_size: int = JOB_BATCH_SIZE, concurrency: int = JOB_CONCURRENCY) -> int:
+    """
+    Описание: Забирает до batch_size готовых задач и выполняет их, не больше concurrency одновременно.
+    Возвращает:
+        int: сколько задач взято
+    """
+    async with async_session_maker() as db:
+        jobs = (await db.execute(_DEQUEUE_SQL, {"lease": JOB_LEASE_SECONDS, "batch_size": batch_size})).all()
+        await db.commit()
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(job) -> None:
+        async with semaphore:
+            await _run_job(*job)
+
+    await asyncio.gather(*(run(job) for job in jobs))
+    return len(jobs)
+
+
+async def schedule_periodic_jobs() -> None:
+    """
+    Описание: Ставит периодические задачи, у которых нет ожидающего запуска.
+    """
+    async with async_session_maker() as db:
+        for kind in PERIODIC_JOBS:
+            await enqueue(db, kind, dedupe_key=kind)
+        await db.commit()
+
+
+async def run_worker(batch_size: int = JOB_BATCH_SIZE, concurrency: int = JOB_CONCURRENCY,
+                     poll_interval: float = JOB_POLL_INTERVAL) -> None:
+    """
+    Описание: Бесконечный цикл воркера: пока пачки полные, берёт следующую сразу,
+              иначе ждёт poll_interval. Ошибки базы не останавливают цикл.
+    """
+    try:
+        await schedule_periodic_jobs()
+    except (OSError, SQLAlchemyError) as e:
+        logger.error(f"Scheduling periodic jobs failed: {e}")
+    while True:
+        try:
+            taken = await process_batch(batch_size, concurrency)
+        except (OSError, SQLAlchemyError) as e:
+            logger.error(f"Job queue poll failed: {e}")
+            taken = 0
+        if taken < batch_size:
+            await asyncio.sleep(poll_interval)
+
+
+@job_handler("recalculate_rating")
+async def recalculate_rating_job(db: AsyncSession, payload: dict) -> None:
+    """
+    Описание: Пересчитывает средний рейтинг товара после добавления или удаления отзыва.
+    """
+    product_id = payload["product_id"]
+    rating = await recalculate_rating(product_id, db)
+    await db.execute(update(ProductModel).where(ProductModel.id == product_id).values(rating=rating))
+
+
+@job_handler("refresh_related_products")
+async def refresh_related_products_job(db: AsyncSession, payload: dict) -> None:
+    """
+    Описание: Проход инкрементального пересчёта "с этим товаром покупают" по новым заказам.
+              Следующий проход ставится сразу, если заказы ещё остались, иначе через RELATED_REFRESH_INTERVAL.
+    """
+    # numpy и scipy нужны только пересчёту: импорт приложения их не тянет
+    from app.recommendations import refresh_related
+
+    _, more = await refresh_related(db)
+    await enqueue(db, "refresh_related_products", dedupe_key="refresh_related_products",
+                  delay=None if more else timedelta(seconds=RELATED_REFRESH_INTERVAL))
+
+
+@job_handler("refresh_popularity")
+async def refresh_popularity_job(db: AsyncSession, payload: dict) -> None:
+    """
+    Описание: Пачка пересчёта популярности товаров для ранжирования поиска. Следующая пачка ставится сразу
+              с курсором after_id в payload; после последней новый проход - через POPULARITY_REFRESH_INTERVAL.
+    """
+    after_id, changed, more = await refresh_popularity(db, payload.get("after_id", 0))
+    logger.info(f"Popularity refreshed for products <= {after_id}: {changed} changed")
+    await enqueue(db, "refresh_popularity", payload={"after_id": after_id} if more else None,
+                  dedupe_key="refresh_popularity",
+                  delay=None if more else timedelta(seconds=POPULARITY_REFRESH_INTERVAL))
+
+
+@job_handler("refresh_search_terms")
+async def refresh_search_terms_job(db: AsyncSession, payload: dict) -> None:
+    """
+    Описание: Пересборка словаря исправления поисковых запросов; следующая - через SEARCH_TERMS_REFRESH_INTERVAL.
+              Воркеры приложения подхватят словарь при очередной синхронизации.
+    """
+    await rebuild_search_terms(db)
+    await enqueue(db, "refresh_search_terms", dedupe_key="refresh_search_terms",
+                  delay=timedelta(seconds=SEARCH_TERMS_REFRESH_INTERVAL))
+
+
+async def _main(args: argparse.Namespace) -> None:
+    setup_logging()
+    init_engine()
+    try:
+        if args.drain:
+            while await process_batch(args.batch, args.concurrency):
+                pass
+        else:
+            worker = asyncio.create_task(run_worker(args.batch, args.concurrency, args.poll_interval))
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, worker.cancel)
+            logger.info("Job worker started")
+            try:
+                await worker
+            except asyncio.CancelledError:
+                logger.info("Job worker stopped")
+    finally:
+        await dispose_engine()
+        await shutdown_logging()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.jobs", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch", type=int, default=JOB_BATCH_SIZE, help="задач за одну выборку")
+    parser.add_argument("--concurrency", type=int, default=JOB_CONCURRENCY, help="задач одновременно")
+    parser.add_argument("--poll-interval", type=float, default=JOB_POLL_INTERVAL, help="секунд между опросами")
+    parser.add_argument("--drain", action="store_true", help="выполнить готовые задачи и выйти")
+    try:
+        asyncio.run(_main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
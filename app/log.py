@@ -4,10 +4,34 @@ from fastapi import Request
 from fastapi.responses import JSONResponse
 
 
-logger.add("info.log", format="Log: [{extra[log_id]}:{time} - {level} - {message}]", level="INFO", enqueue = True,
-           rotation="10 MB", retention="10 days")
+_sink_id: int | None = None
 
 
+def setup_logging() -> None:
+    """
+    Описание: Подключает файловый sink info.log. Вызывается при старте приложения (lifespan),
+              а не при импорте модуля.
+    """
+    global _sink_id
+    if _sink_id is not None:
+        return
+    # log_id по умолчанию для записей вне HTTP-запроса (старт, фоновые задачи)
+    logger.configure(extra={"log_id": "-"})
+    _sink_id = logger.add("info.log", format="Log: [{extra[log_id]}:{time} - {level} - {message}]", level="INFO",
+                          enqueue=True, rotation="10 MB", retention="10 days")
+
+
+async def shutdown_logging() -> None:
+    """
+    Описание: Дописывает очередь логов и отключает файловый sink при остановке приложения.
+    """
+    global _sink_id
+    if _sink_id is None:
+        return
+    await logger.complete()
+    logger.remove(_sink_id)
+    _sink_id = None
+
 
 async def log_middleware(request:Request, call_next):
     """
@@ -1,22 +1,91 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
+
 from fastapi import FastAPI
-from app.routers import categories, products, users, reviews, cart
-from app.log import log_middleware
+from app.routers import categories, products, users, reviews, cart, inventory, search_analytics
+from app.log import log_middleware, setup_logging, shutdown_logging
+from app.compression import CompressionMiddleware
+from app.ratelimit import RateLimitMiddleware, init_rate_limit_backend, run_rate_limit_sweeper
+from app.db.config import get_settings
+from app.db.database import init_engine, warm_up_pool, dispose_engine
+from app.auth.password import warm_up_hash_pool
+from app.auth.refresh_tokens import run_revocation_sync, sync_revocations
+from app.cache import close_cache, init_cache, run_cache_maintenance
+from app.inventory import run_reservation_sweeper
+from app.jobs import run_worker
+from app.search_analytics import flush_events, run_search_events_writer
+from app.search_query import run_search_terms_sync
+from app.singleflight import SingleFlightMiddleware, run_single_flight_report
+from app.utils import JOBS_IN_APP, RATE_LIMIT_BACKEND, RATE_LIMIT_ENABLED
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Описание: Старт и остановка воркера. Настройки, Engine и файловый лог создаются здесь,
+              а не при импорте модулей; пул соединений прогревается до приёма запросов.
+              Фоновая очистка просроченных резервов склада и синхронизация отозванных refresh-токенов
+              живут вместе с воркером, как и подгрузка словаря исправления поисковых запросов
+              и воркер очереди задач, если он не вынесен в отдельный процесс (JOBS_IN_APP).
+              Журнал поиска пишется фоновой задачей; при остановке остаток буфера дописывается до закрытия пула.
+              Общее хранилище кэша (app.cache) чистится от истёкших записей фоновой задачей.
+              Общие хранилища кэша и лимитов частоты (app.ratelimit) тоже создаются здесь.
+    """
+    setup_logging()
+    init_engine()
+    init_cache()
+    if RATE_LIMIT_ENABLED:
+        init_rate_limit_backend()
+    await warm_up_pool(get_settings().DB_POOL_WARMUP)
+    # Фильтр отозванных refresh-семейств должен быть загружен до первого запроса
+    await sync_revocations(full=True)
+    await warm_up_hash_pool()
+    background = [asyncio.create_task(run_reservation_sweeper()), asyncio.create_task(run_revocation_sync()),
+                  asyncio.create_task(run_search_terms_sync()), asyncio.create_task(run_search_events_writer()),
+                  asyncio.create_task(run_single_flight_report()), asyncio.create_task(run_cache_maintenance())]
+    if JOBS_IN_APP:
+        background.append(asyncio.create_task(run_worker()))
+    if RATE_LIMIT_ENABLED and RATE_LIMIT_BACKEND == "postgres":
+        background.append(asyncio.create_task(run_rate_limit_sweeper()))
+    yield
+    for task in background:
+        task.cancel()
+    for task in background:
+        with suppress(asyncio.CancelledError):
+            await task
+    await flush_events()
+    await close_cache()
+    await dispose_engine()
+    await shutdown_logging()
+
 
 # Создаём приложение FastAPI
 app = FastAPI(
     title="FastAPI Интернет-магазин",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
+# Одинаковые одновременные GET каталога выполняются один раз - внутренний слой, под логированием и сжатием
+app.add_middleware(SingleFlightMiddleware)
+
 # Подключаем логи
 app.middleware("http")(log_middleware)
 
+# Сжатие ответов по Accept-Encoding (zstd / br / gzip)
+app.add_middleware(CompressionMiddleware)
+
+# Лимиты частоты запросов - внешний слой: отклонённый запрос не доходит до остальных middleware
+app.add_middleware(RateLimitMiddleware)
+
 # Подключаем маршруты категорий
 app.include_router(categories.router)
 app.include_router(products.router)
 app.include_router(users.router)
 app.include_router(reviews.router)
 app.include_router(cart.router)
+app.include_router(inventory.router)
+app.include_router(search_analytics.router)
 
 
 # Корневой эндпоинт для проверки
@@ -0,0 +1,43 @@
+"""Skip no-op category updates in listing sync
+
+Revision ID: 30dee40e3004
+Revises: 1e5039847db6
+Create Date: 2026-10-19 11:19:23.762663
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '30dee40e3004'
+down_revision: Union[str, Sequence[str], None] = '1e5039847db6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # UPDATE OF срабатывает на любое присваивание колонки, даже тем же значением:
+    # пересчёт витрины поддерева запускается только при реальном изменении
+    op.execute("DROP TRIGGER product_listing_categories_sync ON categories")
+    op.execute("""
+        CREATE CONSTRAINT TRIGGER product_listing_categories_sync
+        AFTER UPDATE OF name, parent_id, is_active ON categories
+        DEFERRABLE INITIALLY DEFERRED
+        FOR EACH ROW
+        WHEN ((OLD.name, OLD.parent_id, OLD.is_active) IS DISTINCT FROM (NEW.name, NEW.parent_id, NEW.is_active))
+        EXECUTE FUNCTION product_listing_categories_sync()
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER product_listing_categories_sync ON categories")
+    op.execute("""
+        CREATE CONSTRAINT TRIGGER product_listing_categories_sync
+        AFTER UPDATE OF name, parent_id, is_active ON categories
+        DEFERRABLE INITIALLY DEFERRED
+        FOR EACH ROW EXECUTE FUNCTION product_listing_categories_sync()
+    """)
@@ -0,0 +1,54 @@
+"""Create category closure table
+
+Revision ID: 4c1e8f2a7b90
+Revises: 9b2478fd98c1
+Create Date: 2026-10-19 09:20:11.402315
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4c1e8f2a7b90'
+down_revision: Union[str, Sequence[str], None] = '9b2478fd98c1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('category_closure',
+    sa.Column('ancestor_id', sa.Integer(), nullable=False),
+    sa.Column('descendant_id', sa.Integer(), nullable=False),
+    sa.Column('depth', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['ancestor_id'], ['categories.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['descendant_id'], ['categories.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('ancestor_id', 'descendant_id')
+    )
+    op.create_index(op.f('ix_category_closure_descendant_id'), 'category_closure', ['descendant_id'], unique=False)
+
+    # Заполняем замыкание для существующих категорий: пути спускаются только через активные категории.
+    # Раньше проверялась только ссылка на саму себя, поэтому возможные циклы отсекаются через CYCLE
+    op.execute("""
+        INSERT INTO category_closure (ancestor_id, descendant_id, depth)
+        WITH RECURSIVE paths(ancestor_id, descendant_id, depth) AS (
+            SELECT id, id, 0 FROM categories
+            UNION ALL
+            SELECT p.ancestor_id, c.id, p.depth + 1
+            FROM paths p
+            JOIN categories c ON c.parent_id = p.descendant_id
+            WHERE c.is_active
+        ) CYCLE descendant_id SET is_cycle USING path
+        SELECT ancestor_id, descendant_id, min(depth) FROM paths
+        WHERE NOT is_cycle
+        GROUP BY ancestor_id, descendant_id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_category_closure_descendant_id'), table_name='category_closure')
+    op.drop_table('category_closure')
@@ -0,0 +1,31 @@
+"""Add active reviews product index
+
+Revision ID: a72b98e014d9
+Revises: 30dee40e3004
+Create Date: 2026-10-19 11:34:52.770448
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a72b98e014d9'
+down_revision: Union[str, Sequence[str], None] = '30dee40e3004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY не блокирует запись в reviews на время построения, но не работает внутри транзакции
+    with op.get_context().autocommit_block():
+        op.create_index('ix_reviews_active_product_id', 'reviews', ['product_id'], unique=False, postgresql_where=sa.text('is_active'), postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_reviews_active_product_id', table_name='reviews', postgresql_where=sa.text('is_active'), postgresql_concurrently=True)
@@ -0,0 +1,67 @@
+"""Add stock reservations and low stock events
+
+Revision ID: b7d3e5a1c6f2
+Revises: 4c1e8f2a7b90
+Create Date: 2026-10-19 10:02:37.118904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d3e5a1c6f2'
+down_revision: Union[str, Sequence[str], None] = '4c1e8f2a7b90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('stock_reservations',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.CheckConstraint('quantity > 0', name='ck_stock_reservations_quantity_positive'),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'product_id', name='uq_stock_reservations_user_product')
+    )
+    op.create_index(op.f('ix_stock_reservations_expires_at'), 'stock_reservations', ['expires_at'], unique=False)
+    op.create_index(op.f('ix_stock_reservations_product_id'), 'stock_reservations', ['product_id'], unique=False)
+    op.create_table('low_stock_events',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('seller_id', sa.Integer(), nullable=False),
+    sa.Column('stock', sa.Integer(), nullable=False),
+    sa.Column('threshold', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['seller_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_low_stock_events_seller_id_id', 'low_stock_events', ['seller_id', 'id'], unique=False)
+
+    # Ограничение добавляется как NOT VALID и проверяется отдельно,
+    # чтобы не держать эксклюзивную блокировку products на время полного прохода по таблице.
+    # autocommit_block сначала фиксирует транзакцию миграции (и снимает ACCESS EXCLUSIVE от ADD CONSTRAINT),
+    # VALIDATE идёт уже вне её и берёт только SHARE UPDATE EXCLUSIVE - запись в products не блокируется
+    op.execute("ALTER TABLE products ADD CONSTRAINT ck_products_stock_nonnegative CHECK (stock >= 0) NOT VALID")
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TABLE products VALIDATE CONSTRAINT ck_products_stock_nonnegative")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('ck_products_stock_nonnegative', 'products', type_='check')
+    op.drop_index('ix_low_stock_events_seller_id_id', table_name='low_stock_events')
+    op.drop_table('low_stock_events')
+    op.drop_index(op.f('ix_stock_reservations_product_id'), table_name='stock_reservations')
+    op.drop_index(op.f('ix_stock_reservations_expires_at'), table_name='stock_reservations')
+    op.drop_table('stock_reservations')
@@ -0,0 +1,181 @@
+"""Create product listing read model
+
+Revision ID: d41f0c9e7a3b
+Revises: b7d3e5a1c6f2
+Create Date: 2026-10-19 10:41:52.603177
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41f0c9e7a3b'
+down_revision: Union[str, Sequence[str], None] = 'b7d3e5a1c6f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('product_listing',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('description', sa.String(length=500), nullable=True),
+    sa.Column('price', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('image_url', sa.String(length=200), nullable=True),
+    sa.Column('stock', sa.Integer(), nullable=False),
+    sa.Column('is_active', sa.Boolean(), nullable=False),
+    sa.Column('category_id', sa.Integer(), nullable=False),
+    sa.Column('seller_id', sa.Integer(), nullable=False),
+    sa.Column('rating', sa.Float(), nullable=False),
+    sa.Column('category_path', postgresql.ARRAY(sa.String(length=50)), nullable=False),
+    sa.Column('category_active', sa.Boolean(), nullable=False),
+    sa.Column('seller_active', sa.Boolean(), nullable=False),
+    sa.Column('visible', sa.Boolean(), sa.Computed('is_active AND category_active AND seller_active', persisted=True), nullable=True),
+    sa.Column('tsv', postgresql.TSVECTOR(), nullable=False),
+    sa.ForeignKeyConstraint(['id'], ['products.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+    # Пересборка строк модели чтения по списку товаров: одна точка правды для триггеров и бэкфилла
+    op.execute("""
+        CREATE FUNCTION product_listing_refresh(product_ids integer[]) RETURNS void
+        LANGUAGE sql AS $$
+            INSERT INTO product_listing (id, name, description, price, image_url, stock, is_active, category_id,
+                                         seller_id, rating, category_path, category_active, seller_active, tsv)
+            SELECT p.id, p.name, p.description, p.price, p.image_url, p.stock, coalesce(p.is_active, false),
+                   p.category_id, p.seller_id, coalesce(p.rating, 0), path.names, coalesce(c.is_active, false),
+                   coalesce(u.is_active, false),
+                   p.tsv || setweight(to_tsvector('simple', array_to_string(path.names, ' ')), 'C')
+                         || setweight(to_tsvector('russian', array_to_string(path.names, ' ')), 'C')
+            FROM products p
+            JOIN categories c ON c.id = p.category_id
+            JOIN users u ON u.id = p.seller_id
+            CROSS JOIN LATERAL (
+                SELECT coalesce(array_agg(a.name ORDER BY cc.depth DESC), '{}') AS names
+                FROM category_closure cc
+                JOIN categories a ON a.id = cc.ancestor_id
+                WHERE cc.descendant_id = p.category_id
+            ) AS path
+            WHERE p.id IN (SELECT unnest(product_ids))
+            ON CONFLICT (id) DO UPDATE SET
+                name = EXCLUDED.name, description = EXCLUDED.description, price = EXCLUDED.price,
+                image_url = EXCLUDED.image_url, stock = EXCLUDED.stock, is_active = EXCLUDED.is_active,
+                category_id = EXCLUDED.category_id, seller_id = EXCLUDED.seller_id, rating = EXCLUDED.rating,
+                category_path = EXCLUDED.category_path, category_active = EXCLUDED.category_active,
+                seller_active = EXCLUDED.seller_active, tsv = EXCLUDED.tsv
+        $$
+    """)
+
+    # Товары: триггеры уровня оператора с таблицами переходов - массовый импорт и PATCH /products/bulk
+    # пересобирают строки одним запросом, а не по запросу на строку
+    op.execute("""
+        CREATE FUNCTION product_listing_products_insert() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            PERFORM product_listing_refresh(ARRAY(SELECT id FROM new_rows));
+            RETURN NULL;
+        END
+        $$
+    """)
+    op.execute("""
+        CREATE FUNCTION product_listing_products_update() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            -- Изменился только остаток (горячий путь списаний): без пересчёта пути категории и tsvector
+            UPDATE product_listing AS l SET stock = n.stock
+            FROM new_rows n JOIN old_rows o ON o.id = n.id
+            WHERE l.id = n.id AND n.stock IS DISTINCT FROM o.stock
+              AND (n.name, n.description, n.price, n.image_url, n.is_active, n.category_id, n.seller_id, n.rating)
+                  IS NOT DISTINCT FROM
+                  (o.name, o.description, o.price, o.image_url, o.is_active, o.category_id, o.seller_id, o.rating);
+            PERFORM product_listing_refresh(ARRAY(
+                SELECT n.id FROM new_rows n JOIN old_rows o ON o.id = n.id
+                WHERE (n.name, n.description, n.price, n.image_url, n.is_active, n.category_id, n.seller_id, n.rating)
+                      IS DISTINCT FROM
+                      (o.name, o.description, o.price, o.image_url, o.is_active, o.category_id, o.seller_id, o.rating)
+            ));
+            RETURN NULL;
+        END
+        $$
+    """)
+    op.execute("""
+        CREATE TRIGGER product_listing_products_insert AFTER INSERT ON products
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION product_listing_products_insert()
+    """)
+    op.execute("""
+        CREATE TRIGGER product_listing_products_update AFTER UPDATE ON products
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION product_listing_products_update()
+    """)
+
+    # Категории: отложенный до фиксации транзакции триггер - к этому моменту приложение
+    # уже перестроило category_closure (перенос или отсоединение поддерева)
+    op.execute("""
+        CREATE FUNCTION product_listing_categories_sync() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            PERFORM product_listing_refresh(ARRAY(
+                SELECT p.id FROM products p
+                WHERE p.category_id IN (SELECT descendant_id FROM category_closure WHERE ancestor_id = NEW.id)
+            ));
+            RETURN NULL;
+        END
+        $$
+    """)
+    op.execute("""
+        CREATE CONSTRAINT TRIGGER product_listing_categories_sync
+        AFTER UPDATE OF name, parent_id, is_active ON categories
+        DEFERRABLE INITIALLY DEFERRED
+        FOR EACH ROW EXECUTE FUNCTION product_listing_categories_sync()
+    """)
+
+    op.execute("""
+        CREATE FUNCTION product_listing_users_sync() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            UPDATE product_listing SET seller_active = coalesce(NEW.is_active, false) WHERE seller_id = NEW.id;
+            RETURN NULL;
+        END
+        $$
+    """)
+    op.execute("""
+        CREATE TRIGGER product_listing_users_sync
+        AFTER UPDATE OF is_active ON users
+        FOR EACH ROW WHEN (OLD.is_active IS DISTINCT FROM NEW.is_active)
+        EXECUTE FUNCTION product_listing_users_sync()
+    """)
+
+    # Бэкфилл до создания индексов - так быстрее, чем поддерживать их построчно
+    op.execute("SELECT product_listing_refresh(ARRAY(SELECT id FROM products))")
+
+    op.create_index('ix_product_listing_visible_id', 'product_listing', ['id'], unique=False, postgresql_where=sa.text('visible'))
+    op.create_index('ix_product_listing_category_id', 'product_listing', ['category_id', 'id'], unique=False, postgresql_include=['price', 'stock'], postgresql_where=sa.text('visible'))
+    op.create_index('ix_product_listing_seller_id', 'product_listing', ['seller_id', 'id'], unique=False, postgresql_where=sa.text('visible'))
+    op.create_index('ix_product_listing_price', 'product_listing', ['price', 'id'], unique=False, postgresql_where=sa.text('visible'))
+    op.create_index('ix_product_listing_tsv_gin', 'product_listing', ['tsv'], unique=False, postgresql_using='gin', postgresql_where=sa.text('visible'))
+    op.execute("ANALYZE product_listing")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER product_listing_users_sync ON users")
+    op.execute("DROP TRIGGER product_listing_categories_sync ON categories")
+    op.execute("DROP TRIGGER product_listing_products_update ON products")
+    op.execute("DROP TRIGGER product_listing_products_insert ON products")
+    op.execute("DROP FUNCTION product_listing_users_sync()")
+    op.execute("DROP FUNCTION product_listing_categories_sync()")
+    op.execute("DROP FUNCTION product_listing_products_update()")
+    op.execute("DROP FUNCTION product_listing_products_insert()")
+    op.execute("DROP FUNCTION product_listing_refresh(integer[])")
+    op.drop_index('ix_product_listing_tsv_gin', table_name='product_listing', postgresql_using='gin', postgresql_where=sa.text('visible'))
+    op.drop_index('ix_product_listing_price', table_name='product_listing', postgresql_where=sa.text('visible'))
+    op.drop_index('ix_product_listing_seller_id', table_name='product_listing', postgresql_where=sa.text('visible'))
+    op.drop_index('ix_product_listing_category_id', table_name='product_listing', postgresql_include=['price', 'stock'], postgresql_where=sa.text('visible'))
+    op.drop_index('ix_product_listing_visible_id', table_name='product_listing', postgresql_where=sa.text('visible'))
+    op.drop_table('product_listing')
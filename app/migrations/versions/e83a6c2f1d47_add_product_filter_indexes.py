@@ -0,0 +1,37 @@
+"""Add partial composite indexes for product filters
+
+Revision ID: e83a6c2f1d47
+Revises: d41f0c9e7a3b
+Create Date: 2026-10-19 11:27:05.481223
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e83a6c2f1d47'
+down_revision: Union[str, Sequence[str], None] = 'd41f0c9e7a3b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY не блокирует запись в products на время построения, но не работает внутри транзакции
+    with op.get_context().autocommit_block():
+        op.create_index('ix_products_active_id', 'products', ['id'], unique=False, postgresql_where=sa.text('is_active'), postgresql_concurrently=True)
+        op.create_index('ix_products_active_category_id', 'products', ['category_id', 'id'], unique=False, postgresql_where=sa.text('is_active'), postgresql_concurrently=True)
+        op.create_index('ix_products_active_seller_id', 'products', ['seller_id', 'id'], unique=False, postgresql_where=sa.text('is_active'), postgresql_concurrently=True)
+        op.create_index('ix_products_active_price', 'products', ['price', 'id'], unique=False, postgresql_where=sa.text('is_active'), postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_products_active_price', table_name='products', postgresql_where=sa.text('is_active'), postgresql_concurrently=True)
+        op.drop_index('ix_products_active_seller_id', table_name='products', postgresql_where=sa.text('is_active'), postgresql_concurrently=True)
+        op.drop_index('ix_products_active_category_id', table_name='products', postgresql_where=sa.text('is_active'), postgresql_concurrently=True)
+        op.drop_index('ix_products_active_id', table_name='products', postgresql_where=sa.text('is_active'), postgresql_concurrently=True)
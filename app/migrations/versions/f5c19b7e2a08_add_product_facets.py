@@ -0,0 +1,112 @@
+"""Add product facet counters
+
+Revision ID: f5c19b7e2a08
+Revises: e83a6c2f1d47
+Create Date: 2026-10-19 12:08:44.915360
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f5c19b7e2a08'
+down_revision: Union[str, Sequence[str], None] = 'e83a6c2f1d47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('product_facets',
+    sa.Column('facet', sa.String(length=20), nullable=False),
+    sa.Column('value', sa.Integer(), nullable=False),
+    sa.Column('products', sa.Integer(), nullable=False),
+    sa.Column('in_stock', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('facet', 'value')
+    )
+
+    # Границы ценовых корзин совпадают с app.facets.PRICE_BUCKET_BOUNDS
+    op.execute("""
+        CREATE FUNCTION product_price_bucket(price numeric) RETURNS integer
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+            SELECT width_bucket(price, '{500,1000,2500,5000,10000,25000,50000,100000}'::numeric[])
+        $$
+    """)
+
+    # Счётчики меняются по таблицам переходов product_listing: строки из new_rows прибавляются,
+    # из old_rows вычитаются, нулевые дельты (например, списание остатка без обнуления) не пишутся
+    op.execute("""
+        CREATE FUNCTION product_facets_sync() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        DECLARE
+            added text := 'SELECT category_id, seller_id, price, (stock > 0)::integer, 1
+                           FROM new_rows WHERE visible';
+            removed text := 'SELECT category_id, seller_id, price, (stock > 0)::integer, -1
+                             FROM old_rows WHERE visible';
+        BEGIN
+            -- В INSERT-триггере нет old_rows, в DELETE - new_rows: источник дельты подставляется динамически
+            EXECUTE format($sql$
+                WITH delta (category_id, seller_id, price, in_stock, sign) AS (%s)
+                INSERT INTO product_facets AS f (facet, value, products, in_stock)
+                SELECT facet, value, sum(sign), sum(sign * in_stock)
+                FROM (
+                    SELECT 'category' AS facet, category_id AS value, sign, in_stock FROM delta
+                    UNION ALL
+                    SELECT 'price', product_price_bucket(price), sign, in_stock FROM delta
+                    UNION ALL
+                    SELECT 'seller', seller_id, sign, in_stock FROM delta
+                ) AS d
+                GROUP BY facet, value
+                HAVING sum(sign) <> 0 OR sum(sign * in_stock) <> 0
+                -- Единый порядок блокировок строк счётчиков между конкурентными транзакциями
+                ORDER BY facet, value
+                ON CONFLICT (facet, value) DO UPDATE
+                    SET products = f.products + EXCLUDED.products, in_stock = f.in_stock + EXCLUDED.in_stock
+            $sql$, CASE TG_OP WHEN 'INSERT' THEN added
+                              WHEN 'DELETE' THEN removed
+                              ELSE added || ' UNION ALL ' || removed END);
+            RETURN NULL;
+        END
+        $$
+    """)
+    op.execute("""
+        CREATE TRIGGER product_facets_insert AFTER INSERT ON product_listing
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION product_facets_sync()
+    """)
+    op.execute("""
+        CREATE TRIGGER product_facets_update AFTER UPDATE ON product_listing
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION product_facets_sync()
+    """)
+    op.execute("""
+        CREATE TRIGGER product_facets_delete AFTER DELETE ON product_listing
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION product_facets_sync()
+    """)
+
+    op.execute("""
+        INSERT INTO product_facets (facet, value, products, in_stock)
+        SELECT facet, value, count(*), count(*) FILTER (WHERE stock > 0)
+        FROM (
+            SELECT 'category' AS facet, category_id AS value, stock FROM product_listing WHERE visible
+            UNION ALL
+            SELECT 'price', product_price_bucket(price), stock FROM product_listing WHERE visible
+            UNION ALL
+            SELECT 'seller', seller_id, stock FROM product_listing WHERE visible
+        ) AS d
+        GROUP BY facet, value
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER product_facets_delete ON product_listing")
+    op.execute("DROP TRIGGER product_facets_update ON product_listing")
+    op.execute("DROP TRIGGER product_facets_insert ON product_listing")
+    op.execute("DROP FUNCTION product_facets_sync()")
+    op.execute("DROP FUNCTION product_price_bucket(numeric)")
+    op.drop_table('product_facets')
@@ -1,8 +1,20 @@
+from .cache_entries import CacheEntry
 from .cart_items import CartItem
-from .categories import Category
+from .categories import Category, CategoryClosure
+from .inventory import StockReservation, LowStockEvent
+from .jobs import Job
 from .orders import Order, OrderItem
 from .products import Product
+from .product_listing import ProductListing, ProductFacet
+from .rate_limits import RateLimitBucket
+from .recommendations import ProductRelated, ProductRelatedState
+from .refresh_tokens import RefreshTokenFamily
 from .reviews import Review
+from .search_events import SearchEvent
+from .search_terms import SearchTerm
 from .users import User
 
-__all__ = ["User", "Category", "Product", "Review", "CartItem", "Order", "OrderItem"]
+__all__ = ["User", "Category", "CategoryClosure", "Product", "Review", "CartItem", "Order", "OrderItem",
+           "StockReservation", "LowStockEvent", "ProductListing", "ProductFacet",
+           "Job", "RefreshTokenFamily", "RateLimitBucket",
+           "ProductRelated", "ProductRelatedState", "SearchTerm", "SearchEvent", "CacheEntry"]
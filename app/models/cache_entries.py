@@ -0,0 +1,26 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime, Index, LargeBinary, String, Text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.database import Base
+
+
+class CacheEntry(Base):
+    """
+    Запись общего кэша (CACHE_BACKEND=postgres, app.cache): ключ - "<пространство>:<ключ>",
+    значение - msgpack, tags - теги для инвалидации ("product:12", "category:3").
+    Таблица UNLOGGED: кэш не стоит записи в WAL и после сбоя сервера просто начинается пустым.
+    """
+    __tablename__ = "cache_entries"
+    __table_args__ = (
+        Index("ix_cache_entries_tags", "tags", postgresql_using="gin"),
+        Index("ix_cache_entries_expires_at", "expires_at"),
+        {"prefixes": ["UNLOGGED"]},
+    )
+
+    key: Mapped[str] = mapped_column(String(250), primary_key=True)
+    value: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    tags: Mapped[list[str]] = mapped_column(ARRAY(Text), nullable=False, server_default="{}")
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
@@ -1,6 +1,6 @@
 from typing import List, Optional
 
-from sqlalchemy import String, Boolean, ForeignKey
+from sqlalchemy import String, Boolean, ForeignKey, Integer
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.database import Base
@@ -19,10 +19,17 @@ class Category(Base):
     children: Mapped[List["Category"]] = relationship(back_populates="parent")
 
 
-
-
-
-
-
-
-
+class CategoryClosure(Base):
+    """
+    Таблица замыкания дерева категорий: по строке на каждую пару (предок, потомок),
+    включая саму категорию (depth = 0). Позволяет выбрать всё поддерево одним
+    индексированным запросом вместо рекурсии.
+    Связи ведут только через активные категории: при мягком удалении поддерево
+    отсоединяется от предков удалённой категории.
+    """
+    __tablename__ = "category_closure"
+
+    ancestor_id: Mapped[int] = mapped_column(ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True)
+    descendant_id: Mapped[int] = mapped_column(ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True,
+                                               index=True)
+    depth: Mapped[int] = mapped_column(Integer, nullable=False)
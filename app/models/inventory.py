@@ -0,0 +1,47 @@
+from datetime import datetime
+
+from sqlalchemy import BigInteger, CheckConstraint, DateTime, ForeignKey, Index, Integer, UniqueConstraint, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.database import Base
+
+
+class StockReservation(Base):
+    """
+    Резерв остатка под корзину на время оформления заказа.
+    Количество уже списано с products.stock; пока резерв не истёк, его никто
+    другой не купит. Просроченные резервы возвращает на склад фоновый sweeper.
+    """
+    __tablename__ = "stock_reservations"
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "product_id", name="uq_stock_reservations_user_product"),
+        CheckConstraint("quantity > 0", name="ck_stock_reservations_quantity_positive"),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    product_id: Mapped[int] = mapped_column(ForeignKey("products.id", ondelete="CASCADE"), nullable=False, index=True)
+    quantity: Mapped[int] = mapped_column(Integer, nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, index=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class LowStockEvent(Base):
+    """
+    Событие "остаток опустился до порога" для ленты продавца.
+    Пишется в той же транзакции, что и списание, только при пересечении порога
+    сверху вниз, поэтому на один товар не копится по событию на каждую продажу.
+    """
+    __tablename__ = "low_stock_events"
+
+    __table_args__ = (
+        Index("ix_low_stock_events_seller_id_id", "seller_id", "id"),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    product_id: Mapped[int] = mapped_column(ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
+    seller_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    stock: Mapped[int] = mapped_column(Integer, nullable=False)
+    threshold: Mapped[int] = mapped_column(Integer, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
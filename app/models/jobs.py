@@ -0,0 +1,37 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import BigInteger, DateTime, Index, Integer, String, Text, func, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.database import Base
+
+
+class Job(Base):
+    """
+    Задача фоновой очереди (outbox): добавляется в той же транзакции, что и бизнес-запись,
+    и выполняется воркером app.jobs после фиксации.
+    status: queued - ждёт run_at; running - взята воркером, run_at - срок аренды, после которого
+    задачу заберёт другой воркер; failed - исчерпаны попытки. Выполненные задачи удаляются.
+    """
+    __tablename__ = "jobs"
+
+    __table_args__ = (
+        # Выборка очереди: только живые задачи в порядке готовности
+        Index("ix_jobs_ready", "run_at", "id", postgresql_where=text("status IN ('queued', 'running')")),
+        # Одна ожидающая задача на ключ: повторная постановка до начала выполнения схлопывается
+        Index("uq_jobs_queued_dedupe", "kind", "dedupe_key", unique=True,
+              postgresql_where=text("status = 'queued' AND dedupe_key IS NOT NULL")),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    kind: Mapped[str] = mapped_column(String(50), nullable=False)
+    payload: Mapped[dict] = mapped_column(JSONB, nullable=False, server_default=text("'{}'::jsonb"))
+    dedupe_key: Mapped[Optional[str]] = mapped_column(String(100))
+    status: Mapped[str] = mapped_column(String(20), nullable=False, server_default="queued")
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+    max_attempts: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("5"))
+    run_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    last_error: Mapped[Optional[str]] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -0,0 +1,65 @@
+from decimal import Decimal
+from typing import Optional
+
+from sqlalchemy import String, Float, Integer, Boolean, ForeignKey, Computed, Index, Numeric, REAL, text
+from sqlalchemy.dialects.postgresql import ARRAY, TSVECTOR
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.database import Base
+
+
+class ProductListing(Base):
+    """
+    Денормализованная модель чтения для списков товаров: поля товара плюс всё,
+    что раньше добиралось соединениями - путь категории, активность категории и продавца,
+    рейтинг и поисковый вектор с названиями категорий.
+    Пишется триггерами БД (миграция d41f0c9e7a3b) в той же транзакции, что и исходные таблицы:
+    товары - сразу, изменения категорий - при фиксации транзакции. Исключение - popularity.
+    """
+    __tablename__ = "product_listing"
+
+    id: Mapped[int] = mapped_column(ForeignKey("products.id", ondelete="CASCADE"), primary_key=True,
+                                    autoincrement=False)
+    name: Mapped[str] = mapped_column(String(100), nullable=False)
+    description: Mapped[Optional[str]] = mapped_column(String(500))
+    price: Mapped[Decimal] = mapped_column(Numeric(10, 2), nullable=False)
+    image_url: Mapped[Optional[str]] = mapped_column(String(200))
+    stock: Mapped[int] = mapped_column(Integer, nullable=False)
+    is_active: Mapped[bool] = mapped_column(Boolean, nullable=False)
+    category_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    seller_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    rating: Mapped[float] = mapped_column(Float, nullable=False)
+    # Популярность 0..1 для ранжирования поиска: не триггерами, а задачей refresh_popularity (app.ranking)
+    popularity: Mapped[float] = mapped_column(REAL, nullable=False, server_default=text("0"))
+    # Названия категорий от корня до категории товара
+    category_path: Mapped[list[str]] = mapped_column(ARRAY(String(50)), nullable=False)
+    category_active: Mapped[bool] = mapped_column(Boolean, nullable=False)
+    seller_active: Mapped[bool] = mapped_column(Boolean, nullable=False)
+    # Товар показывается в каталоге: активен сам, его категория и продавец
+    visible: Mapped[bool] = mapped_column(Boolean, Computed("is_active AND category_active AND seller_active",
+                                                            persisted=True))
+    tsv: Mapped[TSVECTOR] = mapped_column(TSVECTOR, nullable=False)
+
+    __table_args__ = (
+        # Все индексы частичные по visible: в каталог попадают только видимые товары
+        Index("ix_product_listing_visible_id", "id", postgresql_where=text("visible")),
+        Index("ix_product_listing_category_id", "category_id", "id", postgresql_include=["price", "stock"],
+              postgresql_where=text("visible")),
+        Index("ix_product_listing_seller_id", "seller_id", "id", postgresql_where=text("visible")),
+        Index("ix_product_listing_price", "price", "id", postgresql_where=text("visible")),
+        Index("ix_product_listing_tsv_gin", "tsv", postgresql_using="gin", postgresql_where=text("visible")),
+    )
+
+
+class ProductFacet(Base):
+    """
+    Счётчики видимых товаров для фасетов каталога: facet - "category", "price" или "seller",
+    value - ID категории (без учёта подкатегорий), номер ценовой корзины или ID продавца.
+    Пишется триггерами на product_listing (миграция f5c19b7e2a08).
+    """
+    __tablename__ = "product_facets"
+
+    facet: Mapped[str] = mapped_column(String(20), primary_key=True)
+    value: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    products: Mapped[int] = mapped_column(Integer, nullable=False)
+    in_stock: Mapped[int] = mapped_column(Integer, nullable=False)
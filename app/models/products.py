@@ -1,7 +1,7 @@
 from decimal import Decimal
 from typing import Optional
 
-from sqlalchemy import String, Float, Integer, Boolean, ForeignKey, text, Computed, Index, Numeric
+from sqlalchemy import String, Float, Integer, Boolean, ForeignKey, text, Computed, Index, Numeric, CheckConstraint
 from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -38,10 +38,19 @@ class Product(Base):
     order_items: Mapped[list["OrderItem"]] = relationship("OrderItem", back_populates="product")
 
     __table_args__ = (
+        # Защита от перепродажи на уровне БД: остаток не может уйти в минус
+        CheckConstraint("stock >= 0", name="ck_products_stock_nonnegative"),
         Index("ix_products_tsv_gin",
               "tsv",
               postgresql_using="gin",
               postgresql_ops={"name": "gin_trgm_ops"}),
+        # Частичные индексы под фильтры каталога: неактивные товары в них не попадают,
+        # id вторым полем отдаёт страницу уже отсортированной.
+        # stock не индексируется намеренно - иначе списания остатка перестают быть HOT-обновлениями
+        Index("ix_products_active_id", "id", postgresql_where=text("is_active")),
+        Index("ix_products_active_category_id", "category_id", "id", postgresql_where=text("is_active")),
+        Index("ix_products_active_seller_id", "seller_id", "id", postgresql_where=text("is_active")),
+        Index("ix_products_active_price", "price", "id", postgresql_where=text("is_active")),
         # Индекс для триграммного поиска по описанию (опционально)
         # Index(
         #     "ix_products_description_trgm",
@@ -0,0 +1,20 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime, Float, String, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.database import Base
+
+
+class RateLimitBucket(Base):
+    """
+    Корзина токенов общего хранилища лимитов (RATE_LIMIT_BACKEND=postgres), ключ - "<группа>:<user|ip>".
+    Таблица UNLOGGED: состояние лимитов не стоит записи в WAL и может потеряться при сбое сервера.
+    Пишется функцией rate_limit_acquire (миграция 3c9e1f7a4b52).
+    """
+    __tablename__ = "rate_limit_buckets"
+    __table_args__ = {"prefixes": ["UNLOGGED"]}
+
+    key: Mapped[str] = mapped_column(String(200), primary_key=True)
+    tokens: Mapped[float] = mapped_column(Float, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
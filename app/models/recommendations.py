@@ -0,0 +1,34 @@
+from datetime import datetime
+
+from sqlalchemy import BigInteger, DateTime, Integer, SmallInteger, func, text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.database import Base
+
+
+class ProductRelated(Base):
+    """
+    Соседи товара по совместным покупкам ("с этим товаром покупают"): score - в скольких
+    заказах товары встретились вместе. На товар хранится не больше RELATED_STORED_NEIGHBOURS
+    лучших соседей - с запасом над выдачей, чтобы инкрементальный пересчёт не терял
+    кандидатов у границы топа. Пишется задачей refresh_related_products (app.recommendations).
+    """
+    __tablename__ = "product_related"
+
+    # Без внешних ключей: пересчёт переписывает сотни тысяч строк за проход, и проверка FK на каждую
+    # удваивала время записи. Товары удаляются мягко (is_active), невидимые отсекаются при выдаче
+    product_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    related_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    score: Mapped[int] = mapped_column(Integer, nullable=False)
+
+
+class ProductRelatedState(Base):
+    """
+    Водяной знак пересчёта соседей: заказы с id <= last_order_id уже учтены. Одна строка (id = 1),
+    её блокировка сериализует параллельные пересчёты.
+    """
+    __tablename__ = "product_related_state"
+
+    id: Mapped[int] = mapped_column(SmallInteger, primary_key=True, autoincrement=False)
+    last_order_id: Mapped[int] = mapped_column(BigInteger, nullable=False, server_default=text("0"))
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
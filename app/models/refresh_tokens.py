@@ -0,0 +1,30 @@
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import DateTime, ForeignKey, Index, Uuid, func, text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.database import Base
+
+
+class RefreshTokenFamily(Base):
+    """
+    Цепочка refresh-токенов одного входа (семейство): каждый обмен выдаёт новый jti,
+    действителен только последний. Предъявление старого jti - признак кражи токена,
+    семейство отзывается целиком вместе с выданными из него access-токенами (claim fam).
+    Строки удаляются пачками после expires_at (app.auth.refresh_tokens).
+    """
+    __tablename__ = "refresh_token_families"
+
+    __table_args__ = (
+        # Инкрементальная подгрузка отзывов в фильтр воркера
+        Index("ix_refresh_token_families_revoked_at", "revoked_at", postgresql_where=text("revoked_at IS NOT NULL")),
+    )
+
+    family_id: Mapped[uuid.UUID] = mapped_column(Uuid, primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    jti: Mapped[uuid.UUID] = mapped_column(Uuid, nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, index=True)
+    revoked_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
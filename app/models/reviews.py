@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import ForeignKey, Text, DateTime, Boolean, Integer
+from sqlalchemy import ForeignKey, Text, DateTime, Boolean, Index, Integer, text
 from sqlalchemy.orm import mapped_column, Mapped
 
 from app.db.database import Base
@@ -16,3 +16,8 @@ class Review(Base):
     comment_date: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
     grade: Mapped[int] = mapped_column(Integer, nullable=False)
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
+
+    __table_args__ = (
+        # Отзывы товара: пересчёт рейтинга и популярности (app.ranking) по диапазону ID товаров
+        Index("ix_reviews_active_product_id", "product_id", postgresql_where=text("is_active")),
+    )
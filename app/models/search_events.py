@@ -0,0 +1,29 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import BigInteger, DateTime, Float, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.database import Base
+
+
+class SearchEvent(Base):
+    """
+    Журнал поиска: kind "search" - запрос GET /products?search=... (запрос, исправление, число
+    результатов, время ответа), kind "click" - переход к товару из выдачи (GET /products/{id}?search_id=...).
+    Секционирована по дням created_at; секции создаёт и удаляет app.search_analytics. Первичного ключа
+    и индексов нет: таблица только дописывается пачками COPY и читается отчётами по секциям.
+    """
+    __tablename__ = "search_events"
+    __table_args__ = {"postgresql_partition_by": "RANGE (created_at)"}
+    # Для ORM строки различимы по (created_at, search_id, kind); ограничения в базе нет
+    __mapper_args__ = {"primary_key": ["created_at", "search_id", "kind"]}
+
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    search_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    kind: Mapped[str] = mapped_column(String(10), nullable=False)
+    query: Mapped[Optional[str]] = mapped_column(String(200))
+    corrected_query: Mapped[Optional[str]] = mapped_column(String(200))
+    results: Mapped[Optional[int]] = mapped_column(Integer)
+    latency_ms: Mapped[Optional[float]] = mapped_column(Float)
+    product_id: Mapped[Optional[int]] = mapped_column(Integer)
@@ -0,0 +1,15 @@
+from sqlalchemy import Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.database import Base
+
+
+class SearchTerm(Base):
+    """
+    Словарь исправления опечаток в поиске: слова из названий видимых товаров и активных категорий
+    с частотой. Пересобирается задачей refresh_search_terms, воркеры держат его в памяти (app.search_query).
+    """
+    __tablename__ = "search_terms"
+
+    term: Mapped[str] = mapped_column(String(100), primary_key=True)
+    frequency: Mapped[int] = mapped_column(Integer, nullable=False)
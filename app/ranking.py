@@ -0,0 +1,172 @@
+"""
+Ранжирование результатов поиска по каталогу.
+
+Порядок выдачи GET /products?search=... - взвешенная сумма (SEARCH_RANK_WEIGHTS):
+    text       - текстовая релевантность: большее из ранга FTS (ts_rank_cd, приведённого к 0..1)
+                 и триграммной схожести названия
+    popularity - product_listing.popularity, заранее посчитанная популярность 0..1
+    stock      - 1, если товар в наличии: остаток берётся из той же строки и всегда актуален
+Все слагаемые считаются по уже прочитанной строке product_listing, без соединений, поэтому
+стоимость запроса определяет, как и раньше, сам поиск; сверху - арифметика на найденных строках.
+
+Популярность пересчитывает задача очереди refresh_popularity (app.jobs) раз в POPULARITY_REFRESH_INTERVAL
+из трёх сигналов со своими весами (POPULARITY_WEIGHTS):
+    rating  - средняя оценка, сглаженная к 3 звёздам у товаров с малым числом отзывов
+    reviews - число активных отзывов, логарифмически до POPULARITY_REVIEWS_REF
+    sales   - штук продано за POPULARITY_SALES_DAYS дней (кроме отменённых заказов),
+              логарифмически до POPULARITY_SALES_REF
+Пересчёт идёт пачками по POPULARITY_BATCH_SIZE товаров в порядке ID, каждая пачка - своя задача и своя
+транзакция: блокировки строк product_listing держатся доли секунды, а проход по всему каталогу
+не упирается в аренду задачи (JOB_LEASE_SECONDS). Переписываются только строки, у которых популярность изменилась.
+
+Подбор весов - офлайн по журналу запросов: scripts/eval_search_ranking.py.
+"""
+from dataclasses import dataclass, fields
+
+from sqlalchemy import Float, Integer, bindparam, case, func, literal, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.utils import (POPULARITY_BATCH_SIZE, POPULARITY_REVIEWS_REF, POPULARITY_SALES_DAYS, POPULARITY_SALES_REF,
+                       POPULARITY_WEIGHTS, SEARCH_RANK_WEIGHTS)
+
+# Сглаживание оценки: товар без отзывов считается трёхзвёздочным, пять отзывов весят как априорная оценка
+_RATING_PRIOR = 3.0
+_RATING_PRIOR_REVIEWS = 5
+
+# Пачка - товары с ID в (after_id, upper]: отзывы и продажи читаются по индексам product_id только для неё
+_REFRESH_SQL = text("""
+    WITH bounds AS (
+        SELECT max(id) AS upper, count(*) AS taken FROM (
+            SELECT id FROM product_listing WHERE id > :after_id ORDER BY id LIMIT :batch_size
+        ) AS batch
+    ), reviews AS (
+        SELECT product_id, count(*) AS reviews FROM reviews
+        WHERE is_active AND product_id > :after_id AND product_id <= (SELECT upper FROM bounds)
+        GROUP BY product_id
+    ), sales AS (
+        SELECT oi.product_id, sum(oi.quantity) AS units
+        FROM order_items oi
+        JOIN orders o ON o.id = oi.order_id
+        WHERE oi.product_id > :after_id AND oi.product_id <= (SELECT upper FROM bounds)
+            AND o.created_at >= now() - make_interval(days => :sales_days) AND o.status <> 'cancelled'
+        GROUP BY oi.product_id
+    ), scored AS (
+        SELECT l.id, round(((
+              :w_rating * (coalesce(r.reviews, 0) * l.rating + :prior_reviews * :prior_rating)
+                        / (coalesce(r.reviews, 0) + :prior_reviews) / 5
+            + :w_reviews * least(1, ln(1 + coalesce(r.reviews, 0)) / ln(1 + :reviews_ref))
+            + :w_sales * least(1, ln(1 + coalesce(s.units, 0)) / ln(1 + :sales_ref))
+        ) / :w_total)::numeric, 3)::real AS popularity
+        FROM product_listing l
+        LEFT JOIN reviews r ON r.product_id = l.id
+        LEFT JOIN sales s ON s.product_id = l.id
+        WHERE l.id > :after_id AND l.id <= (SELECT upper FROM bounds)
+    ), updated AS (
+        UPDATE product_listing AS l SET popularity = scored.popularity
+        FROM scored
+        WHERE l.id = scored.id AND l.popularity <> scored.popularity
+        RETURNING 1
+    )
+    SELECT upper, taken, (SELECT count(*) FROM updated) FROM bounds
+""").bindparams(
+    # Без типов asyncpg не может вывести тип параметра в арифметике ("unknown * unknown")
+    *(bindparam(name, type_=Float) for name in ("w_rating", "w_reviews", "w_sales", "w_total", "prior_rating")),
+    *(bindparam(name, type_=Integer) for name in ("prior_reviews", "reviews_ref", "sales_ref", "sales_days",
+                                                  "after_id", "batch_size")),
+)
+
+
+@dataclass(frozen=True)
+class SearchWeights:
+    text: float = 1.0
+    popularity: float = 0.0
+    stock: float = 0.0
+
+    @classmethod
+    def parse(cls, value: str) -> "SearchWeights":
+        """
+        Описание: Разбирает веса вида "text=1,popularity=0.3,stock=0.1"; не указанные - по умолчанию.
+        Исключения:
+            ValueError: неизвестный сигнал или некорректный вес
+        """
+        return cls(**_parse_weights(value, cls))
+
+
+@dataclass(frozen=True)
+class PopularityWeights:
+    rating: float = 1.0
+    reviews: float = 1.0
+    sales: float = 1.0
+
+    @classmethod
+    def parse(cls, value: str) -> "PopularityWeights":
+        """
+        Описание: Разбирает веса вида "rating=1,reviews=1,sales=2"; не указанные - по умолчанию.
+        Исключения:
+            ValueError: неизвестный сигнал или некорректный вес
+        """
+        return cls(**_parse_weights(value, cls))
+
+
+def _parse_weights(value: str, cls) -> dict[str, float]:
+    names = {field.name for field in fields(cls)}
+    weights = {}
+    for part in value.split(","):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in names:
+            raise ValueError(f"Unknown ranking signal {name!r}: expected one of {', '.join(sorted(names))}")
+        weights[name] = float(weight)
+    return weights
+
+
+SEARCH_WEIGHTS = SearchWeights.parse(SEARCH_RANK_WEIGHTS)
+SIGNAL_WEIGHTS = PopularityWeights.parse(POPULARITY_WEIGHTS)
+
+
+def search_score(source, rank, word_similarity, weights: SearchWeights = SEARCH_WEIGHTS):
+    """
+    Описание: Выражение порядка выдачи поиска (лучшие - с наибольшим значением).
+    Аргументы:
+        source: ProductModel или ProductListing; у products нет популярности - учитываются текст и остаток
+        rank: ранг FTS, приведённый к 0..1
+        word_similarity: триграммная схожесть названия
+        weights: веса сигналов
+    Возвращает:
+        выражение SQLAlchemy с меткой score
+    """
+    score = literal(weights.text) * func.greatest(rank, word_similarity)
+    if weights.popularity and hasattr(source, "popularity"):
+        score = score + literal(weights.popularity) * source.popularity
+    if weights.stock:
+        score = score + literal(weights.stock) * case((source.stock > 0, 1), else_=0)
+    return score.label("score")
+
+
+async def refresh_popularity(db: AsyncSession, after_id: int = 0, batch_size: int = POPULARITY_BATCH_SIZE,
+                             weights: PopularityWeights = SIGNAL_WEIGHTS) -> tuple[int, int, bool]:
+    """
+    Описание: Пересчитывает product_listing.popularity для пачки из batch_size товаров с ID больше after_id
+              одним запросом в транзакции сессии (commit делает вызывающий).
+    Аргументы:
+        after_id: ID последнего товара предыдущей пачки, 0 - с начала каталога
+        batch_size: товаров в пачке
+        weights: веса сигналов
+    Возвращает:
+        tuple[int, int, bool]: ID последнего товара пачки, у скольких товаров популярность изменилась,
+                               остались ли товары дальше
+    """
+    total = weights.rating + weights.reviews + weights.sales
+    if total <= 0:
+        raise ValueError("POPULARITY_WEIGHTS: at least one weight must be positive")
+    upper, taken, changed = (await db.execute(_REFRESH_SQL, {
+        "w_rating": weights.rating, "w_reviews": weights.reviews, "w_sales": weights.sales, "w_total": total,
+        "prior_rating": _RATING_PRIOR, "prior_reviews": _RATING_PRIOR_REVIEWS,
+        "reviews_ref": POPULARITY_REVIEWS_REF, "sales_ref": POPULARITY_SALES_REF, "sales_days": POPULARITY_SALES_DAYS,
+        "after_id": after_id, "batch_size": batch_size,
+    })).one()
+    if upper is None:
+        return after_id, 0, False
+    return upper, changed, taken == batch_size
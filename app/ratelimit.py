@@ -0,0 +1,275 @@
+"""
+Ограничение частоты запросов (token bucket).
+
+Дорогие группы маршрутов - вход (Argon2 на каждую попытку), обмен refresh-токена и поиск по каталогу -
+получают по корзине токенов на ключ: ID пользователя из access-токена или, без токена, IP клиента.
+Корзина вмещает capacity запросов и пополняется равномерно за period секунд; пустая корзина -
+ответ 429 с Retry-After. Проверка идёт в ASGI middleware до маршрутизации, то есть до сессии БД,
+хеширования пароля и любых запросов приложения.
+
+IP клиента берётся из X-Forwarded-For, только если запрос пришёл от доверенного прокси
+(RATE_LIMIT_TRUSTED_PROXIES; nginx дописывает адрес клиента в конец заголовка): берётся
+самый правый адрес вне доверенных сетей.
+
+Хранилища (RATE_LIMIT_BACKEND):
+    memory   - словарь в процессе: у каждого воркера gunicorn свои корзины, лимит фактически x число воркеров
+    postgres - общая UNLOGGED-таблица rate_limit_buckets, одна функция rate_limit_acquire на проверку
+Если хранилище недоступно, запрос пропускается - лимитер не должен ронять API вместе с базой.
+"""
+import asyncio
+import ipaddress
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import jwt
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from starlette.datastructures import Headers, QueryParams
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.auth.keys import decode_token
+from app.db.database import async_session_maker
+from app.utils import (RATE_LIMIT_BACKEND, RATE_LIMIT_DEFAULT, RATE_LIMIT_ENABLED, RATE_LIMIT_EXPORT, RATE_LIMIT_LOGIN,
+                       RATE_LIMIT_MEMORY_KEYS, RATE_LIMIT_REFRESH, RATE_LIMIT_SEARCH, RATE_LIMIT_SWEEP_INTERVAL,
+                       RATE_LIMIT_TRUSTED_PROXIES)
+
+_ACQUIRE_SQL = text("SELECT allowed, remaining FROM rate_limit_acquire(:key, :capacity, :rate)")
+_SWEEP_SQL = text("DELETE FROM rate_limit_buckets WHERE updated_at < now() - make_interval(secs => :idle)")
+
+
+@dataclass(frozen=True)
+class Limit:
+    capacity: int
+    period: float  # секунд на пополнение пустой корзины
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / self.period
+
+    @classmethod
+    def parse(cls, value: str) -> "Limit | None":
+        """
+        Описание: Разбирает лимит вида "<запросов>/<секунд>", например "10/60". Пустая строка - без лимита.
+        Исключения:
+            ValueError: некорректная запись лимита
+        """
+        if not value:
+            return None
+        capacity, _, period = value.partition("/")
+        return cls(int(capacity), float(period))
+
+
+@dataclass(frozen=True)
+class Rule:
+    """
+    Группа маршрутов с общим лимитом: метод и префикс пути; query_param - группа действует,
+    только если параметр есть и не пуст (поиск); by_ip - ключ всегда IP, даже с токеном.
+    """
+    group: str
+    method: str
+    path: str
+    limit: Limit | None
+    query_param: str | None = None
+    by_ip: bool = False
+
+    def matches(self, scope: Scope) -> bool:
+        if self.limit is None or scope["method"] != self.method or not scope["path"].startswith(self.path):
+            return False
+        if self.query_param is None:
+            return True
+        return bool(QueryParams(scope["query_string"].decode("latin-1")).get(self.query_param, "").strip())
+
+
+RULES = (
+    # До входа пользователя ещё нет, поэтому вход и обмен refresh-токена считаются по IP
+    Rule("login", "POST", "/users/token", Limit.parse(RATE_LIMIT_LOGIN), by_ip=True),
+    Rule("refresh", "POST", "/users/refresh-token", Limit.parse(RATE_LIMIT_REFRESH), by_ip=True),
+    # Выгрузка - COPY всего каталога на соединении БД: несколько раз в минуту на пользователя
+    Rule("export", "GET", "/products/export", Limit.parse(RATE_LIMIT_EXPORT)),
+    Rule("search", "GET", "/products", Limit.parse(RATE_LIMIT_SEARCH), query_param="search"),
+)
+DEFAULT_LIMIT = Limit.parse(RATE_LIMIT_DEFAULT)
+
+
+class MemoryBackend:
+    """
+    Корзины в памяти процесса: ключ -> [токены, время обновления].
+    Хранится не больше max_keys корзин, давно не тронутые вытесняются (как если бы наполнились).
+    """
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MEMORY_KEYS):
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, list[float]] = OrderedDict()
+
+    async def acquire(self, key: str, limit: Limit) -> float:
+        """
+        Описание: Забирает токен из корзины key.
+        Возвращает:
+            float: 0 - запрос разрешён, иначе через сколько секунд в корзине появится токен
+        """
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [float(limit.capacity), now]
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(float(limit.capacity), bucket[0] + (now - bucket[1]) * limit.rate)
+            bucket[1] = now
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0.0
+        return (1 - bucket[0]) / limit.rate
+
+
+class PostgresBackend:
+    """
+    Корзины в общей UNLOGGED-таблице (миграция с функцией rate_limit_acquire): пополнение
+    и списание выполняются под блокировкой строки одним вызовом функции.
+    """
+
+    async def acquire(self, key: str, limit: Limit) -> float:
+        async with async_session_maker() as db:
+            allowed, remaining = (await db.execute(_ACQUIRE_SQL, {"key": key, "capacity": limit.capacity,
+                                                                 "rate": limit.rate})).one()
+            await db.commit()
+        return 0.0 if allowed else (1 - remaining) / limit.rate
+
+    async def sweep(self, idle: float) -> int:
+        """
+        Описание: Удаляет корзины, не тронутые дольше idle секунд.
+        """
+        async with async_session_maker() as db:
+            result = await db.execute(_SWEEP_SQL, {"idle": idle})
+            await db.commit()
+        return result.rowcount
+
+
+BACKENDS = {"memory": MemoryBackend, "postgres": PostgresBackend}
+# Хранилище процесса создаётся в lifespan (init_rate_limit_backend), а не при импорте;
+# общее для middleware и фоновой очистки
+_backend: MemoryBackend | PostgresBackend | None = None
+
+
+def init_rate_limit_backend(name: str = RATE_LIMIT_BACKEND) -> MemoryBackend | PostgresBackend:
+    """
+    Описание: Создаёт хранилище корзин процесса. Повторный вызов возвращает уже созданное.
+    Аргументы:
+        name: ключ BACKENDS (RATE_LIMIT_BACKEND)
+    Возвращает:
+        MemoryBackend | PostgresBackend: хранилище процесса
+    Исключения:
+        ValueError: неизвестное хранилище - воркер не стартует с опечаткой в настройке
+    """
+    global _backend
+    if _backend is None:
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown RATE_LIMIT_BACKEND {name!r}, expected one of: {', '.join(BACKENDS)}")
+        _backend = BACKENDS[name]()
+    return _backend
+
+
+def get_backend() -> MemoryBackend | PostgresBackend:
+    """
+    Описание: Возвращает хранилище процесса, создавая его при необходимости.
+    """
+    return _backend or init_rate_limit_backend()
+
+
+def parse_networks(value: str) -> tuple:
+    return tuple(ipaddress.ip_network(part.strip(), strict=False) for part in value.split(",") if part.strip())
+
+
+def client_ip(scope: Scope, trusted: tuple) -> str:
+    """
+    Описание: Адрес клиента. X-Forwarded-For учитывается только от доверенного прокси:
+              заголовок читается справа налево до первого адреса вне доверенных сетей.
+    """
+    peer = scope["client"][0] if scope.get("client") else ""
+    forwarded = Headers(scope=scope).get("x-forwarded-for")
+    if not forwarded or not _is_trusted(peer, trusted):
+        return peer
+    hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if not _is_trusted(hop, trusted):
+            return hop
+    return hops[0] if hops else peer
+
+
+def _is_trusted(address: str, trusted: tuple) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in trusted)
+
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware ограничения частоты. Подключается последним, чтобы стоять снаружи
+    всех остальных middleware: отклонённый запрос не доходит ни до логирования, ни до приложения.
+    """
+
+    def __init__(self, app: ASGIApp, rules: tuple[Rule, ...] = RULES, default: Limit | None = DEFAULT_LIMIT,
+                 trusted_proxies: str = RATE_LIMIT_TRUSTED_PROXIES, enabled: bool = RATE_LIMIT_ENABLED):
+        self.app = app
+        self.rules = rules
+        self.default = default
+        self.trusted = parse_networks(trusted_proxies)
+        self.enabled = enabled
+
+    def _identity(self, scope: Scope, by_ip: bool) -> str:
+        if not by_ip:
+            authorization = Headers(scope=scope).get("authorization", "")
+            scheme, _, token = authorization.partition(" ")
+            if scheme.lower() == "bearer" and token:
+                # Проверенный здесь токен попадает в кэш app.auth.keys, get_current_user повторно его не проверяет
+                try:
+                    return f"user:{decode_token(token)['id']}"
+                except (jwt.PyJWTError, KeyError):
+                    pass
+        return f"ip:{client_ip(scope, self.trusted)}"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+        rule = next((rule for rule in self.rules if rule.matches(scope)), None)
+        limit = rule.limit if rule else self.default
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        key = f"{rule.group if rule else 'default'}:{self._identity(scope, rule is not None and rule.by_ip)}"
+        try:
+            retry_after = await get_backend().acquire(key, limit)
+        except (OSError, SQLAlchemyError) as e:
+            logger.warning(f"Rate limit backend failed, request allowed: {e}")
+            retry_after = 0.0
+        if not retry_after:
+            await self.app(scope, receive, send)
+            return
+        response = JSONResponse({"detail": "Too many requests"}, status_code=429,
+                                headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+        await response(scope, receive, send)
+
+
+async def run_rate_limit_sweeper(interval: float = RATE_LIMIT_SWEEP_INTERVAL) -> None:
+    """
+    Описание: Фоновая задача воркера для хранилища postgres: раз в interval секунд удаляет корзины,
+              которые успели наполниться. Ошибки БД не останавливают цикл. Запускается и отменяется в lifespan.
+    """
+    limits = [rule.limit for rule in RULES if rule.limit] + ([DEFAULT_LIMIT] if DEFAULT_LIMIT else [])
+    # Не тронутая дольше самого длинного периода корзина полна и ничем не отличается от отсутствующей
+    idle = max((limit.period for limit in limits), default=0.0)
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await get_backend().sweep(idle)
+        except (OSError, SQLAlchemyError) as e:
+            logger.warning(f"Rate limit sweep failed: {e}")
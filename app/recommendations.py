@@ -0,0 +1,201 @@
+"""
+Рекомендации "с этим товаром покупают" по совместным покупкам.
+
+Пересчёт инкрементальный: каждый проход берёт до RELATED_BATCH_ORDERS новых заказов за водяным
+знаком product_related_state (отменённые пропускаются), строит разреженную матрицу заказ x товар
+и считает совместные покупки одним произведением B.T @ B. Дельта складывается с сохранёнными
+соседями затронутых товаров, и у каждого из них остаются RELATED_STORED_NEIGHBOURS лучших.
+Заказы моложе минуты не берутся, чтобы не перескочить заказ, чья транзакция ещё не зафиксирована.
+
+Соседи за пределами сохранённого топа отбрасываются, поэтому счёт приближённый: товар,
+выпавший из топа, при возвращении начинает с нуля. Запас над RELATED_TOP_K это сглаживает.
+
+Пересчёт выполняет задача очереди refresh_related_products (app.jobs) раз в RELATED_REFRESH_INTERVAL,
+полная пересборка - вручную:
+    python -m app.recommendations --full
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy import func, select, text, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import Cache
+from app.db.database import async_session_maker, dispose_engine, init_engine
+from app.db.db_depends import get_asyncpg_connection
+from app.models import ProductListing, ProductRelated, ProductRelatedState
+from app.utils import (RELATED_BATCH_ORDERS, RELATED_CACHE_SIZE, RELATED_CACHE_TTL, RELATED_STORED_NEIGHBOURS,
+                       RELATED_TOP_K)
+
+_BATCH_BOUNDS_SQL = text("""
+    SELECT max(id), count(*) FROM (
+        SELECT id FROM orders
+        WHERE id > :last_order_id AND created_at < now() - interval '1 minute'
+        ORDER BY id
+        LIMIT :batch_size
+    ) AS batch
+""")
+# Строки собираются в массивы на сервере: списки целых asyncpg разбирает на порядок быстрее,
+# чем numpy - сотни тысяч объектов Row
+_BATCH_ITEMS_SQL = text("""
+    SELECT array_agg(oi.order_id), array_agg(oi.product_id)
+    FROM orders o
+    JOIN order_items oi ON oi.order_id = o.id
+    WHERE o.id > :last_order_id AND o.id <= :upper AND o.status <> 'cancelled'
+""")
+# Затронутых товаров в проходе - десятки тысяч: массив одним параметром вместо IN со списком
+_STORED_SQL = text("""
+    SELECT array_agg(product_id), array_agg(related_id), array_agg(score)
+    FROM product_related WHERE product_id = ANY(:product_ids)
+""")
+_DELETE_SQL = text("DELETE FROM product_related WHERE product_id = ANY(:product_ids)")
+
+
+def co_purchase_counts(order_ids: np.ndarray, product_ids: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Описание: Совместные покупки по позициям заказов: для каждой пары разных товаров -
+              в скольких заказах они встретились вместе (повтор товара в заказе считается один раз).
+    Аргументы:
+        order_ids: ID заказа каждой позиции
+        product_ids: ID товара каждой позиции
+    Возвращает:
+        tuple: массивы product_id, related_id, count - обе стороны пары
+    """
+    _, order_codes = np.unique(order_ids, return_inverse=True)
+    products, product_codes = np.unique(product_ids, return_inverse=True)
+    baskets = sparse.csr_matrix((np.ones(len(order_codes), dtype=np.int32), (order_codes, product_codes)),
+                                shape=(order_codes.max() + 1, len(products)))
+    baskets.data[:] = 1
+    pairs = (baskets.T @ baskets).tocoo()
+    off_diagonal = pairs.row != pairs.col
+    return (products[pairs.row[off_diagonal]], products[pairs.col[off_diagonal]],
+            pairs.data[off_diagonal].astype(np.int64))
+
+
+def top_neighbours(product_ids: np.ndarray, related_ids: np.ndarray, scores: np.ndarray,
+                   keep: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Описание: Складывает повторяющиеся пары и оставляет у каждого товара keep соседей
+              с наибольшим score (при равенстве - с меньшим ID).
+    """
+    keys = (product_ids.astype(np.int64) << 32) | related_ids.astype(np.int64)
+    keys, inverse = np.unique(keys, return_inverse=True)
+    totals = np.bincount(inverse, weights=scores).astype(np.int64)
+    products, related = keys >> 32, keys & 0xFFFFFFFF
+
+    order = np.lexsort((related, -totals, products))
+    products, related, totals = products[order], related[order], totals[order]
+    group_start = np.flatnonzero(np.r_[True, products[1:] != products[:-1]])
+    rank = np.arange(len(products)) - np.repeat(group_start, np.diff(np.r_[group_start, len(products)]))
+    kept = rank < keep
+    return products[kept], related[kept], totals[kept]
+
+
+async def refresh_related(db: AsyncSession, batch_size: int = RELATED_BATCH_ORDERS,
+                          keep: int = RELATED_STORED_NEIGHBOURS) -> tuple[int, bool]:
+    """
+    Описание: Один проход инкрементального пересчёта в транзакции сессии (commit делает вызывающий).
+    Возвращает:
+        tuple[int, bool]: до какого заказа учтены данные и остались ли ещё необработанные заказы
+    """
+    await db.execute(insert(ProductRelatedState).values(id=1).on_conflict_do_nothing())
+    last_order_id = await db.scalar(select(ProductRelatedState.last_order_id)
+                                    .where(ProductRelatedState.id == 1).with_for_update())
+    upper, taken = (await db.execute(_BATCH_BOUNDS_SQL, {"last_order_id": last_order_id,
+                                                         "batch_size": batch_size})).one()
+    if upper is None:
+        return last_order_id, False
+
+    order_ids, product_ids = (await db.execute(_BATCH_ITEMS_SQL, {"last_order_id": last_order_id,
+                                                                 "upper": upper})).one()
+    if order_ids:
+        delta = co_purchase_counts(np.array(order_ids, dtype=np.int64), np.array(product_ids, dtype=np.int64))
+        touched = np.unique(delta[0])
+        if len(touched):
+            touched = touched.tolist()
+            stored = (await db.execute(_STORED_SQL, {"product_ids": touched})).one()
+            if stored[0]:
+                delta = tuple(np.concatenate((np.array(column, dtype=np.int64), part))
+                              for column, part in zip(stored, delta))
+            products, related, scores = top_neighbours(*delta, keep=keep)
+
+            await db.execute(_DELETE_SQL, {"product_ids": touched})
+            connection = await get_asyncpg_connection(db)
+            await connection.copy_records_to_table(
+                "product_related", columns=("product_id", "related_id", "score"),
+                records=zip(products.tolist(), related.tolist(), scores.tolist()),
+            )
+
+    await db.execute(update(ProductRelatedState).where(ProductRelatedState.id == 1)
+                     .values(last_order_id=upper, updated_at=func.now()))
+    return upper, taken == batch_size
+
+
+# Соседи меняются раз в RELATED_REFRESH_INTERVAL, поэтому короткий TTL почти не стоит свежести
+related_cache = Cache("related", ttl=RELATED_CACHE_TTL, local_size=RELATED_CACHE_SIZE)
+
+
+async def related_products(db: AsyncSession, product_id: int, columns: tuple, limit: int) -> list:
+    """
+    Описание: Видимые соседи товара по совместным покупкам, лучшие первыми; через кэш (app.cache) с тегами
+              самого товара, соседей и их категорий.
+    Аргументы:
+        db: асинхронная сессия SQLAlchemy
+        product_id: ID товара
+        columns: колонки product_listing для выдачи
+        limit: сколько соседей вернуть (не больше RELATED_TOP_K - столько кэшируется)
+    Возвращает:
+        list: словари с колонками columns
+    """
+    async def load() -> list:
+        rows = (await db.execute(
+            select(*columns)
+            .join(ProductRelated, ProductRelated.related_id == ProductListing.id)
+            .where(ProductRelated.product_id == product_id, ProductListing.visible)
+            .order_by(ProductRelated.score.desc(), ProductRelated.related_id)
+            .limit(RELATED_TOP_K)
+        )).all()
+        return [row._asdict() for row in rows]
+
+    def tags(rows: list) -> set[str]:
+        return ({f"product:{product_id}"} | {f"product:{row['id']}" for row in rows}
+                | {f"category:{row['category_id']}" for row in rows})
+
+    rows = await related_cache.get_or_load(product_id, load, tags)
+    return rows[:limit]
+
+
+async def _main(args: argparse.Namespace) -> None:
+    init_engine()
+    try:
+        if args.full:
+            async with async_session_maker() as db:
+                await db.execute(text("TRUNCATE product_related"))
+                await db.execute(update(ProductRelatedState).values(last_order_id=0, updated_at=func.now()))
+                await db.commit()
+        more, started = True, time.perf_counter()
+        while more:
+            async with async_session_maker() as db:
+                last_order_id, more = await refresh_related(db, args.batch)
+                await db.commit()
+            print(f"orders <= {last_order_id} processed ({time.perf_counter() - started:.1f} s)")
+    finally:
+        await dispose_engine()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.recommendations", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--full", action="store_true", help="пересобрать соседей с нуля по всем заказам")
+    parser.add_argument("--batch", type=int, default=RELATED_BATCH_ORDERS, help="заказов за проход")
+    asyncio.run(_main(parser.parse_args()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -21,6 +21,19 @@ from app.schemas.cart_items import (
 router = APIRouter(prefix="/cart", tags=["cart"])
 
 
+def _check_stock(product: ProductModel, quantity: int):
+    """
+    Описание: Проверяет, что в корзину не кладут больше товара, чем есть на складе.
+              Это только ранняя проверка: остаток окончательно списывается при резерве корзины
+              (POST /inventory/reservations).
+    Исключения:
+        409 Conflict: Если остатка не хватает
+    """
+    if quantity > product.stock:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail=f"Only {product.stock} items of this product are in stock")
+
+
 @router.get("/", response_model=CartSchema)
 async def get_cart(
         db: AsyncSession = Depends(get_async_db),
@@ -77,20 +90,20 @@ async def add_item_to_cart(
                get_current_user: проверка аутентификации и получение текущего пользователя
         Возвращает: объект CartItemSchema с данными добавленного/обновленного элемента корзины
         """
-    # Проверка на то что, продавец не может покупать свои товары.
-    product = await db.get(ProductModel, payload.product_id)
+    product = await valid_product_id(payload.product_id, db)
 
+    # Проверка на то что, продавец не может покупать свои товары.
     if product.seller_id == current_user.id:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Вы не можете купить собственный товар."
         )
 
-    await valid_product_id(payload.product_id, db)
-
     cart_item = await _get_cart_item(db, current_user.id, payload.product_id)
+    quantity = payload.quantity + (cart_item.quantity if cart_item else 0)
+    _check_stock(product, quantity)
     if cart_item:
-        cart_item.quantity += payload.quantity
+        cart_item.quantity = quantity
     else:
         cart_item = CartItemModel(
             user_id=current_user.id,
@@ -122,12 +135,13 @@ async def update_cart_item(
                get_current_user: проверка аутентификации и получение текущего пользователя
        Возвращает: объект CartItemSchema с обновленными данными элемента корзины
        """
-    await valid_product_id(product_id,db)
+    product = await valid_product_id(product_id,db)
 
     cart_item = await _get_cart_item(db, current_user.id, product_id)
     if not cart_item:
         raise HTTPException(status_code=404, detail="Cart item not found")
 
+    _check_stock(product, payload.quantity)
     cart_item.quantity = payload.quantity
     await db.commit()
     updated_item = await _get_cart_item(db, current_user.id, product_id)
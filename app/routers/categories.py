@@ -9,8 +9,10 @@ from app.models.categories import Category as CategoryModel
 from app.models.users import User as UserModel
 from app.schemas.categories import CategoryCreate, Category as CategoryShema
 from app.db.db_depends import get_async_db
-from app.routers.router_depens import valid_category_id
+from app.routers.router_depens import (valid_category_id, is_in_subtree, add_category_to_tree,
+                                       move_category_subtree, detach_category_subtree)
 from app.auth.user import get_current_admin
+from app.cache import invalidate_tags
 
 # Создаём маршрутизатор с префиксом и тегом
 router = APIRouter(
@@ -55,6 +57,10 @@ async def create_category(category: CategoryCreate, db: AsyncSession = Depends(g
     # Создание новой категории
     db_category = CategoryModel(**category.model_dump())
     db.add(db_category)
+    await db.flush()
+
+    # Пути в таблице замыкания пишутся в той же транзакции
+    await add_category_to_tree(db, db_category.id, category.parent_id)
     await db.commit()
     await db.refresh(db_category)
     return db_category
@@ -72,12 +78,14 @@ async def update_category(category_id: int, category: CategoryCreate, db: AsyncS
     Возвращает:
         CategorySchema: Обновленная категория
     Исключения:
-        400 Bad Request: Если родительская категория не существует или категория ссылается сама на себя
+        400 Bad Request: Если родительская категория не существует, категория ссылается сама на себя
+                         или родитель находится в её поддереве (цикл)
         403 Forbidden: Если пользователь не имеет роли "admin"
         404 Not Found: Если категория не существует или неактивна
     """
     # Проверка существования категории
     db_category = await valid_category_id(category_id, db)
+    old_parent_id = db_category.parent_id
 
     # Проверка существование parent_id если указан
     if category.parent_id is not None:
@@ -92,13 +100,22 @@ async def update_category(category_id: int, category: CategoryCreate, db: AsyncS
                 raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Parent category not found")
             raise e
 
+        # Новый родитель не может лежать в поддереве самой категории
+        if await is_in_subtree(db, category.parent_id, category_id):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail="Category cannot be moved into its own subtree")
+
     # Обновление категории
     await db.execute(
         update(CategoryModel)
         .where(CategoryModel.id == category_id)
         .values(**category.model_dump())
     )
+    # При смене родителя перестраиваем пути всего поддерева
+    if category.parent_id != old_parent_id:
+        await move_category_subtree(db, category_id, category.parent_id)
     await db.commit()
+    await invalidate_tags(f"category:{category_id}")
     await db.refresh(db_category)
     return db_category
 
@@ -109,6 +126,7 @@ async def delete_category(category_id: int, db: AsyncSession = Depends(get_async
     """
     Доступ: только для администраторов
     Описание: Выполняет мягкое удаление категории по её ID, устанавливая is_active=False.
+              Поддерево категории отсоединяется от её предков в таблице замыкания.
     Аргументы:
         category_id: ID категории для удаления
     Возвращает:
@@ -118,5 +136,7 @@ async def delete_category(category_id: int, db: AsyncSession = Depends(get_async
     """
     await valid_category_id(category_id, db)
     await db.execute(update(CategoryModel).where(CategoryModel.id == category_id).values(is_active=False))
+    await detach_category_subtree(db, category_id)
     await db.commit()
+    await invalidate_tags(f"category:{category_id}")
     return {"status": "success", "message": f"Category {category_id} marked as inactive"}
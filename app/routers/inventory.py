@@ -0,0 +1,129 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.auth.user import get_current_user, get_current_seller
+from app.cache import invalidate_tags
+from app.db.db_depends import get_async_db
+from app.inventory import (InsufficientStock, decrement_stock, increment_stock, release_reservations,
+                           reserve_cart)
+from app.models import LowStockEvent as LowStockEventModel, User as UserModel
+from app.routers.router_depens import valid_product_id
+from app.schemas.inventory import CartReservation, LowStockFeed, StockAdjust, StockLevel
+from app.utils import RESERVATION_TTL_MINUTES
+
+router = APIRouter(
+    prefix="/inventory",
+    tags=["inventory"],
+)
+
+
+@router.post("/reservations", response_model=CartReservation, status_code=status.HTTP_201_CREATED)
+async def reserve_current_cart(
+        db: AsyncSession = Depends(get_async_db),
+        current_user: UserModel = Depends(get_current_user),
+):
+    """
+    Описание: Резервирует всё содержимое корзины текущего пользователя перед оформлением заказа.
+              Остатки списываются сразу, через RESERVATION_TTL_MINUTES минут неоплаченный резерв
+              возвращается на склад фоновой задачей. Повторный вызов продлевает резерв.
+    Зависимости:
+        get_current_user: проверка аутентификации и получение текущего пользователя
+    Возвращает:
+        CartReservation: зарезервированные позиции со сроком действия
+    Исключения:
+        400 Bad Request: Если корзина пуста
+        409 Conflict: Если какого-либо товара не хватает на складе (ничего не резервируется)
+    """
+    try:
+        reservations = await reserve_cart(db, current_user.id, RESERVATION_TTL_MINUTES)
+    except InsufficientStock as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail=f"Not enough stock for product {e.product_id}")
+    if not reservations:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cart is empty")
+    return CartReservation(user_id=current_user.id, items=reservations)
+
+
+@router.delete("/reservations", status_code=status.HTTP_204_NO_CONTENT)
+async def release_current_cart(
+        db: AsyncSession = Depends(get_async_db),
+        current_user: UserModel = Depends(get_current_user),
+):
+    """
+    Описание: Снимает резерв корзины текущего пользователя и возвращает товары на склад.
+    Зависимости:
+        get_current_user: проверка аутентификации и получение текущего пользователя
+    Возвращает: HTTP-статус 204 (No Content)
+    """
+    released = await release_reservations(db, current_user.id)
+    await db.commit()
+    await invalidate_tags(*(f"product:{product_id}" for product_id in released))
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.post("/products/{product_id}/adjust", response_model=StockLevel)
+async def adjust_stock(
+        product_id: int,
+        payload: StockAdjust,
+        db: AsyncSession = Depends(get_async_db),
+        current_user: UserModel = Depends(get_current_seller),
+):
+    """
+    Доступ: Только аутентифицированные пользователи с ролью "seller".
+    Описание: Атомарно меняет остаток товара на delta. В отличие от PUT /products/{id}
+              не перезаписывает остаток целиком, поэтому не теряет параллельные списания.
+    Аргументы:
+        product_id: ID товара
+        payload: изменение остатка
+    Возвращает:
+        StockLevel: остаток после изменения
+    Исключения:
+        400 Bad Request: Если delta равна 0
+        403 Forbidden: Если товар не принадлежит текущему пользователю
+        404 Not Found: Если товар не существует или неактивен
+        409 Conflict: Если списание увело бы остаток в минус, а поступление - выше 2**31 - 1
+    """
+    if payload.delta == 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="delta must not be 0")
+    product = await valid_product_id(product_id, db)
+    if product.seller_id != current_user.id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You can only update your own products")
+
+    if payload.delta > 0:
+        stock = await increment_stock(db, product_id, payload.delta)
+        if stock is None:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Stock would exceed the maximum")
+    else:
+        stock = await decrement_stock(db, product_id, -payload.delta)
+        if stock is None:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Not enough stock")
+    await db.commit()
+    await invalidate_tags(f"product:{product_id}")
+    return StockLevel(product_id=product_id, stock=stock)
+
+
+@router.get("/low-stock", response_model=LowStockFeed)
+async def get_low_stock_feed(
+        after_id: int | None = Query(None, ge=0, description="ID последнего полученного события"),
+        limit: int = Query(50, ge=1, le=500),
+        db: AsyncSession = Depends(get_async_db),
+        current_user: UserModel = Depends(get_current_seller),
+):
+    """
+    Доступ: Только аутентифицированные пользователи с ролью "seller".
+    Описание: Лента событий "мало на складе" по товарам текущего продавца.
+              Событие появляется, когда списание опускает остаток до LOW_STOCK_THRESHOLD.
+              Для опроса новых событий передаётся after_id=next_cursor предыдущего ответа.
+    Аргументы:
+        after_id: ID последнего полученного события
+        limit: максимальное количество событий в ответе
+    Возвращает:
+        LowStockFeed: события по возрастанию ID и курсор для следующего запроса
+    """
+    stmt = select(LowStockEventModel).where(LowStockEventModel.seller_id == current_user.id)
+    if after_id is not None:
+        stmt = stmt.where(LowStockEventModel.id > after_id)
+    events = (await db.scalars(stmt.order_by(LowStockEventModel.id).limit(limit))).all()
+    next_cursor = events[-1].id if events else after_id
+    return LowStockFeed(items=events, next_cursor=next_cursor)
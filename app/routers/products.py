@@ -1,12 +1,33 @@
-from fastapi import APIRouter, Depends, status, HTTPException, Query
-from sqlalchemy import select, update, func, desc, or_
+import asyncio
+import csv
+import io
+import json
+import time
+import zlib
+from decimal import Decimal
+
+from fastapi import APIRouter, Depends, status, HTTPException, Query, UploadFile, File, Body
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import select, update, func, desc, or_, text, bindparam, Integer, Numeric
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..models import Product as ProductModel, User as UserModel
-from app.routers.router_depens import valid_category_id, valid_product_id
-from app.schemas.products import ProductCreate, Product as ProductShema, ProductList
-from app.db.db_depends import get_async_db
-from app.auth.user import get_current_seller
+from ..models import Product as ProductModel, ProductListing, User as UserModel
+from app.routers.router_depens import valid_category_id, valid_product_id, category_subtree_ids
+from app.schemas.products import (ProductCreate, Product as ProductShema, ProductList, ProductCursorPage,
+                                  ProductImportError, ProductImportReport, ProductBulkUpdateItem,
+                                  ProductBulkUpdateResult, ProductFacets)
+from app.db.database import async_session_maker
+from app.facets import product_facets
+from app.db.db_depends import get_async_db, get_asyncpg_connection
+from app.auth.user import get_current_seller, get_current_seller_or_admin
+from app.cache import invalidate_tags
+from app.ranking import search_score
+from app.search_analytics import SEARCH_ID_LIMIT, new_search_id, record_click, record_search
+from app.search_query import correct_query
+from app.utils import PRODUCT_LISTING_READS, RELATED_TOP_K
 
 # Создаём маршрутизатор для товаров
 router = APIRouter(
@@ -14,13 +35,105 @@ router = APIRouter(
     tags=["products"],
 )
 
+# Колонки схемы Product: списки читаются без гидратации ORM-объектов
+PRODUCT_COLUMNS = (
+    ProductModel.id, ProductModel.name, ProductModel.description, ProductModel.price, ProductModel.image_url,
+    ProductModel.stock, ProductModel.category_id, ProductModel.is_active,
+)
+PRODUCT_LISTING_COLUMNS = tuple(getattr(ProductListing, column.key) for column in PRODUCT_COLUMNS)
+# Сколько строк забирать из серверного курсора за раз при потоковой выдаче
+STREAM_BATCH_SIZE = 500
+# Массовый импорт: сколько строк валидируется и копируется в staging-таблицу за раз
+IMPORT_CHUNK_SIZE = 5000
+IMPORT_COLUMNS = ("row_num", "name", "description", "price", "image_url", "stock", "category_id")
+# Максимум для колонки Numeric(10, 2)
+MAX_PRICE = Decimal("99999999.99")
+# Максимальный размер пачки в PATCH /products/bulk
+BULK_UPDATE_MAX_ITEMS = 10000
+# Выгрузка каталога: колонки фида, размер пачки курсора и глубина очереди чанков COPY
+EXPORT_COLUMNS = PRODUCT_COLUMNS + (ProductModel.seller_id, ProductModel.rating)
+EXPORT_BATCH_SIZE = 2000
+EXPORT_QUEUE_CHUNKS = 16
+EXPORT_MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson", "columnar": "application/x-ndjson"}
+
+
+def catalog_filters(source, category_id: int | None = None, min_price: float | None = None,
+                    max_price: float | None = None, in_stock: bool | None = None,
+                    seller_id: int | None = None) -> list:
+    """
+    Описание: Собирает условия WHERE каталога для products или product_listing.
+              Условие активности - голая булева колонка, как в предикатах частичных индексов
+              (`WHERE is_active` / `WHERE visible`): с `IS true` планировщик их не выбирает.
+              Используется get_all_products и scripts/check_query_plans.py.
+    Аргументы:
+        source: ProductModel или ProductListing
+        category_id, min_price, max_price, in_stock, seller_id: фильтры GET /products/
+    Возвращает:
+        list: условия для .where(*filters)
+    """
+    filters = [ProductListing.visible if source is ProductListing else ProductModel.is_active]
+
+    if category_id is not None:
+        # Категория вместе со всеми активными подкатегориями
+        filters.append(source.category_id.in_(category_subtree_ids(category_id)))
+    if min_price is not None:
+        filters.append(source.price >= min_price)
+    if max_price is not None:
+        filters.append(source.price <= max_price)
+    if in_stock is not None:
+        filters.append(source.stock > 0 if in_stock else source.stock == 0)
+    if seller_id is not None:
+        filters.append(source.seller_id == seller_id)
+    return filters
+
+
+def catalog_search(source, search_value: str, fuzzy: bool = True, original: str | None = None) -> tuple:
+    """
+    Описание: Условие гибридного поиска по каталогу (FTS в конфигурациях simple и russian
+              плюс триграммная схожесть названия) и выражения для сортировки по релевантности.
+    Аргументы:
+        source: ProductModel или ProductListing
+        search_value: поисковая строка без пробелов по краям
+        fuzzy: искать и по триграммной схожести; False - только FTS по индексу, когда все слова
+               запроса есть в каталоге (см. app.search_query)
+        original: исходный запрос, если search_value - его исправление: FTS находит товары по любому из двух
+    Возвращает:
+        tuple: (условие WHERE, ранг FTS, схожесть триграмм)
+    """
+    # 1. FTS часть
+    ts_query_simple = func.websearch_to_tsquery('simple', search_value)
+    ts_query_ru = func.websearch_to_tsquery('russian', search_value)
+    if original is not None:
+        # tsquery || tsquery - ИЛИ запросов, индекс GIN используется как и для одного
+        ts_query_simple = ts_query_simple.op('||')(func.websearch_to_tsquery('simple', original))
+        ts_query_ru = ts_query_ru.op('||')(func.websearch_to_tsquery('russian', original))
+
+    # Ищем совпадение в любой из двух конфигураций
+    ts_match_any = or_(
+        source.tsv.op('@@')(ts_query_simple),
+        source.tsv.op('@@')(ts_query_ru),
+    )
+    # берем ранг максимальный из двух; нормировка 32 (rank / (rank + 1)) приводит его к 0..1,
+    # как и схожесть триграмм, чтобы их можно было смешивать в app.ranking
+    rank_col = func.greatest(
+        func.coalesce(func.ts_rank_cd(source.tsv, ts_query_simple, 32), 0),
+        func.coalesce(func.ts_rank_cd(source.tsv, ts_query_ru, 32), 0),
+    ).label("rank")
+
+    # 2. Триграммная часть
+    word_sum_expr = func.word_similarity(source.name, search_value)
+    word_sum_col = word_sum_expr.label("word_sim")
+    trgm_condition = word_sum_expr > 0.3
+
+    return (or_(ts_match_any, trgm_condition) if fuzzy else ts_match_any), rank_col, word_sum_col
+
 
 @router.get("/", response_model=ProductList)
 async def get_all_products(
         page: int = Query(1, ge=1),
         page_size: int = Query(20, ge=1, le=100),
         category_id: int | None = Query(
-            None, description="ID категории для фильтрации"),
+            None, description="ID категории для фильтрации (включая подкатегории)"),
         search: str | None = Query(None, min_length=1, description="Поиск по названию товара"),
         min_price: float | None = Query(
             None, ge=0, description="Минимальная цена товара"),
@@ -42,76 +155,60 @@ async def get_all_products(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="min_price не может быть больше max_price",
         )
+    started = time.perf_counter()
 
-    # Формируем список фильтров
-    filters = [ProductModel.is_active.is_(True)]
+    # Читаем из модели чтения product_listing: видимость (товар, категория и продавец активны)
+    # и поисковый вектор с названиями категорий посчитаны триггерами заранее
+    source = ProductListing if PRODUCT_LISTING_READS else ProductModel
+    columns = PRODUCT_LISTING_COLUMNS if PRODUCT_LISTING_READS else PRODUCT_COLUMNS
 
-    if category_id is not None:
-        filters.append(ProductModel.category_id == category_id)
-    if min_price is not None:
-        filters.append(ProductModel.price >= min_price)
-    if max_price is not None:
-        filters.append(ProductModel.price <= max_price)
-    if in_stock is not None:
-        filters.append(ProductModel.stock > 0 if in_stock else ProductModel.stock == 0)
-    if seller_id is not None:
-        filters.append(ProductModel.seller_id == seller_id)
+    # Формируем список фильтров
+    filters = catalog_filters(source, category_id, min_price, max_price, in_stock, seller_id)
 
     # Базовый запрос total
-    total_stmt = select(func.count()).select_from(ProductModel).where(*filters)
+    total_stmt = select(func.count()).select_from(source).where(*filters)
 
     rank_col = None
     word_sum_col = None  # для хранения коэффициента схожести триграмм
+    corrected_search = None
     if search:
-        search_value = search.strip()
-        if search_value:
-            # 1. FTS часть
-            ts_query_simple = func.websearch_to_tsquery('simple', search_value)
-            ts_query_ru = func.websearch_to_tsquery('russian', search_value)
-
-            # Ищем совпадение в любой из двух конфигураций
-            ts_match_any = or_(
-                ProductModel.tsv.op('@@')(ts_query_simple),
-                ProductModel.tsv.op('@@')(ts_query_ru),
-            )
-            # берем ранг максимальный из двух
-            rank_col = func.greatest(
-                func.coalesce(func.ts_rank_cd(ProductModel.tsv, ts_query_simple), 0),
-                func.coalesce(func.ts_rank_cd(ProductModel.tsv, ts_query_ru), 0),
-            ).label("rank")
-
-            # 2. Триграммная часть
-            word_sum_expr = func.word_similarity(ProductModel.name, search_value)
-            word_sum_col = word_sum_expr.label("word_sim")
-            trgm_condition = word_sum_expr > 0.3
-
-            filters.append(or_(ts_match_any, trgm_condition))
-            total_stmt = select(func.count()).select_from(ProductModel).where(*filters)
+        # Раскладка и опечатки исправляются по словарю каталога: известные слова ищутся только через FTS,
+        # исправленный запрос - вместе с исходным
+        query = correct_query(search)
+        if query.text:
+            search_condition, rank_col, word_sum_col = catalog_search(
+                source, query.text, fuzzy=not query.known, original=query.original if query.corrected else None)
+            filters.append(search_condition)
+            total_stmt = select(func.count()).select_from(source).where(*filters)
+            corrected_search = query.text if query.corrected else None
 
     total = await db.scalar(total_stmt) or 0
 
-    # Основной запрос (если есть поиск — добавим ранг и схожесть в выборку и сортировку)
-    if search:
-        select_cols = [ProductModel, rank_col, word_sum_col]
-        order_by_clauses = [desc(rank_col), desc(word_sum_col), ProductModel.id]
-
-        products_stmt = (select(*select_cols).where(*filters)
-                         .order_by(*order_by_clauses).offset((page - 1) * page_size).limit(page_size)
+    # Основной запрос (если есть поиск — сортируем по смеси релевантности и популярности, см. app.ranking)
+    if rank_col is not None:
+        score_col = search_score(source, rank_col, word_sum_col)
+        products_stmt = (select(*columns, score_col).where(*filters)
+                         .order_by(desc(score_col), source.id).offset((page - 1) * page_size).limit(page_size)
                          )
-        result = await db.execute(products_stmt)
-        rows = result.all()
-        items = [row[0] for row in rows]
     else:
-        products_stmt = (select(ProductModel).where(*filters)
-                         .order_by(ProductModel.id).offset((page - 1) * page_size).limit(page_size)
+        products_stmt = (select(*columns).where(*filters)
+                         .order_by(source.id).offset((page - 1) * page_size).limit(page_size)
                          )
-        items = (await db.scalars(products_stmt)).all()
+    items = (await db.execute(products_stmt)).all()
+
+    # Поиск попадает в журнал (app.search_analytics): только запись в буфер процесса, база не ждётся
+    search_id = None
+    if search:
+        search_id = new_search_id()
+        record_search(search_id, search, corrected_search, total, (time.perf_counter() - started) * 1000)
 
     return {
         "items": items,
         "total": total,
         "page": page,
-        "page_size": page_size
+        "page_size": page_size,
+        "corrected_search": corrected_search,
+        "search_id": search_id,
     }
 
 
@@ -143,48 +240,509 @@ async def create_product(product: ProductCreate,
     return db_product
 
 
-@router.get("/category/{category_id}", response_model=list[ProductShema], status_code=status.HTTP_200_OK)
-async def get_products_by_category(category_id: int, db: AsyncSession = Depends(get_async_db)):
+@router.post("/bulk", response_model=ProductImportReport, status_code=status.HTTP_201_CREATED)
+async def import_products(file: UploadFile = File(description="CSV с заголовком или NDJSON с полями ProductCreate"),
+                          file_format: str | None = Query(
+                              None, alias="format", pattern="^(csv|ndjson)$",
+                              description="Формат файла; по умолчанию определяется по имени и content-type"),
+                          db: AsyncSession = Depends(get_async_db),
+                          current_user: UserModel = Depends(get_current_seller)):
+    """
+    Доступ: Только аутентифицированные пользователи с ролью "seller".
+    Описание: Массово создаёт товары текущего продавца из CSV или NDJSON файла.
+              Строки читаются и валидируются схемой ProductCreate пачками, валидные строки
+              загружаются через COPY во временную staging-таблицу, затем все category_id
+              проверяются одним запросом и товары создаются одним INSERT ... SELECT.
+              Невалидные строки не загружаются и попадают в отчёт, остальные сохраняются.
+    Аргументы:
+        file: Загружаемый файл
+        file_format: csv или ndjson
+    Зависимости:
+        current_user: Текущий аутентифицированный пользователь с ролью "seller"
+    Возвращает:
+        ProductImportReport: Количество прочитанных и созданных строк и ошибки по строкам
+    Исключения:
+        400 Bad Request: Если формат файла не определён или файл не в UTF-8
+        403 Forbidden: Если пользователь не имеет роли "seller"
+    """
+    file_format = file_format or _detect_import_format(file)
+
+    copy_connection = await get_asyncpg_connection(db)
+    await db.execute(text("""
+        CREATE TEMP TABLE products_import (
+            row_num integer NOT NULL,
+            name varchar(100) NOT NULL,
+            description varchar(500),
+            price numeric(10, 2) NOT NULL,
+            image_url varchar(200),
+            stock integer NOT NULL,
+            category_id integer NOT NULL
+        ) ON COMMIT DROP
+    """))
+
+    errors = []
+    total_rows = 0
+    # Разбор и валидация идут в пуле потоков, чтобы не блокировать event loop
+    chunks = _iter_import_chunks(file.file, file_format)
+    try:
+        while (chunk := await run_in_threadpool(next, chunks, None)) is not None:
+            records, chunk_errors, rows_read = chunk
+            total_rows += rows_read
+            errors.extend(chunk_errors)
+            if records:
+                await copy_connection.copy_records_to_table("products_import", records=records,
+                                                            columns=IMPORT_COLUMNS)
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Cannot read file: {e}")
+
+    # Все category_id проверяются одним запросом
+    invalid_rows = await db.execute(text("""
+        SELECT s.row_num, s.category_id FROM products_import s
+        WHERE NOT EXISTS (SELECT 1 FROM categories c WHERE c.id = s.category_id AND c.is_active)
+    """))
+    errors.extend(ProductImportError(row=row.row_num, errors=[f"category_id: Category {row.category_id} not found"])
+                  for row in invalid_rows)
+
+    result = await db.execute(text("""
+        INSERT INTO products (name, description, price, image_url, stock, category_id, seller_id, is_active)
+        SELECT s.name, s.description, s.price, s.image_url, s.stock, s.category_id, :seller_id, true
+        FROM products_import s
+        JOIN categories c ON c.id = s.category_id AND c.is_active
+        ORDER BY s.row_num
+    """), {"seller_id": current_user.id})
+    # Временная таблица удаляется при фиксации: категории новых товаров забираются до неё
+    categories = (await db.scalars(text("SELECT DISTINCT category_id FROM products_import"))).all()
+    await db.commit()
+    await invalidate_tags(*(f"category:{category_id}" for category_id in categories))
+
+    errors.sort(key=lambda error: error.row)
+    return ProductImportReport(total_rows=total_rows, inserted=result.rowcount, errors=errors)
+
+
+@router.patch("/bulk", response_model=list[ProductBulkUpdateResult])
+async def bulk_update_products(items: list[ProductBulkUpdateItem] = Body(min_length=1,
+                                                                         max_length=BULK_UPDATE_MAX_ITEMS),
+                               db: AsyncSession = Depends(get_async_db),
+                               current_user: UserModel = Depends(get_current_seller)):
+    """
+    Доступ: Только аутентифицированные пользователи с ролью "seller".
+    Описание: Меняет цену и/или остаток пачки товаров текущего продавца.
+              Владение всеми товарами проверяется одним запросом, изменения
+              применяются одним UPDATE ... FROM unnest(...) в одной транзакции.
+    Аргументы:
+        items: Список изменений [{id, price?, stock?}]
+    Зависимости:
+        current_user: Текущий аутентифицированный пользователь с ролью "seller"
+    Возвращает:
+        list[ProductBulkUpdateResult]: Результат по каждому ID в порядке запроса
+    Исключения:
+        403 Forbidden: Если пользователь не имеет роли "seller"
+        422 Unprocessable Entity: Если у элемента нет ни price, ни stock
+    """
+    # Для повторяющихся ID применяется только первое изменение
+    changes: dict[int, ProductBulkUpdateItem] = {}
+    for item in items:
+        changes.setdefault(item.id, item)
+    results: dict[int, ProductBulkUpdateResult] = {}
+
+    # Проверка владения для всей пачки одним запросом
+    owners = dict((await db.execute(
+        select(ProductModel.id, ProductModel.seller_id)
+        .where(ProductModel.id.in_(changes.keys()), ProductModel.is_active == True)
+    )).all())
+    allowed = []
+    for product_id, item in changes.items():
+        if product_id not in owners:
+            results[product_id] = ProductBulkUpdateResult(id=product_id, status="not_found")
+        elif owners[product_id] != current_user.id:
+            results[product_id] = ProductBulkUpdateResult(id=product_id, status="forbidden")
+        else:
+            allowed.append(item)
+
+    if allowed:
+        # seller_id повторно проверяется в самом UPDATE на случай параллельных изменений
+        updated = await db.execute(
+            text("""
+                UPDATE products AS p
+                SET price = coalesce(u.price, p.price), stock = coalesce(u.stock, p.stock)
+                FROM unnest(:ids, :prices, :stocks) AS u(id, price, stock)
+                WHERE p.id = u.id AND p.seller_id = :seller_id AND p.is_active
+                RETURNING p.id, p.price, p.stock
+            """).bindparams(bindparam("ids", type_=ARRAY(Integer)),
+                            bindparam("prices", type_=ARRAY(Numeric(10, 2))),
+                            bindparam("stocks", type_=ARRAY(Integer))),
+            {"ids": [item.id for item in allowed],
+             "prices": [None if item.price is None else Decimal(str(item.price)) for item in allowed],
+             "stocks": [item.stock for item in allowed],
+             "seller_id": current_user.id},
+        )
+        for row in updated:
+            results[row.id] = ProductBulkUpdateResult(id=row.id, status="updated", price=row.price, stock=row.stock)
+        await db.commit()
+        await invalidate_tags(*(f"product:{product_id}" for product_id, result in results.items()
+                                if result.status == "updated"))
+        for item in allowed:
+            results.setdefault(item.id, ProductBulkUpdateResult(id=item.id, status="not_found"))
+
+    # Порядок ответа совпадает с порядком запроса, повторы ID получают статус duplicate
+    response, seen = [], set()
+    for item in items:
+        response.append(ProductBulkUpdateResult(id=item.id, status="duplicate") if item.id in seen
+                        else results[item.id])
+        seen.add(item.id)
+    return response
+
+
+def _detect_import_format(file: UploadFile) -> str:
+    """
+    Описание: Определяет формат файла импорта по расширению имени и content-type.
+    """
+    filename = (file.filename or "").lower()
+    content_type = (file.content_type or "").lower()
+    if filename.endswith((".ndjson", ".jsonl")) or "ndjson" in content_type:
+        return "ndjson"
+    if filename.endswith(".csv") or "csv" in content_type:
+        return "csv"
+    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                        detail="Cannot detect file format, pass format=csv or format=ndjson")
+
+
+def _iter_import_rows(binary_file, file_format: str):
+    """
+    Описание: Построчно читает файл импорта, не загружая его в память целиком.
+    Возвращает: генератор пар (номер строки данных, dict строки или ValueError для битого JSON)
+    """
+    text_file = io.TextIOWrapper(binary_file, encoding="utf-8-sig", newline="")
+    if file_format == "csv":
+        for row_num, row in enumerate(csv.DictReader(text_file), start=1):
+            # Пустые ячейки считаем отсутствующими значениями, лишние колонки игнорируем
+            yield row_num, {key: value for key, value in row.items() if key is not None and value not in ("", None)}
+        return
+    row_num = 0
+    for line in text_file:
+        if not line.strip():
+            continue
+        row_num += 1
+        try:
+            yield row_num, json.loads(line)
+        except ValueError as e:
+            yield row_num, e
+
+
+def _validate_import_row(row_num: int, raw) -> tuple[tuple | None, list[str]]:
+    """
+    Описание: Валидирует строку импорта схемой ProductCreate.
+    Возвращает: запись для COPY (или None) и список ошибок строки
+    """
+    if isinstance(raw, ValueError):
+        return None, [f"Invalid JSON: {raw}"]
+    if not isinstance(raw, dict):
+        return None, ["Row must be a JSON object"]
+    try:
+        product = ProductCreate.model_validate(raw)
+    except ValidationError as e:
+        return None, [f"{'.'.join(map(str, error['loc'])) or 'row'}: {error['msg']}"
+                      for error in e.errors(include_url=False)]
+    price = Decimal(str(product.price)).quantize(Decimal("0.01"))
+    if price > MAX_PRICE:
+        return None, [f"price: Input should be less than or equal to {MAX_PRICE}"]
+    return (row_num, product.name, product.description, price, product.image_url, product.stock,
+            product.category_id), []
+
+
+def _iter_import_chunks(binary_file, file_format: str):
+    """
+    Описание: Группирует строки файла в пачки по IMPORT_CHUNK_SIZE.
+    Возвращает: генератор кортежей (записи для COPY, ошибки строк, сколько строк прочитано)
+    """
+    records, errors, rows_read = [], [], 0
+    for row_num, raw in _iter_import_rows(binary_file, file_format):
+        rows_read += 1
+        record, row_errors = _validate_import_row(row_num, raw)
+        if record is not None:
+            records.append(record)
+        else:
+            errors.append(ProductImportError(row=row_num, errors=row_errors))
+        if rows_read == IMPORT_CHUNK_SIZE:
+            yield records, errors, rows_read
+            records, errors, rows_read = [], [], 0
+    if rows_read:
+        yield records, errors, rows_read
+
+
+@router.get("/facets", response_model=ProductFacets)
+async def get_product_facets(
+        category_id: int | None = Query(
+            None, description="ID категории для фильтрации (включая подкатегории)"),
+        search: str | None = Query(None, min_length=1, description="Поиск по названию товара"),
+        min_price: float | None = Query(None, ge=0, description="Минимальная цена товара"),
+        max_price: float | None = Query(None, ge=0, description="Максимальная цена товара"),
+        in_stock: bool | None = Query(
+            None, description="true — только товары в наличии, false — только без остатка"),
+        seller_id: int | None = Query(None, description="ID продавца для фильтрации"),
+        seller_limit: int = Query(20, ge=1, le=100, description="Сколько продавцов вернуть"),
+        db: AsyncSession = Depends(get_async_db)
+):
     """
     Доступ: Разрешён всем (аутентификация не требуется).
-    Описание: Возвращает список товаров в указанной категории по её ID.
+    Описание: Возвращает фасеты каталога одним вызовом: категории с учётом подкатегорий,
+              ценовые корзины, продавцов и наличие. Без фильтров счётчики читаются из
+              product_facets, которые триггеры обновляют при создании, изменении и снятии товара;
+              с фильтрами или поиском (те же, что у GET /products/) фасеты считаются точно
+              одним сгруппированным запросом по product_listing.
+    Исключения:
+        400 Bad Request: Если min_price больше max_price
+    """
+    if min_price is not None and max_price is not None and min_price > max_price:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="min_price не может быть больше max_price",
+        )
+
+    filters = None
+    query = correct_query(search) if search else None
+    if (query and query.text) or any(value is not None
+                                     for value in (category_id, min_price, max_price, in_stock, seller_id)):
+        filters = catalog_filters(ProductListing, category_id, min_price, max_price, in_stock, seller_id)
+        if query and query.text:
+            filters.append(catalog_search(ProductListing, query.text, fuzzy=not query.known,
+                                          original=query.original if query.corrected else None)[0])
+    return await product_facets(db, filters, seller_limit)
+
+
+@router.get("/export", status_code=status.HTTP_200_OK)
+async def export_products(
+        export_format: str = Query(
+            "csv", alias="format", pattern="^(csv|ndjson|columnar)$",
+            description="csv — COPY TO STDOUT, ndjson — строка на товар, columnar — строка на пачку колонками"),
+        seller_id: int | None = Query(None, description="ID продавца для фильтрации"),
+        category_id: int | None = Query(None, description="ID категории для фильтрации (включая подкатегории)"),
+        gzip: bool = Query(False, description="true — отдать файл в gzip (application/gzip)"),
+        current_user: UserModel = Depends(get_current_seller_or_admin)):
+    """
+    Доступ: Продавцы и администраторы; частота ограничена правилом export (RATE_LIMIT_EXPORT).
+    Описание: Потоково выгружает все активные товары (фид для маркетплейсов и аналитики)
+              без COUNT и OFFSET, с постоянным расходом памяти:
+              csv читается через COPY ... TO STDOUT, ndjson и columnar — из серверного курсора.
+              Формат columnar отдаёт каждую пачку строк одной строкой NDJSON вида {"колонка": [значения]}.
+    Аргументы:
+        export_format: csv, ndjson или columnar
+        seller_id: ID продавца
+        category_id: ID категории вместе с подкатегориями
+        gzip: Сжать выгрузку в gzip-файл
+    Зависимости:
+        current_user: Текущий пользователь с ролью "seller" или "admin"
+    Возвращает:
+        StreamingResponse: Поток выгрузки, упорядоченный по ID товара
+    Исключения:
+        401 Unauthorized: Если пользователь не аутентифицирован
+        403 Forbidden: Если пользователь не продавец и не администратор
+    """
+    filters = [ProductModel.is_active == True]
+    if seller_id is not None:
+        filters.append(ProductModel.seller_id == seller_id)
+    if category_id is not None:
+        filters.append(ProductModel.category_id.in_(category_subtree_ids(category_id)))
+    export_stmt = select(*EXPORT_COLUMNS).where(*filters).order_by(ProductModel.id)
+
+    if export_format == "csv":
+        chunks = _iter_export_copy_csv(export_stmt)
+    else:
+        chunks = _iter_export_cursor(export_stmt, columnar=export_format == "columnar")
+
+    filename = f"products.{'csv' if export_format == 'csv' else 'ndjson'}"
+    media_type = EXPORT_MEDIA_TYPES[export_format]
+    if gzip:
+        chunks = _iter_gzip(chunks)
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(chunks, media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+
+async def _iter_export_copy_csv(export_stmt):
+    """
+    Описание: Выгружает запрос через COPY ... TO STDOUT (CSV с заголовком).
+              asyncpg пишет чанки в ограниченную очередь, поэтому медленный клиент
+              притормаживает COPY, а не накапливает данные в памяти воркера.
+    """
+    queue: asyncio.Queue[bytes] = asyncio.Queue(maxsize=EXPORT_QUEUE_CHUNKS)
+
+    async def produce():
+        async with async_session_maker() as session:
+            compiled = export_stmt.compile(dialect=session.bind.dialect)
+            args = [compiled.params[name] for name in compiled.positiontup]
+            connection = await get_asyncpg_connection(session)
+            await connection.copy_from_query(str(compiled), *args, output=queue.put, format="csv", header=True)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while not (producer.done() and queue.empty()):
+            getter = asyncio.ensure_future(queue.get())
+            await asyncio.wait({getter, producer}, return_when=asyncio.FIRST_COMPLETED)
+            if getter.done():
+                yield bytes(getter.result())
+            else:
+                getter.cancel()
+        # Пробрасываем ошибку COPY, если она была
+        producer.result()
+    finally:
+        # Клиент отключился - останавливаем COPY
+        producer.cancel()
+
+
+async def _iter_export_cursor(export_stmt, columnar: bool):
+    """
+    Описание: Выгружает запрос из серверного курсора пачками по EXPORT_BATCH_SIZE строк
+              как NDJSON (строка на товар) или columnar (строка на пачку).
+    """
+    async with async_session_maker() as session:
+        result = await session.stream(export_stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        columns = list(result.keys())
+        async for rows in result.partitions():
+            if columnar:
+                batch = dict(zip(columns, (list(values) for values in zip(*rows))))
+                yield json.dumps(batch, ensure_ascii=False, default=float) + "\n"
+            else:
+                yield "".join(json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=float) + "\n"
+                              for row in rows)
+
+
+async def _iter_gzip(chunks):
+    """
+    Описание: Сжимает поток в gzip-файл на лету.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        data = compressor.compress(chunk.encode() if isinstance(chunk, str) else chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+@router.get("/category/{category_id}", response_model=ProductCursorPage, status_code=status.HTTP_200_OK)
+async def get_products_by_category(
+        category_id: int,
+        after_id: int | None = Query(
+            None, ge=0, description="Курсор: ID последнего товара предыдущей страницы"),
+        page_size: int = Query(20, ge=1, le=100),
+        include_subcategories: bool = Query(
+            False, description="true — включить товары всех активных подкатегорий"),
+        stream: bool = Query(
+            False, description="true — отдать все товары потоком NDJSON вместо страницы"),
+        db: AsyncSession = Depends(get_async_db)):
+    """
+    Доступ: Разрешён всем (аутентификация не требуется).
+    Описание: Возвращает товары в указанной категории по её ID, упорядоченные по ID.
+              По умолчанию отдаёт страницу с keyset-пагинацией (after_id / next_cursor),
+              при stream=true — все товары построчно в формате NDJSON из серверного курсора.
     Аргументы:
         category_id: ID категории для фильтрации товаров
+        after_id: ID последнего товара предыдущей страницы
+        page_size: Количество товаров на странице
+        include_subcategories: Учитывать товары подкатегорий (по таблице замыкания category_closure)
+        stream: Потоковая выдача NDJSON
     Возвращает:
-        List[ProductSchema]: Список активных товаров в указанной категории
+        ProductCursorPage: Страница активных товаров в указанной категории
+        StreamingResponse: Поток application/x-ndjson, если stream=true
     Исключения:
         404 Not Found: Если категория не существует или неактивна
     """
     # Проверяет, существует ли категория с указанным category_id и она не в архиве
     await valid_category_id(category_id, db)
 
-    # Возвращает список всех товаров
-    products = await db.scalars(select(ProductModel).where(ProductModel.category_id == category_id,
-                                                           ProductModel.is_active == True))
+    filters = [ProductModel.is_active == True]
+    if include_subcategories:
+        filters.append(ProductModel.category_id.in_(category_subtree_ids(category_id)))
+    else:
+        filters.append(ProductModel.category_id == category_id)
+    if after_id is not None:
+        filters.append(ProductModel.id > after_id)
+
+    products_stmt = select(*PRODUCT_COLUMNS).where(*filters).order_by(ProductModel.id)
+
+    if stream:
+        return StreamingResponse(_stream_products_ndjson(products_stmt), media_type="application/x-ndjson")
+
+    # Берём на одну строку больше, чтобы понять, есть ли следующая страница
+    rows = (await db.execute(products_stmt.limit(page_size + 1))).all()
+    items = rows[:page_size]
+    next_cursor = items[-1].id if len(rows) > page_size else None
+    return {"items": items, "next_cursor": next_cursor, "page_size": page_size}
+
 
-    return products.all()
+async def _stream_products_ndjson(products_stmt):
+    """
+    Описание: Построчно читает товары из серверного курсора и отдаёт их как NDJSON.
+              Использует собственную сессию: сессия зависимости может закрыться
+              раньше, чем закончится отправка потока.
+    """
+    async with async_session_maker() as session:
+        result = await session.stream(products_stmt.execution_options(yield_per=STREAM_BATCH_SIZE))
+        async for rows in result.partitions():
+            yield "".join(ProductShema.model_validate(row).model_dump_json() + "\n" for row in rows)
 
 
 @router.get("/{product_id}", response_model=ProductShema, status_code=status.HTTP_200_OK)
-async def get_product(product_id: int, db: AsyncSession = Depends(get_async_db)):
+async def get_product(product_id: int,
+                      search_id: int | None = Query(None, ge=0, lt=SEARCH_ID_LIMIT,
+                                                    description="search_id выдачи, из которой открыт товар"),
+                      db: AsyncSession = Depends(get_async_db)):
     """
     Доступ: Разрешён всем (аутентификация не требуется).
     Описание: Возвращает детальную информацию о товаре по его ID.
     Аргументы:
         product_id: ID товара для получения информа
+        search_id: ID поиска из GET /products - переход записывается в журнал поиска
     Возвращает:
         ProductSchema: Детальная информация о товаре
     Исключения:
         404 Not Found: Если товар не существует или неактивен
     """
-    # Проверяем, существует ли активный товар
-    product = await valid_product_id(product_id, db)
+    if PRODUCT_LISTING_READS:
+        # Один запрос к модели чтения: активность товара, категории и продавца уже в visible
+        product = (await db.execute(select(*PRODUCT_LISTING_COLUMNS).where(ProductListing.id == product_id,
+                                                                            ProductListing.visible))).first()
+        if product is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found or inactive")
+    else:
+        # Проверяем, существует ли активный товар
+        product = await valid_product_id(product_id, db)
 
-    # Проверяем, существует ли активная категория
-    await valid_category_id(product.category_id, db)
+        # Проверяем, существует ли активная категория
+        await valid_category_id(product.category_id, db)
+    if search_id is not None:
+        record_click(search_id, product_id)
     return product
 
 
+@router.get("/{product_id}/related", response_model=list[ProductShema], status_code=status.HTTP_200_OK)
+async def get_related_products(product_id: int,
+                               limit: int = Query(RELATED_TOP_K, ge=1, le=RELATED_TOP_K,
+                                                  description="Сколько товаров вернуть"),
+                               db: AsyncSession = Depends(get_async_db)):
+    """
+    Доступ: Разрешён всем (аутентификация не требуется).
+    Описание: "С этим товаром покупают" - видимые товары, чаще всего встречавшиеся с данным в одних заказах.
+              Соседи пересчитываются фоновой задачей, выдача кэшируется (app.cache) на RELATED_CACHE_TTL.
+    Аргументы:
+        product_id: ID товара
+        limit: сколько товаров вернуть
+    Возвращает:
+        list[ProductSchema]: товары, самые частые соседи первыми; пусто, если совместных покупок нет
+    Исключения:
+        404 Not Found: Если соседей нет, а товар не существует или неактивен
+    """
+    # app.recommendations тянет numpy и scipy - импортируется с первым запросом, а не с приложением
+    from app.recommendations import related_products
+
+    related = await related_products(db, product_id, PRODUCT_LISTING_COLUMNS, limit)
+    if not related and await db.scalar(select(ProductListing.id).where(ProductListing.id == product_id,
+                                                                       ProductListing.visible)) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found or inactive")
+    return related
+
+
 @router.put("/{product_id}", response_model=ProductShema)
 async def update_product(product_id: int, product: ProductCreate, db: AsyncSession = Depends(get_async_db),
                          current_user: UserModel = Depends(get_current_seller)):
@@ -216,6 +774,7 @@ async def update_product(product_id: int, product: ProductCreate, db: AsyncSessi
         update(ProductModel).where(ProductModel.id == product_id).values(**product.model_dump())
     )
     await db.commit()
+    await invalidate_tags(f"product:{product_id}")
     await db.refresh(db_product)
     return db_product
 
@@ -247,5 +806,6 @@ async def delete_product(product_id: int, db: AsyncSession = Depends(get_async_d
     await db.execute(
         update(ProductModel).where(ProductModel.id == product_id).values(is_active=False))
     await db.commit()
+    await invalidate_tags(f"product:{product_id}")
 
     return {"status": "success", "message": "Product marked as inactive"}
@@ -3,7 +3,8 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.routers.router_depens import valid_product_id, recalculate_rating
+from app.jobs import enqueue
+from app.routers.router_depens import valid_product_id
 from app.schemas.reviews import ReviewsCreate, Reviews as ReviewsShema
 from app.models.reviews import Review as ReviewModel
 from app.models.products import Product as ProductModel
@@ -56,7 +57,8 @@ async def create_review(review: ReviewsCreate, db: AsyncSession = Depends(get_as
     """
     Доступ: Только аутентифицированные пользователи с ролью "buyer".
     Описание: Создаёт новый отзыв для указанного товара.
-              После добавления отзыва пересчитывает средний рейтинг товара.
+              Пересчёт среднего рейтинга товара ставится в очередь фоновых задач
+              в той же транзакции и выполняется после ответа.
     Аргументы:
         review: Модель для создания отзыва
         current_user: Текущий аутентифицированный пользователь с ролью "buyer"
@@ -77,17 +79,14 @@ async def create_review(review: ReviewsCreate, db: AsyncSession = Depends(get_as
     if existing_review:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="The review already exists")
 
-    #  сохраняем отзыв
+    #  сохраняем отзыв, рейтинг пересчитает фоновая задача из той же транзакции
     review_db = ReviewModel(**review.model_dump(), user_id=current_user.id)
     db.add(review_db)
+    await enqueue(db, "recalculate_rating", {"product_id": review.product_id},
+                  dedupe_key=str(review.product_id))
     await db.commit()
     await db.refresh(review_db)
 
-    #  пересчитываем и обновляем рейтинг
-    avg_rating = await recalculate_rating(review.product_id, db)
-    await db.execute(update(ProductModel).where(ProductModel.id == review.product_id).values(rating=avg_rating))
-    await db.commit()
-
     return review_db
 
 
@@ -97,7 +96,7 @@ async def delete_review(review_id: int, db: AsyncSession = Depends(get_async_db)
     """
         Доступ: Только пользователи с ролью "admin".
         Описание: Выполняет мягкое удаление отзыва по review_id, устанавливая is_active = False.
-                  После удаления пересчитывает рейтинг товара на основе оставшихся активных отзывов.
+                  Пересчёт рейтинга товара по оставшимся активным отзывам ставится в очередь фоновых задач.
         Аргументы:
             review_id: ID отзыва для удаления
         Зависимости:
@@ -118,13 +117,9 @@ async def delete_review(review_id: int, db: AsyncSession = Depends(get_async_db)
     # сохраняем id продукта до удаления
     product_id = review.product_id
 
-    # обновляем отзыв со статусом is_active=False
+    # обновляем отзыв со статусом is_active=False, рейтинг пересчитает фоновая задача
     await db.execute(update(ReviewModel).where(ReviewModel.id == review_id).values(is_active=False))
-    await db.commit()
-
-    #  пересчитываем и обновляем рейтинг
-    avg_rating = await recalculate_rating(product_id, db)
-    await db.execute(update(ProductModel).where(ProductModel.id == product_id).values(rating=avg_rating))
+    await enqueue(db, "recalculate_rating", {"product_id": product_id}, dedupe_key=str(product_id))
     await db.commit()
 
     return {"message": "Review deleted"}
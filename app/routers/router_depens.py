@@ -1,11 +1,11 @@
 from fastapi import Depends, HTTPException, status
-from sqlalchemy import select, func
+from sqlalchemy import select, func, Select, delete, insert, literal
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.auth.user import get_current_seller
 from app.db.db_depends import get_async_db
-from app.models import Product as ProductModel, Category as CategoryModel
+from app.models import Product as ProductModel, Category as CategoryModel, CategoryClosure
 from app.models import User as UserModel
 from app.models import Review as ReviewModel
 from app.models import CartItem as CartItemModel
@@ -26,6 +26,81 @@ async def valid_category_id(category_id: int, db: AsyncSession = Depends(get_asy
     return db_category
 
 
+def category_subtree_ids(category_id: int) -> Select:
+    """
+    Описание: Строит подзапрос с ID категории и всех её активных потомков
+              по таблице замыкания category_closure (один индексированный поиск по ancestor_id).
+    Аргументы:
+        category_id: ID корневой категории
+    Возвращает: SELECT с колонкой descendant_id для использования в IN (...)
+    """
+    return select(CategoryClosure.descendant_id).where(CategoryClosure.ancestor_id == category_id)
+
+
+async def is_in_subtree(db: AsyncSession, category_id: int, root_id: int) -> bool:
+    """
+    Описание: Проверяет, лежит ли категория category_id в поддереве root_id (включая саму root_id).
+              Используется для обнаружения циклов при смене родителя.
+    """
+    found = await db.scalar(select(literal(True)).where(CategoryClosure.ancestor_id == root_id,
+                                                         CategoryClosure.descendant_id == category_id))
+    return bool(found)
+
+
+async def add_category_to_tree(db: AsyncSession, category_id: int, parent_id: int | None):
+    """
+    Описание: Добавляет новую категорию в таблицу замыкания:
+              связь с самой собой и со всеми предками родителя.
+    Аргументы:
+        category_id: ID новой категории (после flush)
+        parent_id: ID родительской категории или None
+    """
+    await db.execute(insert(CategoryClosure).values(ancestor_id=category_id, descendant_id=category_id, depth=0))
+    if parent_id is not None:
+        await db.execute(insert(CategoryClosure).from_select(
+            ["ancestor_id", "descendant_id", "depth"],
+            select(CategoryClosure.ancestor_id, literal(category_id), CategoryClosure.depth + 1)
+            .where(CategoryClosure.descendant_id == parent_id)
+        ))
+
+
+async def detach_category_subtree(db: AsyncSession, category_id: int):
+    """
+    Описание: Отсоединяет поддерево категории от всех её предков одним DELETE.
+              Связи внутри поддерева сохраняются.
+    Аргументы:
+        category_id: ID корня отсоединяемого поддерева
+    """
+    subtree = select(CategoryClosure.descendant_id).where(CategoryClosure.ancestor_id == category_id)
+    ancestors = select(CategoryClosure.ancestor_id).where(CategoryClosure.descendant_id == category_id,
+                                                          CategoryClosure.ancestor_id != category_id)
+    await db.execute(delete(CategoryClosure).where(CategoryClosure.descendant_id.in_(subtree),
+                                                   CategoryClosure.ancestor_id.in_(ancestors))
+                     .execution_options(synchronize_session=False))
+
+
+async def move_category_subtree(db: AsyncSession, category_id: int, new_parent_id: int | None):
+    """
+    Описание: Переносит поддерево категории под нового родителя:
+              удаляет старые пути к предкам и вставляет декартово произведение
+              (предки нового родителя x поддерево) одним INSERT ... SELECT.
+    Аргументы:
+        category_id: ID переносимой категории
+        new_parent_id: ID нового родителя или None (категория становится корневой)
+    """
+    await detach_category_subtree(db, category_id)
+    if new_parent_id is None:
+        return
+    parent_paths = CategoryClosure.__table__.alias("parent_paths")
+    subtree_paths = CategoryClosure.__table__.alias("subtree_paths")
+    await db.execute(insert(CategoryClosure).from_select(
+        ["ancestor_id", "descendant_id", "depth"],
+        select(parent_paths.c.ancestor_id, subtree_paths.c.descendant_id,
+               parent_paths.c.depth + subtree_paths.c.depth + 1)
+        .where(parent_paths.c.descendant_id == new_parent_id, subtree_paths.c.ancestor_id == category_id)
+    ))
+
+
 async def valid_product_id(product_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Описание: Проверяет, существует ли активный товар с указанным product_id
@@ -67,7 +142,8 @@ async def recalculate_rating(product_id: int, db: AsyncSession = Depends(get_asy
     """
     rating = await db.scalar(select(func.avg(ReviewModel.grade)).where(ReviewModel.product_id == product_id,
                                                                        ReviewModel.is_active == True))
-    avg_grades = round(rating, 2) or 0.0
+    # Без активных отзывов avg() возвращает NULL
+    avg_grades = round(rating, 2) if rating is not None else 0.0
     return avg_grades
 
 
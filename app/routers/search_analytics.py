@@ -0,0 +1,49 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.auth.user import get_current_admin
+from app.db.db_depends import get_async_db
+from app.models import User as UserModel
+from app.schemas.search_analytics import SlowQuery, ZeroResultQuery
+from app.search_analytics import slowest_queries, zero_result_queries
+from app.utils import SEARCH_EVENTS_RETENTION_DAYS
+
+router = APIRouter(
+    prefix="/search-analytics",
+    tags=["search-analytics"],
+)
+
+
+@router.get("/zero-results", response_model=list[ZeroResultQuery])
+async def get_zero_result_queries(
+        days: int = Query(7, ge=1, le=SEARCH_EVENTS_RETENTION_DAYS, description="За сколько последних дней"),
+        limit: int = Query(50, ge=1, le=500, description="Сколько запросов вернуть"),
+        db: AsyncSession = Depends(get_async_db),
+        current_user: UserModel = Depends(get_current_admin),
+):
+    """
+    Описание: Самые частые поисковые запросы без результатов - пробелы в ассортименте и словаре поиска.
+    Зависимости:
+        get_current_admin: доступ только для администратора
+    Возвращает:
+        list[ZeroResultQuery]: запросы по убыванию числа поисков
+    """
+    return await zero_result_queries(db, days, limit)
+
+
+@router.get("/slowest", response_model=list[SlowQuery])
+async def get_slowest_queries(
+        days: int = Query(7, ge=1, le=SEARCH_EVENTS_RETENTION_DAYS, description="За сколько последних дней"),
+        limit: int = Query(50, ge=1, le=500, description="Сколько запросов вернуть"),
+        min_searches: int = Query(5, ge=1, description="Не учитывать запросы, выполненные реже"),
+        db: AsyncSession = Depends(get_async_db),
+        current_user: UserModel = Depends(get_current_admin),
+):
+    """
+    Описание: Поисковые запросы с наибольшим p95 времени ответа.
+    Зависимости:
+        get_current_admin: доступ только для администратора
+    Возвращает:
+        list[SlowQuery]: запросы по убыванию p95
+    """
+    return await slowest_queries(db, days, limit, min_searches)
@@ -1,20 +1,37 @@
+import math
+import uuid
+
 import jwt
 from fastapi import APIRouter, status, Depends, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi.requests import Request
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.users import User as UserModel
 from app.schemas.users import UserCreate, User as UserSchema
 from app.db.db_depends import get_async_db
-from app.auth.password import hash_password, verify_password, create_access_token, create_refresh_token
-from app.utils import COOKIE_NAME, COOKIE_PATH, COOKIE_HTTPONLY, COOKIE_SAMESITE, COOKIE_MAX_AGE, COOKIE_SECURE, \
-    SECRET_KEY, ALGORITHM
+from app.auth.keys import decode_token, jwks
+from app.auth.refresh_tokens import revoke_family, rotate, start_family
+from app.auth.login import LoginThrottled, authenticate
+from app.auth.password import PasswordHashBusy, hash_password_async, create_access_token, create_refresh_token
+from app.utils import COOKIE_NAME, COOKIE_PATH, COOKIE_HTTPONLY, COOKIE_SAMESITE, COOKIE_MAX_AGE, COOKIE_SECURE
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 
+def _hash_busy_exception() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Server is busy, try again later",
+                         headers={"Retry-After": "1"})
+
+
+async def _hash_new_password(password: str) -> str:
+    try:
+        return await hash_password_async(password)
+    except PasswordHashBusy:
+        raise _hash_busy_exception()
+
+
 @router.post("/create-admin", status_code=status.HTTP_201_CREATED)
 async def create_admin(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """
@@ -41,7 +58,7 @@ async def create_admin(user: UserCreate, db: AsyncSession = Depends(get_async_db
         # Создание объекта пользователя с хешированным паролем
     db_user = UserModel(
         email=user.email,
-        hashed_password=hash_password(user.password),
+        hashed_password=await _hash_new_password(user.password),
         role="admin"
     )
     # Добавление в сессию и сохранение в базе
@@ -71,7 +88,7 @@ async def create_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)
     # Создание объекта пользователя с хешированным паролем
     db_user = UserModel(
         email=user.email,
-        hashed_password=hash_password(user.password),
+        hashed_password=await _hash_new_password(user.password),
         role=user.role
     )
     # Добавление в сессию и сохранение в базе
@@ -80,77 +97,159 @@ async def create_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)
     return db_user
 
 
+def _issue_tokens(user: UserModel, family_id: uuid.UUID, jti: uuid.UUID) -> JSONResponse:
+    """
+    Описание: Access token в теле ответа и refresh token семейства family_id в HTTP-only cookie.
+    """
+    claims = {"sub": user.email, "role": user.role, "id": user.id, "fam": str(family_id)}
+    access_token = create_access_token(data=claims)
+    refresh_token = create_refresh_token(data={**claims, "jti": str(jti)})
+    response = JSONResponse(content={"access_token": access_token, "token_type": "bearer"})
+    response.set_cookie(
+        key=COOKIE_NAME,
+        value=refresh_token,
+        httponly=COOKIE_HTTPONLY,
+        secure=COOKIE_SECURE,
+        samesite=COOKIE_SAMESITE,
+        path=COOKIE_PATH,
+        max_age=COOKIE_MAX_AGE
+    )
+    return response
+
+
+def _refresh_claims(request: Request) -> tuple[uuid.UUID, uuid.UUID]:
+    """
+    Описание: Проверяет refresh token из cookie и возвращает его семейство и jti.
+    Исключения:
+        401 Unauthorized: Если токен отсутствует, просрочен, невалиден или не является refresh token
+    """
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    refresh_token = request.cookies.get(COOKIE_NAME)
+    if not refresh_token:
+        raise HTTPException(status_code=401, detail="Refresh token missing")
+
+    try:
+        payload = decode_token(refresh_token, use_cache=False)
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh token has expired",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    except jwt.PyJWTError:
+        raise credentials_exception
+    if payload.get("type") != "refresh":
+        raise credentials_exception
+    try:
+        return uuid.UUID(payload["fam"]), uuid.UUID(payload["jti"])
+    except (KeyError, TypeError, ValueError):
+        # Токен выпущен до ротации refresh-токенов - нужен повторный вход
+        raise credentials_exception
+
+
 @router.post("/token")
 async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
     """
     Доступ: публичный
     Описание: Аутентифицирует пользователя и возвращает access_token и refresh_token.
               Refresh_token сохраняется в HTTP-only cookie для безопасности.
+              Каждый вход начинает новое семейство refresh-токенов и стоит ровно одной проверки
+              Argon2, в том числе для неизвестного email (app.auth.login).
     Аргументы:
         form_data: Данные формы аутентификации (username=email, password)
     Возвращает:
         JSONResponse: Access token в теле ответа и refresh token в cookie
     Исключения:
         401 Unauthorized: Если email или пароль неверны
+        429 Too Many Requests: Если по аккаунту слишком много неудачных попыток (Retry-After)
+        503 Service Unavailable: Если очередь хеширования паролей переполнена
     """
-    # SQL-запрос, который ищет запись в таблице users, где поле email совпадает с переданным form_data.username
-    user = await db.scalar(select(UserModel).where(UserModel.email == form_data.username))
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    try:
+        user = await authenticate(db, form_data.username, form_data.password)
+    except LoginThrottled as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many failed login attempts",
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+        )
+    except PasswordHashBusy:
+        raise _hash_busy_exception()
+    if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token = create_access_token(data={"sub": user.email, "role": user.role, "id": user.id})
-    refresh_token = create_refresh_token(data={"sub": user.email, "role": user.role, "id": user.id})
-    response = JSONResponse(content={"access_token": access_token, "token_type": "bearer"})
-    response.set_cookie(
-        key=COOKIE_NAME,
-        value=refresh_token,
-        httponly=COOKIE_HTTPONLY,
-        secure=COOKIE_SECURE,
-        samesite=COOKIE_SAMESITE,
-        path=COOKIE_PATH,
-        max_age=COOKIE_MAX_AGE
-    )
-
-    return response
+    family_id, jti = await start_family(db, user.id)
+    await db.commit()
+    return _issue_tokens(user, family_id, jti)
 
 
 @router.post("/refresh-token")
 async def refresh_access_token(request: Request, db: AsyncSession = Depends(get_async_db)):
     """
     Доступ: аутентифицированные пользователи (через refresh token)
-    Описание: Обновляет access_token с помощью валидного refresh_token из cookie.
-              Выполняет проверку валидности refresh token и активного статуса пользователя.
+    Описание: Обменивает refresh_token из cookie на новую пару токенов (ротация).
+              Принимается только последний выданный refresh token семейства; повторное
+              предъявление уже обменянного токена отзывает всё семейство.
     Аргументы:
         request: HTTP запрос для извлечения refresh token из cookie
     Возвращает:
-        dict: Новый access token
+        JSONResponse: Новый access token в теле ответа и новый refresh token в cookie
     Исключения:
-        401 Unauthorized: Если refresh token отсутствует, невалиден или пользователь неактивен
+        401 Unauthorized: Если refresh token отсутствует, невалиден, отозван, уже использован
+                          или пользователь неактивен
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate refresh token",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    refresh_token = request.cookies.get(COOKIE_NAME)
-    if not refresh_token:
-        raise HTTPException(status_code=401, detail="Refresh token missing")
-
-    try:
-        payload = jwt.decode(refresh_token, SECRET_KEY, algorithms=[ALGORITHM])
-        email = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-    except jwt.exceptions:
-        raise jwt.exceptions
-    user = await db.scalar(select(UserModel).where(UserModel.email == email, UserModel.is_active == True
-                                                   ))
+    family_id, jti = _refresh_claims(request)
+    rotated = await rotate(db, family_id, jti)
+    if rotated is None:
+        await db.commit()  # фиксируем отзыв семейства при повторном использовании
+        raise credentials_exception
+    user_id, new_jti = rotated
+    user = await db.scalar(select(UserModel).where(UserModel.id == user_id, UserModel.is_active == True))
     if not user:
+        await db.rollback()
         raise credentials_exception
+    await db.commit()
+    return _issue_tokens(user, family_id, new_jti)
+
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """
+    Доступ: аутентифицированные пользователи (через refresh token)
+    Описание: Отзывает семейство refresh token из cookie вместе с выданными из него access-токенами
+              и удаляет cookie.
+    Аргументы:
+        request: HTTP запрос для извлечения refresh token из cookie
+    Исключения:
+        401 Unauthorized: Если refresh token отсутствует или невалиден
+    """
+    family_id, _ = _refresh_claims(request)
+    await revoke_family(db, family_id)
+    await db.commit()
+    response = Response(status_code=status.HTTP_204_NO_CONTENT)
+    response.delete_cookie(key=COOKIE_NAME, path=COOKIE_PATH, secure=COOKIE_SECURE, httponly=COOKIE_HTTPONLY,
+                           samesite=COOKIE_SAMESITE)
+    return response
 
-    access_token = create_access_token(data={"sub": user.email, "role": user.role, "id": user.id})
 
-    return {"access_token": access_token, "token_type": "bearer"}
+@router.get("/jwks.json")
+async def get_jwks():
+    """
+    Доступ: публичный
+    Описание: Открытые ключи подписи JWT (JWKS) для локальной проверки токенов другими сервисами.
+              При подписи общим секретом список ключей пуст.
+    Возвращает:
+        dict: {"keys": [...]} в формате RFC 7517
+    """
+    return jwks()
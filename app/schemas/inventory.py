@@ -0,0 +1,62 @@
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel, Field, ConfigDict
+
+from app.schemas.products import INT4_MAX
+
+
+class StockReservation(BaseModel):
+    """
+    Резерв одного товара из корзины.
+    """
+    product_id: int = Field(description="ID товара")
+    quantity: int = Field(ge=1, description="Зарезервированное количество")
+    expires_at: datetime = Field(description="Когда резерв истечёт и товар вернётся на склад")
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class CartReservation(BaseModel):
+    """
+    Резерв корзины на время оформления заказа.
+    """
+    user_id: int = Field(description="ID пользователя")
+    items: List[StockReservation] = Field(default_factory=list, description="Зарезервированные товары")
+
+
+class StockAdjust(BaseModel):
+    """
+    Изменение остатка товара продавцом: положительное - поступление, отрицательное - списание.
+    """
+    delta: int = Field(ge=-INT4_MAX, le=INT4_MAX, description="На сколько изменить остаток (не 0)")
+
+
+class StockLevel(BaseModel):
+    """
+    Текущий остаток товара.
+    """
+    product_id: int = Field(description="ID товара")
+    stock: int = Field(ge=0, description="Остаток на складе")
+
+
+class LowStockEvent(BaseModel):
+    """
+    Событие ленты "мало на складе".
+    """
+    id: int = Field(description="ID события")
+    product_id: int = Field(description="ID товара")
+    stock: int = Field(ge=0, description="Остаток после списания")
+    threshold: int = Field(description="Порог, который был пересечён")
+    created_at: datetime = Field(description="Когда остаток опустился до порога")
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class LowStockFeed(BaseModel):
+    """
+    Страница ленты "мало на складе" с keyset-пагинацией.
+    Новые события запрашиваются с after_id=next_cursor.
+    """
+    items: List[LowStockEvent] = Field(description="События по возрастанию ID")
+    next_cursor: Optional[int] = Field(None, description="ID последнего события страницы или переданный after_id, если новых событий нет")
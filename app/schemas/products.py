@@ -1,6 +1,9 @@
-from typing import Optional, List
+from typing import Optional, List, Literal
 
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field, ConfigDict, model_validator
+
+# Верхняя граница колонок integer в Postgres: большее значение ломает весь COPY или UPDATE пачки
+INT4_MAX = 2 ** 31 - 1
 
 
 class ProductCreate(BaseModel):
@@ -14,8 +17,8 @@ class ProductCreate(BaseModel):
                                        description="Описание товара (до 500 символов)")
     price: float = Field(gt=0, description="Цена товара (больше 0)")
     image_url: Optional[str] = Field(None, max_length=200, description="URL изображения товара")
-    stock: int = Field(ge=0, description="Количество товара на складе (0 или больше)")
-    category_id: int = Field(description="ID категории, к которой относится товар")
+    stock: int = Field(ge=0, le=INT4_MAX, description="Количество товара на складе (0 или больше)")
+    category_id: int = Field(ge=1, le=INT4_MAX, description="ID категории, к которой относится товар")
 
 
 class Product(ProductCreate):
@@ -37,9 +40,114 @@ class ProductList(BaseModel):
     total: int = Field(ge=0, description="Общее количество товаров")
     page: int = Field(ge=1, description="Номер текущей страницы")
     page_size: int = Field(ge=1, description="Количество элементов на странице")
+    corrected_search: Optional[str] = Field(None, description="Исправленный запрос, по которому шёл поиск, "
+                                                              "если в search были опечатки или не та раскладка")
+    search_id: Optional[int] = Field(None, description="ID поиска для журнала: передаётся в GET /products/{id}, "
+                                                       "когда товар открыт из этой выдачи")
 
     model_config = ConfigDict(from_attributes=True)  # Для чтения из ORM-объектов
 
 
+class ProductCursorPage(BaseModel):
+    """
+    Страница товаров с keyset-пагинацией (без COUNT и OFFSET).
+    Следующая страница запрашивается с after_id=next_cursor.
+    """
+    items: List[Product] = Field(description="Товары для текущей страницы")
+    next_cursor: Optional[int] = Field(None, description="ID последнего товара страницы, None если страница последняя")
+    page_size: int = Field(ge=1, description="Количество элементов на странице")
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ProductImportError(BaseModel):
+    """
+    Ошибка одной строки массового импорта.
+    """
+    row: int = Field(ge=1, description="Номер строки данных в файле (без заголовка CSV)")
+    errors: List[str] = Field(description="Описание ошибок строки")
+
+
+class ProductImportReport(BaseModel):
+    """
+    Результат массового импорта товаров.
+    """
+    total_rows: int = Field(ge=0, description="Сколько строк данных прочитано из файла")
+    inserted: int = Field(ge=0, description="Сколько товаров создано")
+    errors: List[ProductImportError] = Field(default_factory=list, description="Строки, которые не были загружены")
+
+
+class ProductBulkUpdateItem(BaseModel):
+    """
+    Изменение цены и/или остатка одного товара в PATCH /products/bulk.
+    """
+    id: int = Field(ge=1, le=INT4_MAX, description="ID товара")
+    price: Optional[float] = Field(None, gt=0, le=99999999.99, description="Новая цена товара (больше 0)")
+    stock: Optional[int] = Field(None, ge=0, le=INT4_MAX, description="Новый остаток на складе (0 или больше)")
+
+    @model_validator(mode="after")
+    def check_has_changes(self):
+        if self.price is None and self.stock is None:
+            raise ValueError("price or stock must be provided")
+        return self
+
+
+class ProductBulkUpdateResult(BaseModel):
+    """
+    Результат изменения одного товара.
+    """
+    id: int = Field(description="ID товара")
+    status: Literal["updated", "not_found", "forbidden", "duplicate"] = Field(
+        description="updated — изменён, not_found — нет активного товара, "
+                    "forbidden — товар другого продавца, duplicate — ID повторяется в запросе")
+    price: Optional[float] = Field(None, description="Цена после изменения")
+    stock: Optional[int] = Field(None, description="Остаток после изменения")
 
 
+class FacetCount(BaseModel):
+    """
+    Количество видимых товаров в значении фасета.
+    """
+    products: int = Field(ge=0, description="Сколько товаров")
+    in_stock: int = Field(ge=0, description="Сколько из них в наличии")
+
+
+class CategoryFacet(FacetCount):
+    """
+    Фасет категории: товары категории вместе со всеми подкатегориями.
+    """
+    category_id: int = Field(description="ID категории")
+
+
+class SellerFacet(FacetCount):
+    """
+    Фасет продавца.
+    """
+    seller_id: int = Field(description="ID продавца")
+
+
+class PriceBucketFacet(FacetCount):
+    """
+    Фасет ценовой корзины [min_price, max_price).
+    """
+    min_price: float = Field(ge=0, description="Нижняя граница цены (включительно)")
+    max_price: Optional[float] = Field(None, description="Верхняя граница цены (не включительно), null — без границы")
+
+
+class StockFacet(BaseModel):
+    """
+    Фасет наличия.
+    """
+    in_stock: int = Field(ge=0, description="Товаров в наличии")
+    out_of_stock: int = Field(ge=0, description="Товаров без остатка")
+
+
+class ProductFacets(BaseModel):
+    """
+    Фасеты каталога для GET /products/facets.
+    """
+    total: int = Field(ge=0, description="Сколько товаров подходит под фильтры")
+    stock: StockFacet = Field(description="Наличие")
+    categories: List[CategoryFacet] = Field(description="Категории с учётом подкатегорий")
+    price_buckets: List[PriceBucketFacet] = Field(description="Ценовые корзины по возрастанию цены")
+    sellers: List[SellerFacet] = Field(description="Продавцы с наибольшим числом товаров")
@@ -0,0 +1,27 @@
+from datetime import datetime
+
+from pydantic import BaseModel, Field, ConfigDict
+
+
+class ZeroResultQuery(BaseModel):
+    """
+    Запрос, на который поиск ничего не нашёл.
+    """
+    query: str = Field(description="Запрос в нижнем регистре, как его ввёл пользователь")
+    searches: int = Field(ge=1, description="Сколько раз запрос ничего не нашёл за период")
+    last_seen: datetime = Field(description="Когда запрос был последний раз")
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class SlowQuery(BaseModel):
+    """
+    Время ответа поиска по запросу.
+    """
+    query: str = Field(description="Запрос в нижнем регистре")
+    searches: int = Field(ge=1, description="Сколько раз запрос выполнялся за период")
+    p50_ms: float = Field(description="Медиана времени ответа, мс")
+    p95_ms: float = Field(description="95-й перцентиль времени ответа, мс")
+    max_ms: float = Field(description="Максимальное время ответа, мс")
+
+    model_config = ConfigDict(from_attributes=True)
@@ -0,0 +1,189 @@
+"""
+Журнал поиска: запросы, число результатов, время ответа и переходы из выдачи.
+
+Обработчик запроса только дописывает кортеж в кольцевой буфер процесса (deque с maxlen) -
+это доли микросекунды без блокировок и без базы. Фоновая задача воркера раз в
+SEARCH_EVENTS_FLUSH_INTERVAL забирает накопленное пачками по SEARCH_EVENTS_BATCH и пишет их
+в search_events одним COPY. Если база недоступна или буфер переполнен (SEARCH_EVENTS_BUFFER),
+события теряются - это аналитика, а не учёт.
+
+search_events секционирована по дням: секции на SEARCH_EVENTS_PREMAKE_DAYS дней вперёд создаются
+при старте и раз в сутки, секции старше SEARCH_EVENTS_RETENTION_DAYS удаляются целиком.
+
+Каждый поиск получает search_id, он возвращается в ответе GET /products; клиент передаёт его
+в GET /products/{id}?search_id=..., и переход записывается как событие click.
+Отчёты - GET /search-analytics/zero-results и /search-analytics/slowest (только администратор).
+"""
+import asyncio
+import secrets
+import time
+from collections import deque
+from datetime import date, datetime, timedelta, timezone
+
+import asyncpg
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.database import async_session_maker
+from app.db.db_depends import get_asyncpg_connection
+from app.utils import (SEARCH_EVENTS_BATCH, SEARCH_EVENTS_BUFFER, SEARCH_EVENTS_ENABLED,
+                       SEARCH_EVENTS_FLUSH_INTERVAL, SEARCH_EVENTS_PREMAKE_DAYS, SEARCH_EVENTS_RETENTION_DAYS)
+
+COLUMNS = ("created_at", "search_id", "kind", "query", "corrected_query", "results", "latency_ms", "product_id")
+# Длина запроса в журнале (колонка String(200))
+_QUERY_LENGTH = 200
+# search_id - bigint: new_search_id выдаёт 63 бита, параметр запроса ограничивается тем же диапазоном
+SEARCH_ID_LIMIT = 2 ** 63
+# Ошибки записи пачки: кроме недоступной базы - ошибки COPY самого asyncpg (нет секции, значение
+# не помещается в колонку); пачка отбрасывается, фоновая задача продолжает работу
+_WRITE_ERRORS = (OSError, SQLAlchemyError, asyncpg.PostgresError, ValueError, OverflowError)
+_PARTITION_PREFIX = "search_events_p"
+
+_PARTITIONS_SQL = text("""
+    SELECT c.relname FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'search_events'::regclass
+""")
+
+_ZERO_RESULTS_SQL = text("""
+    SELECT lower(query) AS query, count(*) AS searches, max(created_at) AS last_seen
+    FROM search_events
+    WHERE kind = 'search' AND created_at >= now() - make_interval(days => :days) AND results = 0
+    GROUP BY lower(query)
+    ORDER BY searches DESC, last_seen DESC
+    LIMIT :limit
+""")
+_SLOWEST_SQL = text("""
+    SELECT lower(query) AS query, count(*) AS searches,
+           percentile_cont(0.5) WITHIN GROUP (ORDER BY latency_ms) AS p50_ms,
+           percentile_cont(0.95) WITHIN GROUP (ORDER BY latency_ms) AS p95_ms,
+           max(latency_ms) AS max_ms
+    FROM search_events
+    WHERE kind = 'search' AND created_at >= now() - make_interval(days => :days)
+    GROUP BY lower(query)
+    HAVING count(*) >= :min_searches
+    ORDER BY p95_ms DESC
+    LIMIT :limit
+""")
+
+# Кортежи в порядке COLUMNS, created_at - time.time(): в datetime переводится при записи
+_events: deque[tuple] = deque(maxlen=SEARCH_EVENTS_BUFFER)
+
+
+def new_search_id() -> int:
+    return secrets.randbits(63)
+
+
+def record_search(search_id: int, query: str, corrected_query: str | None, results: int,
+                  latency_ms: float) -> None:
+    """
+    Описание: Ставит событие поиска в буфер процесса. Не обращается к базе и не ждёт.
+    """
+    if SEARCH_EVENTS_ENABLED:
+        _events.append((time.time(), search_id, "search", query[:_QUERY_LENGTH],
+                        corrected_query[:_QUERY_LENGTH] if corrected_query else None, results, latency_ms, None))
+
+
+def record_click(search_id: int, product_id: int) -> None:
+    """
+    Описание: Ставит в буфер переход к товару из выдачи поиска search_id.
+    """
+    if SEARCH_EVENTS_ENABLED:
+        _events.append((time.time(), search_id, "click", None, None, None, None, product_id))
+
+
+def _take(batch_size: int) -> list[tuple]:
+    # popleft из deque атомарен, а между await сюда никто не вклинится - буфер разбирается без блокировок
+    batch = []
+    while _events and len(batch) < batch_size:
+        created_at, *rest = _events.popleft()
+        batch.append((datetime.fromtimestamp(created_at, timezone.utc), *rest))
+    return batch
+
+
+async def flush_events(batch_size: int = SEARCH_EVENTS_BATCH) -> int:
+    """
+    Описание: Пишет накопленные события в search_events пачками через COPY, каждая пачка - своя транзакция.
+              Пачка, которую не удалось записать, отбрасывается.
+    Возвращает:
+        int: сколько событий записано
+    """
+    written = 0
+    while batch := _take(batch_size):
+        try:
+            async with async_session_maker() as db:
+                connection = await get_asyncpg_connection(db)
+                await connection.copy_records_to_table("search_events", columns=COLUMNS, records=batch)
+                await db.commit()
+        except _WRITE_ERRORS as e:
+            logger.warning(f"Search events flush failed, {len(batch)} events dropped: {e}")
+            return written
+        written += len(batch)
+    return written
+
+
+def _partition_name(day: date) -> str:
+    return f"{_PARTITION_PREFIX}{day:%Y%m%d}"
+
+
+async def maintain_partitions(db: AsyncSession, today: date | None = None,
+                              premake_days: int = SEARCH_EVENTS_PREMAKE_DAYS,
+                              retention_days: int = SEARCH_EVENTS_RETENTION_DAYS) -> None:
+    """
+    Описание: Создаёт дневные секции search_events с сегодняшней по today + premake_days и удаляет секции
+              старше retention_days (commit делает вызывающий). Дни - по UTC, как и created_at событий.
+    """
+    today = today or datetime.now(timezone.utc).date()
+    existing = set((await db.scalars(_PARTITIONS_SQL)).all())
+    for offset in range(premake_days + 1):
+        day = today + timedelta(days=offset)
+        name = _partition_name(day)
+        if name not in existing:
+            # Имена и границы - из дат, не из пользовательского ввода; DDL не принимает параметры
+            await db.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF search_events "
+                f"FOR VALUES FROM ('{day.isoformat()}') TO ('{(day + timedelta(days=1)).isoformat()}')"
+            ))
+    oldest = _partition_name(today - timedelta(days=retention_days))
+    for name in sorted(existing):
+        if name.startswith(_PARTITION_PREFIX) and name < oldest:
+            await db.execute(text(f"DROP TABLE IF EXISTS {name}"))
+            logger.info(f"Dropped search events partition {name}")
+
+
+async def run_search_events_writer(interval: float = SEARCH_EVENTS_FLUSH_INTERVAL) -> None:
+    """
+    Описание: Фоновая задача воркера: раз в interval секунд сбрасывает буфер событий в базу,
+              раз в сутки обслуживает секции. Ошибки БД не останавливают цикл.
+              Запускается и отменяется в lifespan приложения; остаток буфера дописывает flush_events при остановке.
+    """
+    maintained_on = None
+    while True:
+        try:
+            today = datetime.now(timezone.utc).date()
+            if maintained_on != today:
+                async with async_session_maker() as db:
+                    await maintain_partitions(db, today)
+                    await db.commit()
+                maintained_on = today
+            await flush_events()
+        except _WRITE_ERRORS as e:
+            logger.warning(f"Search events writer failed: {e}")
+        await asyncio.sleep(interval)
+
+
+async def zero_result_queries(db: AsyncSession, days: int, limit: int) -> list:
+    """
+    Описание: Самые частые запросы без результатов за последние days дней.
+    """
+    return (await db.execute(_ZERO_RESULTS_SQL, {"days": days, "limit": limit})).all()
+
+
+async def slowest_queries(db: AsyncSession, days: int, limit: int, min_searches: int) -> list:
+    """
+    Описание: Запросы с наибольшим p95 времени ответа за последние days дней
+              (не реже min_searches раз, чтобы единичные выбросы не забивали отчёт).
+    """
+    return (await db.execute(_SLOWEST_SQL, {"days": days, "limit": limit, "min_searches": min_searches})).all()
@@ -0,0 +1,252 @@
+"""
+Нормализация и исправление поисковых запросов до обращения к базе.
+
+Поиск по каталогу - FTS по GIN-индексу или триграммная схожесть названия. Второе условие
+не индексируется и читает все видимые товары, а нужно оно только для запросов с опечатками.
+Поэтому запрос сначала приводится к словам каталога:
+    1. нижний регистр, ё -> е, слова - последовательности букв и цифр
+    2. слово из словаря оставляется как есть
+    3. слово, набранное не в той раскладке ("ntktajy" -> "телефон", "ыщтн" -> "sony"),
+       переводится, если перевод есть в словаре
+    4. иначе ищется ближайшее слово словаря (расстояние Дамерау-Левенштейна до SEARCH_SPELL_MAX_DISTANCE,
+       для слов до 4 букв - 1) симметричным удалением, как в SymSpell: в индексе лежат варианты
+       префикса каждого слова с удалёнными буквами, и кандидаты находятся поиском вариантов запроса
+       без перебора словаря. Из равноудалённых выбирается самое частое слово.
+Исправленный запрос ищется вместе с исходным (FTS по любому из них), поэтому правильное слово,
+которого нет в словаре, не теряется из-за замены на похожее частое. Если после исправления все слова
+запроса известны, поиск идёт только по FTS; иначе, как раньше, добавляется триграммное условие.
+
+numpy импортируется с первым непустым словарём, а не при импорте приложения.
+
+Словарь (search_terms) - лексемы поискового вектора видимых товаров (ts_stat по product_listing.tsv:
+название, описание и путь категории) без порога частоты: любое слово, которое находит FTS, известно.
+Частота - число товаров с лексемой, в словаре SEARCH_TERMS_MAX самых частых. Его пересобирает
+задача очереди refresh_search_terms раз в SEARCH_TERMS_REFRESH_INTERVAL, каждый воркер перечитывает
+таблицу раз в SEARCH_TERMS_SYNC_INTERVAL. Пока словарь не загружен, запросы не исправляются.
+"""
+import asyncio
+import re
+from dataclasses import dataclass
+
+from loguru import logger
+from sqlalchemy import select, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.database import async_session_maker
+from app.models import SearchTerm
+from app.utils import SEARCH_SPELL_MAX_DISTANCE, SEARCH_TERMS_MAX, SEARCH_TERMS_SYNC_INTERVAL
+
+# Длина префикса, по которому строятся удаления: память индекса не растёт с длиной слов
+_PREFIX_LENGTH = 7
+# Слова короче не исправляются: у двухбуквенного слова слишком много соседей
+_MIN_CORRECTED_LENGTH = 3
+_WORD = re.compile(r"[^\W_]+")
+# Синтаксис websearch_to_tsquery (фраза в кавычках, исключение -слово) не трогается
+_OPERATORS = re.compile(r'"|(^|\s)-\S')
+
+_EN = "qwertyuiop[]asdfghjkl;'zxcvbnm,.`"
+_RU = "йцукенгшщзхъфывапролджэячсмитьбюё"
+_TO_RU = str.maketrans(_EN, _RU)
+_TO_EN = str.maketrans(_RU, _EN)
+
+_REBUILD_SQL = (
+    # Пересборки идут по очереди (режим конфликтует сам с собой), чтение словаря воркерами не блокируется
+    text("LOCK TABLE search_terms IN SHARE ROW EXCLUSIVE MODE"),
+    text("DELETE FROM search_terms"),
+    text("""
+        INSERT INTO search_terms (term, frequency)
+        SELECT translate(word, 'ё', 'е'), max(ndoc)
+        FROM ts_stat('SELECT tsv FROM product_listing WHERE visible')
+        -- Лексемы simple - слова как есть, russian - основы; составные (email, url) не исправляются
+        WHERE word ~ '^[[:alnum:]]+$' AND length(word) BETWEEN 2 AND 100
+        GROUP BY 1
+        ORDER BY max(ndoc) DESC
+        LIMIT :max_terms
+    """),
+)
+
+
+def normalize(value: str) -> str:
+    return value.lower().replace("ё", "е")
+
+
+def switch_layout(word: str) -> str | None:
+    """
+    Описание: Слово в другой раскладке клавиатуры (латиница <-> кириллица); None - переводить нечего.
+    """
+    if all(char in _EN for char in word):
+        return word.translate(_TO_RU).replace("ё", "е")
+    if all(char in _RU for char in word):
+        return word.translate(_TO_EN)
+    return None
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Описание: Расстояние Дамерау-Левенштейна (с перестановкой соседних букв); больше limit - limit + 1.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def _deletes(word: str, distance: int) -> set[str]:
+    variants, frontier = {word}, {word}
+    for _ in range(distance):
+        frontier = {candidate[:i] + candidate[i + 1:] for candidate in frontier for i in range(len(candidate))}
+        variants |= frontier
+    return variants
+
+
+class SpellIndex:
+    """
+    Словарь слов каталога с частотами и индекс симметричного удаления для поиска ближайшего слова.
+    Индекс - отсортированный массив хешей вариантов с номерами слов: около 12 байт на вариант
+    вместо сотни с лишним у словаря строк. Совпадение хешей разных вариантов лишь добавляет
+    кандидата, которого отсеет проверка расстояния.
+    """
+
+    def __init__(self, terms: dict[str, int], max_distance: int = SEARCH_SPELL_MAX_DISTANCE):
+        self.max_distance = max_distance
+        self.terms = terms
+        self._words = list(terms)
+        if not terms:
+            return
+        import numpy as np
+
+        hashes, owners = [], []
+        for index, word in enumerate(self._words):
+            variants = _deletes(word[:_PREFIX_LENGTH], max_distance)
+            hashes += map(hash, variants)
+            owners += [index] * len(variants)
+        hashes = np.array(hashes, dtype=np.int64)
+        order = np.argsort(hashes, kind="stable")
+        self._hashes = hashes[order]
+        self._owners = np.array(owners, dtype=np.int32)[order]
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def closest(self, word: str) -> str | None:
+        """
+        Описание: Ближайшее слово словаря в пределах допустимого расстояния, при равенстве - самое частое.
+        """
+        if not self.terms:
+            return None
+        import numpy as np
+
+        limit = 1 if len(word) <= 4 else self.max_distance
+        keys = np.array([hash(variant) for variant in _deletes(word[:_PREFIX_LENGTH], limit)], dtype=np.int64)
+        starts = np.searchsorted(self._hashes, keys, side="left")
+        ends = np.searchsorted(self._hashes, keys, side="right")
+        best, best_key = None, None
+        for index in set().union(*(self._owners[start:end].tolist() for start, end in zip(starts, ends))):
+            candidate = self._words[index]
+            distance = edit_distance(word, candidate, limit)
+            key = (distance, -self.terms[candidate])
+            if distance <= limit and (best_key is None or key < best_key):
+                best, best_key = candidate, key
+        return best
+
+
+@dataclass(frozen=True)
+class SearchQuery:
+    text: str  # запрос для поиска: нормализованный и исправленный
+    corrected: bool  # исправлено хотя бы одно слово
+    known: bool  # все слова есть в словаре - достаточно FTS
+    original: str  # запрос клиента: при исправлении ищется вместе с text
+
+
+_index = SpellIndex({})
+
+
+def correct_query(value: str) -> SearchQuery:
+    """
+    Описание: Нормализует запрос и исправляет раскладку и опечатки по словарю процесса.
+    Аргументы:
+        value: поисковая строка от клиента
+    Возвращает:
+        SearchQuery: запрос для поиска и признаки исправления
+    """
+    if _OPERATORS.search(value):
+        return SearchQuery(value.strip(), False, False, value.strip())
+    index = _index
+    words, corrected, known = [], False, bool(len(index))
+    for chunk in normalize(value).split():
+        chunk_words = _WORD.findall(chunk)
+        # Раскладка переводится целиком: знаки препинания в латинице - буквы кириллицы ("ye;ty" -> "нужен")
+        switched = switch_layout(chunk)
+        switched_words = _WORD.findall(switched) if switched else []
+        if (switched_words and not all(word in index.terms for word in chunk_words)
+                and all(word in index.terms for word in switched_words)):
+            words += switched_words
+            corrected = True
+            continue
+        for word in chunk_words:
+            if _accepted(word, index):
+                words.append(word)
+                continue
+            candidate = index.closest(word)
+            if candidate is None and len(switched_words) == 1:
+                candidate = index.closest(switched_words[0])
+            if candidate:
+                words.append(candidate)
+                corrected = True
+            else:
+                words.append(word)
+                known = False
+    return SearchQuery(" ".join(words), corrected, known and bool(words), value.strip())
+
+
+def _accepted(word: str, index: SpellIndex) -> bool:
+    # Короткие слова и слова с цифрами (артикулы, модели) не исправляются и не требуют триграмм
+    return word in index.terms or len(word) < _MIN_CORRECTED_LENGTH or any(char.isdigit() for char in word)
+
+
+async def rebuild_search_terms(db: AsyncSession, max_terms: int = SEARCH_TERMS_MAX) -> None:
+    """
+    Описание: Пересобирает словарь search_terms по каталогу в транзакции сессии (commit делает вызывающий).
+    """
+    for statement in _REBUILD_SQL:
+        await db.execute(statement, {"max_terms": max_terms})
+
+
+async def load_search_terms() -> int:
+    """
+    Описание: Читает словарь из search_terms и заменяет индекс процесса.
+    Возвращает:
+        int: сколько слов в словаре
+    """
+    global _index
+    async with async_session_maker() as db:
+        terms = dict((await db.execute(select(SearchTerm.term, SearchTerm.frequency))).tuples().all())
+    if terms == _index.terms:
+        return len(terms)
+    # Индекс строится в потоке: на десятках тысяч слов это сотни миллисекунд
+    _index = await asyncio.to_thread(SpellIndex, terms)
+    return len(terms)
+
+
+async def run_search_terms_sync(interval: float = SEARCH_TERMS_SYNC_INTERVAL) -> None:
+    """
+    Описание: Фоновая задача воркера: раз в interval секунд перечитывает словарь. Ошибки БД не останавливают
+              цикл. Запускается и отменяется в lifespan приложения.
+    """
+    while True:
+        try:
+            await load_search_terms()
+        except (OSError, SQLAlchemyError) as e:
+            logger.warning(f"Search terms sync failed: {e}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,336 @@
+"""
+Детерминированный генератор синтетических данных для всех моделей приложения:
+дерево категорий (с таблицей замыкания), пользователи, товары, отзывы, корзины, заказы.
+
+Один и тот же --seed и те же размеры дают те же данные. Строки генерируются и
+загружаются через COPY пачками в отдельных процессах (--jobs), каждая пачка - своя транзакция.
+Пароль всех сгенерированных пользователей - SEED_PASSWORD, хеш Argon2 считается один раз.
+
+Использование (база из .env, миграции применены):
+    python -m app.seed --truncate                      # ~10M строк
+    python -m app.seed --truncate --scale 0.1 --jobs 4
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, fields, replace
+from datetime import datetime, timedelta, timezone
+
+import asyncpg
+
+from app.auth.password import hash_password
+from app.db.config import get_settings
+
+SEED_PASSWORD = "seed-password"
+BUYER_EMAIL = "buyer-{}@example.com"
+SELLER_EMAIL = "seller-{}@example.com"
+
+# Строк в одной пачке COPY. Константа, а не параметр: от неё зависит разбиение на
+# генераторы случайных чисел, и данные не должны меняться от настроек загрузки
+CHUNK_ROWS = 50_000
+
+ROOT_CATEGORIES = ["Электроника", "Одежда", "Дом и сад", "Спорт", "Книги", "Красота", "Игрушки", "Авто",
+                   "Продукты", "Зоотовары"]
+SUBCATEGORY_WORDS = ["Аксессуары", "Premium", "Новинки", "Классика", "Outdoor", "Для детей", "Smart", "Эко",
+                     "Профи", "Basic"]
+RU_ADJECTIVES = ["новый", "удобный", "лёгкий", "прочный", "компактный", "тёплый", "быстрый", "умный",
+                 "классический", "беспроводной", "детский", "профессиональный", "ёмкий", "тихий"]
+RU_NOUNS = ["телефон", "ноутбук", "чайник", "рюкзак", "куртка", "кроссовки", "фонарь", "наушники",
+            "светильник", "термос", "самокат", "пылесос", "зонт", "ёлка", "кресло", "планшет"]
+EN_ADJECTIVES = ["wireless", "smart", "portable", "classic", "ultra", "pro", "mini", "eco", "sport", "max"]
+EN_NOUNS = ["phone", "laptop", "kettle", "backpack", "jacket", "sneakers", "headphones", "lamp",
+            "scooter", "vacuum", "umbrella", "chair", "tablet", "watch"]
+BRANDS = ["Sibir", "Volga", "Nordic", "Aurora", "Polar", "Orion", "Taiga", "Ural", "Baikal", "Zenit"]
+REVIEW_PHRASES = ["Отличный товар", "Соответствует описанию", "Быстрая доставка", "Good value for money",
+                  "Не понравилось качество", "Works as expected", "Рекомендую", "Could be better"]
+ORDER_STATUSES = ["pending", "paid", "shipped", "delivered", "cancelled"]
+
+# Слова, по которым поиск гарантированно что-то находит
+SEARCH_TERMS = RU_NOUNS + EN_NOUNS + BRANDS
+
+TABLES = ["users", "categories", "products", "reviews", "cart_items", "orders", "order_items"]
+# Производные таблицы без внешнего ключа на TABLES: CASCADE их не очищает, а TRUNCATE не вызывает
+# триггеры, которые их ведут. Счётчики фасетов заново набираются триггерами при загрузке, соседи
+# "с этим товаром покупают" - следующим пересчётом с нулевого водяного знака (RESTART IDENTITY
+# начинает ID заказов заново, и старый знак пропустил бы все новые заказы)
+DERIVED_TABLES = ["category_closure", "product_facets", "product_related", "product_related_state"]
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+@dataclass(frozen=True)
+class SeedConfig:
+    """Размеры набора данных. Значения по умолчанию дают около 10 миллионов строк."""
+    seed: int = 42
+    buyers: int = 200_000
+    sellers: int = 2_000
+    products: int = 1_000_000
+    subcategories: int = 6
+    leaves_per_subcategory: int = 6
+    reviews_per_buyer: int = 20
+    cart_items_per_buyer: int = 5
+    orders_per_buyer: int = 5
+    items_per_order: int = 3
+
+    def scaled(self, factor: float) -> "SeedConfig":
+        """Уменьшает или увеличивает количество пользователей и товаров, сохраняя пропорции."""
+        return replace(self, buyers=max(1, int(self.buyers * factor)), sellers=max(1, int(self.sellers * factor)),
+                       products=max(1, int(self.products * factor)))
+
+
+@dataclass(frozen=True)
+class IdBase:
+    """Первые свободные ID таблиц: данные можно дописывать в непустую базу."""
+    users: int
+    categories: int
+    products: int
+    reviews: int
+    cart_items: int
+    orders: int
+    order_items: int
+
+
+def product_price(seed: int, product_id: int) -> float:
+    """
+    Описание: Цена товара как чистая функция от ID - позиции заказов получают ту же цену,
+              не имея доступа к сгенерированным товарам из другого процесса.
+    """
+    return ((product_id * 2654435761 + seed * 40503) % 9_999_900 + 100) / 100
+
+
+def _pick_product(rng: random.Random, cfg: SeedConfig, base: IdBase) -> int:
+    # Квадрат равномерного числа смещает выбор к первым товарам: есть "хиты" и длинный хвост
+    return base.products + int(cfg.products * rng.random() ** 2)
+
+
+def _distinct_products(rng: random.Random, cfg: SeedConfig, base: IdBase, count: int) -> list[int]:
+    count = min(count, cfg.products)
+    picked: set[int] = set()
+    while len(picked) < count:
+        picked.add(_pick_product(rng, cfg, base))
+    return sorted(picked)
+
+
+def build_categories(cfg: SeedConfig, base: IdBase) -> tuple[list[tuple], list[tuple], list[int]]:
+    """
+    Описание: Дерево категорий из трёх уровней и его таблица замыкания.
+    Возвращает:
+        tuple: строки categories, строки category_closure, ID листовых категорий
+    """
+    rng = random.Random(f"{cfg.seed}:categories")
+    categories, closure, leaves = [], [], []
+    for root_name in ROOT_CATEGORIES:
+        root_id = base.categories + len(categories)
+        categories.append((root_id, root_name, None, True))
+        closure.append((root_id, root_id, 0))
+        for sub_word in rng.sample(SUBCATEGORY_WORDS, min(cfg.subcategories, len(SUBCATEGORY_WORDS))):
+            sub_id = base.categories + len(categories)
+            categories.append((sub_id, f"{root_name}: {sub_word}"[:50], root_id, True))
+            closure += [(sub_id, sub_id, 0), (root_id, sub_id, 1)]
+            for k in range(cfg.leaves_per_subcategory):
+                leaf_id = base.categories + len(categories)
+                categories.append((leaf_id, f"{sub_word} {rng.choice(RU_NOUNS)} {k + 1}"[:50], sub_id, True))
+                closure += [(leaf_id, leaf_id, 0), (sub_id, leaf_id, 1), (root_id, leaf_id, 2)]
+                leaves.append(leaf_id)
+    return categories, closure, leaves
+
+
+def build_users(cfg: SeedConfig, base: IdBase, password_hash: str) -> list[tuple]:
+    users = [(base.users + i, SELLER_EMAIL.format(i), password_hash, True, "seller") for i in range(cfg.sellers)]
+    users += [(base.users + cfg.sellers + i, BUYER_EMAIL.format(i), password_hash, True, "buyer")
+              for i in range(cfg.buyers)]
+    return users
+
+
+def _product_rows(cfg: SeedConfig, base: IdBase, leaves: list[int], start: int, stop: int) -> dict:
+    rng = random.Random(f"{cfg.seed}:products:{start}")
+    rows = []
+    for i in range(start, stop):
+        product_id = base.products + i
+        brand = rng.choice(BRANDS)
+        if rng.random() < 0.6:
+            name = f"{rng.choice(RU_ADJECTIVES).capitalize()} {rng.choice(RU_NOUNS)} {brand}"
+            description = (f"{name}: {rng.choice(RU_ADJECTIVES)} и {rng.choice(RU_ADJECTIVES)}. "
+                           f"Подходит как {rng.choice(RU_NOUNS)} для дома. {rng.choice(EN_ADJECTIVES)} edition")
+        else:
+            name = f"{brand} {rng.choice(EN_ADJECTIVES).capitalize()} {rng.choice(EN_NOUNS)}"
+            description = (f"{name}. {rng.choice(EN_ADJECTIVES).capitalize()} and {rng.choice(EN_ADJECTIVES)} "
+                           f"{rng.choice(EN_NOUNS)}. Аналог: {rng.choice(RU_NOUNS)}")
+        stock = 0 if rng.random() < 0.1 else rng.randint(1, 500)
+        rows.append((product_id, name, description, product_price(cfg.seed, product_id), None, stock,
+                     rng.random() > 0.03, rng.choice(leaves), base.users + rng.randrange(cfg.sellers)))
+    return {"products": rows}
+
+
+def _buyer_rows(cfg: SeedConfig, base: IdBase, start: int, stop: int) -> dict:
+    """Отзывы, корзины и заказы покупателей с индексами [start, stop) - ID вычисляются из индекса."""
+    rng = random.Random(f"{cfg.seed}:buyers:{start}")
+    reviews, cart_items, orders, order_items = [], [], [], []
+    for i in range(start, stop):
+        user_id = base.users + cfg.sellers + i
+
+        for j, product_id in enumerate(_distinct_products(rng, cfg, base, cfg.reviews_per_buyer)):
+            reviews.append((base.reviews + i * cfg.reviews_per_buyer + j, user_id, product_id,
+                            rng.choice(REVIEW_PHRASES),
+                            (EPOCH + timedelta(minutes=rng.randrange(1_000_000))).replace(tzinfo=None),
+                            rng.choices((1, 2, 3, 4, 5), (1, 1, 2, 4, 6))[0], rng.random() > 0.02))
+
+        for j, product_id in enumerate(_distinct_products(rng, cfg, base, cfg.cart_items_per_buyer)):
+            cart_items.append((base.cart_items + i * cfg.cart_items_per_buyer + j, user_id, product_id,
+                               rng.randint(1, 3)))
+
+        for j in range(cfg.orders_per_buyer):
+            order_index = i * cfg.orders_per_buyer + j
+            order_id = base.orders + order_index
+            total = 0.0
+            for k, product_id in enumerate(_distinct_products(rng, cfg, base, cfg.items_per_order)):
+                quantity = rng.randint(1, 3)
+                unit_price = product_price(cfg.seed, product_id)
+                line_total = round(unit_price * quantity, 2)
+                total += line_total
+                order_items.append((base.order_items + order_index * cfg.items_per_order + k, order_id,
+                                    product_id, quantity, unit_price, line_total))
+            created_at = EPOCH + timedelta(minutes=rng.randrange(1_000_000))
+            orders.append((order_id, user_id, rng.choice(ORDER_STATUSES), round(total, 2), created_at, created_at))
+
+    return {"reviews": reviews, "cart_items": cart_items, "orders": orders, "order_items": order_items}
+
+
+COLUMNS = {
+    "users": ["id", "email", "hashed_password", "is_active", "role"],
+    "categories": ["id", "name", "parent_id", "is_active"],
+    "category_closure": ["ancestor_id", "descendant_id", "depth"],
+    "products": ["id", "name", "description", "price", "image_url", "stock", "is_active", "category_id",
+                 "seller_id"],
+    "reviews": ["id", "user_id", "product_id", "comment", "comment_date", "grade", "is_active"],
+    "cart_items": ["id", "user_id", "product_id", "quantity"],
+    "orders": ["id", "user_id", "status", "total_amount", "created_at", "updated_at"],
+    "order_items": ["id", "order_id", "product_id", "quantity", "unit_price", "total_price"],
+}
+
+
+async def _connect() -> asyncpg.Connection:
+    settings = get_settings()
+    return await asyncpg.connect(host=settings.DB_HOST, port=settings.DB_PORT, user=settings.DB_USER,
+                                 password=settings.DB_PASSWORD, database=settings.DB_NAME)
+
+
+async def _copy_tables(tables: dict[str, list[tuple]]) -> None:
+    """COPY нескольких таблиц одной транзакцией (порядок словаря - порядок внешних ключей)."""
+    conn = await _connect()
+    try:
+        async with conn.transaction():
+            for table, rows in tables.items():
+                if rows:
+                    await conn.copy_records_to_table(table, records=rows, columns=COLUMNS[table])
+    finally:
+        await conn.close()
+
+
+def _load_chunk(kind: str, cfg: SeedConfig, base: IdBase, leaves: list[int], start: int, stop: int) -> dict:
+    """Точка входа процесса-загрузчика: генерирует пачку и копирует её в базу."""
+    if kind == "products":
+        tables = _product_rows(cfg, base, leaves, start, stop)
+    else:
+        tables = _buyer_rows(cfg, base, start, stop)
+    asyncio.run(_copy_tables(tables))
+    return {table: len(rows) for table, rows in tables.items()}
+
+
+def _chunks(total: int, size: int) -> list[tuple[int, int]]:
+    return [(start, min(start + size, total)) for start in range(0, total, size)]
+
+
+async def _prepare(cfg: SeedConfig, truncate: bool) -> IdBase:
+    conn = await _connect()
+    try:
+        if truncate:
+            await conn.execute("TRUNCATE " + ", ".join(TABLES + DERIVED_TABLES) + " RESTART IDENTITY CASCADE")
+        elif await conn.fetchval("SELECT 1 FROM users WHERE email = $1", BUYER_EMAIL.format(0)):
+            raise SystemExit("Seed data is already loaded, use --truncate to reload")
+        next_ids = {table: await conn.fetchval(f"SELECT coalesce(max(id), 0) + 1 FROM {table}") for table in TABLES}
+        return IdBase(**next_ids)
+    finally:
+        await conn.close()
+
+
+async def _finish(base: IdBase) -> None:
+    """Рейтинги товаров по отзывам, сдвиг последовательностей после явных ID и статистика планировщика."""
+    conn = await _connect()
+    try:
+        await conn.execute("""
+            UPDATE products AS p SET rating = r.rating
+            FROM (SELECT product_id, round(avg(grade), 2) AS rating FROM reviews
+                  WHERE is_active AND product_id >= $1 GROUP BY product_id) AS r
+            WHERE p.id = r.product_id
+        """, base.products)
+        for table in TABLES:
+            await conn.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                               f"(SELECT coalesce(max(id), 1) FROM {table}))")
+        await conn.execute("ANALYZE")
+    finally:
+        await conn.close()
+
+
+def seed(cfg: SeedConfig, jobs: int, truncate: bool = False) -> dict[str, int]:
+    """
+    Описание: Генерирует и загружает весь набор данных.
+              Этапы идут в порядке внешних ключей: пользователи и категории, затем товары,
+              затем отзывы, корзины и заказы; внутри этапа пачки грузятся параллельно.
+    Аргументы:
+        cfg: размеры набора данных и seed
+        jobs: количество процессов-загрузчиков
+        truncate: очистить таблицы приложения перед загрузкой
+    Возвращает:
+        dict[str, int]: сколько строк загружено в каждую таблицу
+    """
+    base = asyncio.run(_prepare(cfg, truncate))
+    categories, closure, leaves = build_categories(cfg, base)
+    users = build_users(cfg, base, hash_password(SEED_PASSWORD))
+    asyncio.run(_copy_tables({"users": users, "categories": categories, "category_closure": closure}))
+    counts = {"users": len(users), "categories": len(categories), "category_closure": len(closure)}
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        # Отзывы, корзины и заказы ссылаются на товары - следующий этап ждёт окончания предыдущего
+        stages = [
+            ("products", _chunks(cfg.products, CHUNK_ROWS)),
+            ("buyers", _chunks(cfg.buyers, max(1, CHUNK_ROWS // max(1, cfg.reviews_per_buyer)))),
+        ]
+        for kind, chunks in stages:
+            futures = [pool.submit(_load_chunk, kind, cfg, base, leaves, start, stop) for start, stop in chunks]
+            for future in futures:
+                for table, count in future.result().items():
+                    counts[table] = counts.get(table, 0) + count
+
+    asyncio.run(_finish(base))
+    return counts
+
+
+def main() -> int:
+    defaults = SeedConfig()
+    parser = argparse.ArgumentParser(prog="python -m app.seed", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    for field in fields(SeedConfig):
+        parser.add_argument(f"--{field.name.replace('_', '-')}", type=int, default=getattr(defaults, field.name))
+    parser.add_argument("--scale", type=float, default=1.0, help="множитель количества пользователей и товаров")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="процессов-загрузчиков")
+    parser.add_argument("--truncate", action="store_true", help="очистить таблицы приложения перед загрузкой")
+    args = parser.parse_args()
+
+    cfg = SeedConfig(**{field.name: getattr(args, field.name) for field in fields(SeedConfig)}).scaled(args.scale)
+    started = time.perf_counter()
+    counts = seed(cfg, args.jobs, args.truncate)
+    elapsed = time.perf_counter() - started
+
+    for table, count in counts.items():
+        print(f"{table:<18} {count:>12,}")
+    total = sum(counts.values())
+    print(f"{'total':<18} {total:>12,} rows in {elapsed:.1f} s ({total / elapsed:,.0f} rows/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
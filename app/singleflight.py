@@ -0,0 +1,190 @@
+"""
+Схлопывание одинаковых одновременных запросов чтения (single-flight).
+
+Во время акций сотни одинаковых GET /products?category_id=X&page=1 или GET /products/{id} приходят
+за несколько миллисекунд, и каждый выполняет свои COUNT и запрос страницы. Middleware пропускает
+в приложение только первый запрос с данным ключом (ведущий), остальные, пришедшие, пока он
+выполняется, ждут его и получают тот же ответ: статус, заголовки и уже сериализованное тело.
+Результат не кэшируется - следующий запрос после завершения ведущего начинает новый полёт.
+
+Схлопываются только публичные маршруты чтения (ROUTES): их ответ не зависит от пользователя,
+поэтому Authorization и cookie в ключ не входят. Ключ - метод, путь и query-параметры, отсортированные
+и без пустых значений; параметры из SINGLE_FLIGHT_IGNORED_PARAMS (utm-метки и т.п.) отбрасываются.
+Запросы с параметрами из BYPASS_PARAMS не схлопываются вовсе: каждый поиск (search) получает свой
+search_id и своё событие в журнале поиска, каждый переход из выдачи (search_id) - событие click,
+и одинаковые запросы, пришедшие вместе, должны быть посчитаны все. nginx их тоже не кэширует.
+
+Если ведущий упал или был отменён, ожидающие выполняют запрос сами. Ответ помечается заголовком
+X-Single-Flight: leader или shared (nginx пишет его в access-лог), счётчики по группам маршрутов
+раз в SINGLE_FLIGHT_REPORT_INTERVAL пишутся в лог.
+
+Middleware стоит внутри логирования и сжатия: каждый запрос логируется и сжимается по своему
+Accept-Encoding, а разделяется только несжатое тело.
+"""
+import asyncio
+import re
+from collections import Counter
+from dataclasses import dataclass
+from urllib.parse import parse_qsl, urlencode
+
+from loguru import logger
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.utils import SINGLE_FLIGHT_ENABLED, SINGLE_FLIGHT_IGNORED_PARAMS, SINGLE_FLIGHT_REPORT_INTERVAL
+
+HEADER = b"x-single-flight"
+# Параметры, ради которых запрос должен дойти до приложения сам: у ответа есть побочный эффект
+BYPASS_PARAMS = frozenset({"search", "search_id"})
+
+
+@dataclass(frozen=True)
+class Route:
+    """
+    Группа схлопываемых маршрутов: имя для счётчиков и регулярное выражение полного пути.
+    """
+    group: str
+    pattern: re.Pattern
+
+    def matches(self, path: str) -> bool:
+        return self.pattern.fullmatch(path) is not None
+
+
+ROUTES = (
+    Route("products", re.compile(r"/products/?")),
+    Route("product", re.compile(r"/products/\d+/?")),
+    Route("categories", re.compile(r"/categories/?")),
+    Route("reviews", re.compile(r"/reviews/?|/reviews/products/\d+/?")),
+)
+
+
+@dataclass(frozen=True)
+class SharedResponse:
+    status: int
+    headers: list[tuple[bytes, bytes]]
+    body: bytes
+
+
+def request_key(scope: Scope, ignored: frozenset[str]) -> str:
+    """
+    Описание: Ключ запроса: метод, путь и нормализованные query-параметры.
+    Аргументы:
+        scope: ASGI scope запроса
+        ignored: параметры, не влияющие на ответ
+    Возвращает:
+        str: одинаковый для запросов, которые вернут один и тот же ответ
+    """
+    params = sorted((name, value) for name, value in
+                    parse_qsl(scope["query_string"].decode("latin-1"), keep_blank_values=False)
+                    if name not in ignored)
+    return f"{scope['method']} {scope['path']}?{urlencode(params)}"
+
+
+# Счётчики процесса: (группа, leader | shared | retried) -> запросов
+stats: Counter[tuple[str, str]] = Counter()
+
+
+class SingleFlightMiddleware:
+    """
+    ASGI middleware схлопывания одинаковых GET-запросов. Подключается до log_middleware,
+    чтобы стоять внутри логирования и сжатия.
+    """
+
+    def __init__(self, app: ASGIApp, routes: tuple[Route, ...] = ROUTES,
+                 ignored_params: str = SINGLE_FLIGHT_IGNORED_PARAMS, enabled: bool = SINGLE_FLIGHT_ENABLED,
+                 bypass_params: frozenset[str] = BYPASS_PARAMS):
+        self.app = app
+        self.routes = routes
+        self.bypass = bypass_params
+        self.ignored = frozenset(name.strip() for name in ignored_params.split(",") if name.strip())
+        self.enabled = enabled
+        self._flights: dict[str, asyncio.Future] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.enabled or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+        route = next((route for route in self.routes if route.matches(scope["path"])), None)
+        if route is None or self._bypassed(scope):
+            await self.app(scope, receive, send)
+            return
+
+        key = request_key(scope, self.ignored)
+        flight = self._flights.get(key)
+        if flight is not None:
+            try:
+                # shield: отмена ожидающего (клиент ушёл) не должна отменять общий результат
+                response = await asyncio.shield(flight)
+            except Exception:
+                # Ведущий упал - ошибку получает он сам, остальные пробуют без схлопывания
+                stats[route.group, "retried"] += 1
+                await self.app(scope, receive, send)
+                return
+            stats[route.group, "shared"] += 1
+            await self._replay(response, b"shared", send)
+            return
+
+        flight = self._flights[key] = asyncio.get_running_loop().create_future()
+        try:
+            response = await self._capture(scope, receive)
+        except BaseException as e:
+            flight.set_exception(e if isinstance(e, Exception) else RuntimeError("single-flight leader cancelled"))
+            # Исключение забирают ожидающие; если их нет, asyncio не должен ругаться на непрочитанную ошибку
+            flight.exception()
+            raise
+        else:
+            flight.set_result(response)
+        finally:
+            del self._flights[key]
+        stats[route.group, "leader"] += 1
+        await self._replay(response, b"leader", send)
+
+    def _bypassed(self, scope: Scope) -> bool:
+        query = scope["query_string"].decode("latin-1")
+        return any(name in self.bypass for name, _ in parse_qsl(query, keep_blank_values=False))
+
+    async def _capture(self, scope: Scope, receive: Receive) -> SharedResponse:
+        start: Message = {}
+        body = []
+
+        async def capture(message: Message) -> None:
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+            elif message["type"] == "http.response.body":
+                body.append(message.get("body", b""))
+
+        await self.app(scope, receive, capture)
+        return SharedResponse(start["status"], list(start.get("headers", [])), b"".join(body))
+
+    @staticmethod
+    async def _replay(response: SharedResponse, role: bytes, send: Send) -> None:
+        await send({"type": "http.response.start", "status": response.status,
+                    "headers": response.headers + [(HEADER, role)]})
+        await send({"type": "http.response.body", "body": response.body})
+
+
+def take_stats() -> dict[str, dict[str, int]]:
+    """
+    Описание: Забирает счётчики с последнего вызова и обнуляет их.
+    Возвращает:
+        dict: группа маршрутов -> {leader, shared, retried}
+    """
+    report: dict[str, dict[str, int]] = {}
+    for (group, outcome), count in stats.items():
+        report.setdefault(group, {"leader": 0, "shared": 0, "retried": 0})[outcome] = count
+    stats.clear()
+    return report
+
+
+async def run_single_flight_report(interval: float = SINGLE_FLIGHT_REPORT_INTERVAL) -> None:
+    """
+    Описание: Фоновая задача воркера: раз в interval секунд пишет в лог, сколько запросов схлопнуто
+              по каждой группе маршрутов. Запускается и отменяется в lifespan приложения.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        for group, counts in take_stats().items():
+            total = sum(counts.values())
+            logger.info(f"Single-flight {group}: {total} requests, {counts['shared']} shared "
+                        f"({100 * counts['shared'] / total:.1f}%), {counts['leader']} executed, "
+                        f"{counts['retried']} retried after leader failure")
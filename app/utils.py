@@ -19,4 +19,121 @@ COOKIE_SAMESITE = "strict"
 COOKIE_MAX_AGE = 60 * 60 * 24 * REFRESH_TOKEN_EXPIRE_DAYS  # в секундах
 
 # Secure — только в продакшене
-COOKIE_SECURE = ENV == "production"
\ No newline at end of file
+COOKIE_SECURE = ENV == "production"
+
+# Сжатие ответов (порядок в COMPRESSION_ENCODINGS - приоритет сервера)
+COMPRESSION_ENCODINGS = [e.strip() for e in os.getenv("COMPRESSION_ENCODINGS", "zstd,br,gzip").split(",") if e.strip()]
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))  # в байтах
+COMPRESSION_CONTENT_TYPES = [t.strip() for t in os.getenv(
+    "COMPRESSION_CONTENT_TYPES", "application/json,application/x-ndjson,text/csv,text/plain,text/html"
+).split(",") if t.strip()]
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", 6))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", 4))
+COMPRESSION_ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", 3))
+# Кэш уже сжатых тел ответов, 0 - отключить
+COMPRESSION_CACHE_MAX_BYTES = int(os.getenv("COMPRESSION_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+# Тела от этого размера (в байтах) сжимаются в пуле потоков, а не в цикле событий
+COMPRESSION_THREAD_MIN_SIZE = int(os.getenv("COMPRESSION_THREAD_MIN_SIZE", 256 * 1024))
+
+# Склад: срок резерва корзины при оформлении, порог ленты "мало на складе" и фоновая очистка резервов
+RESERVATION_TTL_MINUTES = int(os.getenv("RESERVATION_TTL_MINUTES", 15))
+LOW_STOCK_THRESHOLD = int(os.getenv("LOW_STOCK_THRESHOLD", 5))
+RESERVATION_SWEEP_INTERVAL = float(os.getenv("RESERVATION_SWEEP_INTERVAL", 30))  # в секундах
+RESERVATION_SWEEP_BATCH = int(os.getenv("RESERVATION_SWEEP_BATCH", 1000))
+
+# Списки и карточки товаров читаются из модели чтения product_listing (false - из products с проверками)
+PRODUCT_LISTING_READS = os.getenv("PRODUCT_LISTING_READS", "true").lower() == "true"
+
+# Фоновая очередь задач (app.jobs): воркер в процессе приложения или отдельно (python -m app.jobs)
+JOBS_IN_APP = os.getenv("JOBS_IN_APP", "true").lower() == "true"
+JOB_BATCH_SIZE = int(os.getenv("JOB_BATCH_SIZE", 50))
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", 4))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", 1))  # в секундах
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", 60))
+JOB_RETRY_BASE = float(os.getenv("JOB_RETRY_BASE", 2))  # в секундах
+JOB_RETRY_MAX = float(os.getenv("JOB_RETRY_MAX", 600))  # в секундах
+
+# Асимметричные ключи JWT (app.auth.keys): каталог <kid>.pem и kid ключа подписи; без каталога - SECRET_KEY
+JWT_KEYS_DIR = os.getenv("JWT_KEYS_DIR") or None
+JWT_ACTIVE_KID = os.getenv("JWT_ACTIVE_KID") or None
+JWT_KEYS_RELOAD_INTERVAL = float(os.getenv("JWT_KEYS_RELOAD_INTERVAL", 30))  # в секундах
+# Кэш недавно проверенных токенов, 0 - отключить
+JWT_VERIFY_CACHE_SIZE = int(os.getenv("JWT_VERIFY_CACHE_SIZE", 4096))
+
+# Отзыв refresh-токенов: фильтр Блума отозванных семейств в каждом воркере и очистка истёкших семейств
+JWT_REVOCATION_BLOOM_BITS = int(os.getenv("JWT_REVOCATION_BLOOM_BITS", 1 << 20))
+JWT_REVOCATION_SYNC_INTERVAL = float(os.getenv("JWT_REVOCATION_SYNC_INTERVAL", 2))  # в секундах
+JWT_REVOCATION_REBUILD_INTERVAL = float(os.getenv("JWT_REVOCATION_REBUILD_INTERVAL", 3600))  # в секундах
+REFRESH_TOKEN_SWEEP_BATCH = int(os.getenv("REFRESH_TOKEN_SWEEP_BATCH", 1000))
+
+# Ограничение частоты запросов (app.ratelimit): лимиты "<запросов>/<секунд>", пустая строка - без лимита
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")  # memory или postgres
+RATE_LIMIT_LOGIN = os.getenv("RATE_LIMIT_LOGIN", "10/60")
+RATE_LIMIT_REFRESH = os.getenv("RATE_LIMIT_REFRESH", "30/60")
+RATE_LIMIT_SEARCH = os.getenv("RATE_LIMIT_SEARCH", "60/60")
+RATE_LIMIT_EXPORT = os.getenv("RATE_LIMIT_EXPORT", "5/60")
+RATE_LIMIT_DEFAULT = os.getenv("RATE_LIMIT_DEFAULT", "")
+# Сети прокси, которым можно верить в X-Forwarded-For (nginx в docker-сети)
+RATE_LIMIT_TRUSTED_PROXIES = os.getenv("RATE_LIMIT_TRUSTED_PROXIES",
+                                       "127.0.0.1/32,::1/128,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16")
+RATE_LIMIT_MEMORY_KEYS = int(os.getenv("RATE_LIMIT_MEMORY_KEYS", 100_000))
+RATE_LIMIT_SWEEP_INTERVAL = float(os.getenv("RATE_LIMIT_SWEEP_INTERVAL", 300))  # в секундах
+
+# Вход: пул хеширования Argon2 и экспоненциальная задержка по аккаунту после неудачных попыток
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 16))
+LOGIN_FAILURE_WINDOW = float(os.getenv("LOGIN_FAILURE_WINDOW", 900))  # в секундах
+LOGIN_FREE_FAILURES = int(os.getenv("LOGIN_FREE_FAILURES", 5))
+LOGIN_BACKOFF_BASE = float(os.getenv("LOGIN_BACKOFF_BASE", 1))  # в секундах
+LOGIN_BACKOFF_MAX = float(os.getenv("LOGIN_BACKOFF_MAX", 900))  # в секундах
+LOGIN_TRACKED_ACCOUNTS = int(os.getenv("LOGIN_TRACKED_ACCOUNTS", 100_000))
+
+# Рекомендации "с этим товаром покупают" (app.recommendations)
+RELATED_TOP_K = int(os.getenv("RELATED_TOP_K", 10))
+RELATED_STORED_NEIGHBOURS = int(os.getenv("RELATED_STORED_NEIGHBOURS", 30))
+RELATED_BATCH_ORDERS = int(os.getenv("RELATED_BATCH_ORDERS", 20_000))
+RELATED_REFRESH_INTERVAL = float(os.getenv("RELATED_REFRESH_INTERVAL", 600))  # в секундах
+RELATED_CACHE_TTL = float(os.getenv("RELATED_CACHE_TTL", 300))  # в секундах
+RELATED_CACHE_SIZE = int(os.getenv("RELATED_CACHE_SIZE", 10_000))
+
+# Ранжирование поиска (app.ranking): веса вида "<сигнал>=<вес>,..."
+SEARCH_RANK_WEIGHTS = os.getenv("SEARCH_RANK_WEIGHTS", "text=1,popularity=0.3,stock=0.1")
+POPULARITY_WEIGHTS = os.getenv("POPULARITY_WEIGHTS", "rating=1,reviews=1,sales=2")
+POPULARITY_SALES_DAYS = int(os.getenv("POPULARITY_SALES_DAYS", 30))
+# Число отзывов и продаж за окно, начиная с которого сигнал считается полным (шкала логарифмическая)
+POPULARITY_REVIEWS_REF = int(os.getenv("POPULARITY_REVIEWS_REF", 100))
+POPULARITY_SALES_REF = int(os.getenv("POPULARITY_SALES_REF", 50))
+POPULARITY_REFRESH_INTERVAL = float(os.getenv("POPULARITY_REFRESH_INTERVAL", 3600))  # в секундах
+POPULARITY_BATCH_SIZE = int(os.getenv("POPULARITY_BATCH_SIZE", 10_000))  # товаров в одной транзакции пересчёта
+
+# Исправление поисковых запросов (app.search_query): словарь слов каталога в памяти воркера
+SEARCH_TERMS_MAX = int(os.getenv("SEARCH_TERMS_MAX", 50_000))
+SEARCH_TERMS_REFRESH_INTERVAL = float(os.getenv("SEARCH_TERMS_REFRESH_INTERVAL", 3600))  # в секундах
+SEARCH_TERMS_SYNC_INTERVAL = float(os.getenv("SEARCH_TERMS_SYNC_INTERVAL", 300))  # в секундах
+SEARCH_SPELL_MAX_DISTANCE = int(os.getenv("SEARCH_SPELL_MAX_DISTANCE", 2))
+
+# Журнал поиска (app.search_analytics): кольцевой буфер в процессе, запись в search_events пачками COPY
+SEARCH_EVENTS_ENABLED = os.getenv("SEARCH_EVENTS_ENABLED", "true").lower() == "true"
+SEARCH_EVENTS_BUFFER = int(os.getenv("SEARCH_EVENTS_BUFFER", 100_000))
+SEARCH_EVENTS_BATCH = int(os.getenv("SEARCH_EVENTS_BATCH", 5000))
+SEARCH_EVENTS_FLUSH_INTERVAL = float(os.getenv("SEARCH_EVENTS_FLUSH_INTERVAL", 2))  # в секундах
+SEARCH_EVENTS_PREMAKE_DAYS = int(os.getenv("SEARCH_EVENTS_PREMAKE_DAYS", 3))
+SEARCH_EVENTS_RETENTION_DAYS = int(os.getenv("SEARCH_EVENTS_RETENTION_DAYS", 90))
+
+# Схлопывание одинаковых одновременных запросов чтения (app.singleflight)
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+# Query-параметры, не влияющие на ответ: в ключ схлопывания не входят
+SINGLE_FLIGHT_IGNORED_PARAMS = os.getenv("SINGLE_FLIGHT_IGNORED_PARAMS",
+                                         "utm_source,utm_medium,utm_campaign,utm_term,utm_content,gclid,fbclid,yclid")
+SINGLE_FLIGHT_REPORT_INTERVAL = float(os.getenv("SINGLE_FLIGHT_REPORT_INTERVAL", 60))  # в секундах
+
+# Двухуровневый кэш (app.cache): LRU воркера перед общим хранилищем memory (нет общего), postgres или redis
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://redis:6379/0")
+CACHE_LOCAL_SIZE = int(os.getenv("CACHE_LOCAL_SIZE", 10_000))
+# Сколько локальная копия живёт без сверки с общим хранилищем (запаздывание инвалидации в других воркерах)
+CACHE_LOCAL_TTL = float(os.getenv("CACHE_LOCAL_TTL", 5))  # в секундах
+# Досрочное обновление (XFetch): больше - раньше и чаще
+CACHE_EARLY_BETA = float(os.getenv("CACHE_EARLY_BETA", 1))
+CACHE_MAINTENANCE_INTERVAL = float(os.getenv("CACHE_MAINTENANCE_INTERVAL", 60))  # в секундах
@@ -0,0 +1,11 @@
+"""
+Нагрузочные сценарии и бенчмарки API.
+
+    python -m app.seed --truncate --scale 0.1              # синтетические данные в базу из .env
+    python -m benchmarks run --target asgi --duration 30  # прогон сценариев, отчёт в JSON
+    python -m benchmarks compare old.json new.json        # сравнение двух отчётов
+"""
+import os
+
+# Прогон идёт с одного адреса и упёрся бы в лимиты входа и поиска (app.ratelimit) - измеряется само приложение
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
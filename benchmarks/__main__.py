@@ -0,0 +1,55 @@
+"""
+Запуск (данные загружаются заранее: python -m app.seed):
+    python -m benchmarks run [--target asgi|gunicorn|http://host:port] [--mix browse=60,search=20,...]
+                             [--concurrency 32 --duration 30 --warmup 5] [--out benchmarks/results/run.json]
+    python -m benchmarks compare old.json new.json
+"""
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+from benchmarks.report import compare_reports, format_report, write_report
+from benchmarks.scenarios import DEFAULT_MIX
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="прогнать сценарии и сохранить отчёт")
+    run_parser.add_argument("--target", default="asgi", help="asgi, gunicorn или URL запущенного сервера")
+    run_parser.add_argument("--workers", type=int, default=2, help="воркеров gunicorn для --target gunicorn")
+    run_parser.add_argument("--mix", default=DEFAULT_MIX)
+    run_parser.add_argument("--concurrency", type=int, default=32)
+    run_parser.add_argument("--duration", type=float, default=30)
+    run_parser.add_argument("--warmup", type=float, default=5)
+    run_parser.add_argument("--seed", type=int, default=42)
+    run_parser.add_argument("--buyers", type=int, default=1000,
+                            help="среди скольких покупателей из app.seed выбирать вход")
+    run_parser.add_argument("--out", type=Path, default=Path("benchmarks/results/latest.json"))
+
+    compare_parser = commands.add_parser("compare", help="сравнить два отчёта")
+    compare_parser.add_argument("old", type=Path)
+    compare_parser.add_argument("new", type=Path)
+
+    args = parser.parse_args()
+    if args.command == "run":
+        from benchmarks.runner import run
+
+        report = asyncio.run(run(args.target, args.mix, args.concurrency, args.duration, args.warmup, args.seed,
+                                 args.buyers, args.workers))
+        write_report(report, args.out)
+        print(format_report(report))
+        print(f"report written to {args.out}")
+    else:
+        old = json.loads(args.old.read_text(encoding="utf-8"))
+        new = json.loads(args.new.read_text(encoding="utf-8"))
+        print(compare_reports(old, new))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
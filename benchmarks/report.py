@@ -0,0 +1,98 @@
+"""
+Отчёт прогона: пропускная способность и p50/p95/p99 по маршрутам в JSON,
+который удобно сравнивать между коммитами (ключи отсортированы, числа округлены).
+"""
+import json
+import math
+from pathlib import Path
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """
+    Описание: Перцентиль методом ближайшего ранга по отсортированному списку.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies: list[float], statuses: dict[str, int], duration: float) -> dict:
+    """
+    Описание: Сводка по одному маршруту (или по всем сразу).
+    Аргументы:
+        latencies: задержки запросов в секундах
+        statuses: количество ответов по кодам
+        duration: длительность замера в секундах
+    Возвращает:
+        dict: requests, rps, ошибки (5xx и сетевые), перцентили в миллисекундах
+    """
+    values = sorted(latencies)
+    errors = sum(count for status, count in statuses.items() if status == "error" or status.startswith("5"))
+    return {
+        "requests": len(values),
+        "rps": round(len(values) / duration, 1) if duration else 0.0,
+        "errors": errors,
+        "statuses": dict(sorted(statuses.items())),
+        "p50_ms": round(percentile(values, 50) * 1000, 2),
+        "p95_ms": round(percentile(values, 95) * 1000, 2),
+        "p99_ms": round(percentile(values, 99) * 1000, 2),
+        "max_ms": round(values[-1] * 1000, 2) if values else 0.0,
+    }
+
+
+def build_report(meta: dict, latencies: dict[str, list[float]], statuses: dict[str, dict[str, int]],
+                 duration: float) -> dict:
+    """
+    Описание: Собирает отчёт прогона: метаданные, общая сводка и сводки по маршрутам.
+    """
+    all_latencies = [value for values in latencies.values() for value in values]
+    all_statuses: dict[str, int] = {}
+    for codes in statuses.values():
+        for status, count in codes.items():
+            all_statuses[status] = all_statuses.get(status, 0) + count
+    return {
+        "meta": meta,
+        "total": summarize(all_latencies, all_statuses, duration),
+        "routes": {route: summarize(latencies[route], statuses[route], duration) for route in sorted(latencies)},
+    }
+
+
+def write_report(report: dict, path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, ensure_ascii=False, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+
+
+def format_report(report: dict) -> str:
+    """
+    Описание: Текстовая таблица отчёта для консоли.
+    """
+    lines = [f"{'route':<42} {'req':>7} {'rps':>8} {'err':>5} {'p50':>8} {'p95':>8} {'p99':>8}"]
+    rows = list(report["routes"].items()) + [("TOTAL", report["total"])]
+    for route, s in rows:
+        lines.append(f"{route:<42} {s['requests']:>7} {s['rps']:>8.1f} {s['errors']:>5} "
+                     f"{s['p50_ms']:>8.2f} {s['p95_ms']:>8.2f} {s['p99_ms']:>8.2f}")
+    return "\n".join(lines)
+
+
+def compare_reports(old: dict, new: dict) -> str:
+    """
+    Описание: Сравнивает два отчёта по общим маршрутам: rps и перцентили, изменение в процентах.
+              Для задержек рост - это ухудшение, для rps - улучшение.
+    """
+    def delta(a: float, b: float) -> str:
+        return f"{(b - a) / a * 100:+7.1f}%" if a else "    n/a"
+
+    lines = [f"{'route':<42} {'rps':>18} {'p50 ms':>18} {'p95 ms':>18} {'p99 ms':>18}"]
+    routes = [r for r in old["routes"] if r in new["routes"]]
+    pairs = [(r, old["routes"][r], new["routes"][r]) for r in routes] + [("TOTAL", old["total"], new["total"])]
+    for route, a, b in pairs:
+        cells = [f"{b[key]:>9.1f} {delta(a[key], b[key])}" for key in ("rps", "p50_ms", "p95_ms", "p99_ms")]
+        lines.append(f"{route:<42} " + " ".join(cells))
+    only_old = sorted(set(old["routes"]) - set(new["routes"]))
+    only_new = sorted(set(new["routes"]) - set(old["routes"]))
+    if only_old:
+        lines.append("only in old: " + ", ".join(only_old))
+    if only_new:
+        lines.append("only in new: " + ", ".join(only_new))
+    return "\n".join(lines)
@@ -0,0 +1,183 @@
+"""
+Прогон сценариев против приложения: в процессе (httpx.ASGITransport, с lifespan приложения),
+по HTTP против уже запущенного сервера или против gunicorn, поднятого на время прогона.
+"""
+import asyncio
+import dataclasses
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+from app.seed import BUYER_EMAIL, SEED_PASSWORD
+from benchmarks.report import build_report
+from benchmarks.scenarios import SCENARIOS, Context, Recorder
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def parse_mix(mix: str) -> list[tuple[str, float]]:
+    """
+    Описание: Разбирает смесь сценариев "browse=60,search=20" в список (сценарий, вес).
+    Исключения:
+        ValueError: неизвестный сценарий или некорректный вес
+    """
+    weights = []
+    for part in mix.split(","):
+        name, _, weight = part.strip().partition("=")
+        if name not in SCENARIOS:
+            raise ValueError(f"Unknown scenario {name!r}, expected one of: {', '.join(SCENARIOS)}")
+        weights.append((name, float(weight or 1)))
+    if not weights or sum(w for _, w in weights) <= 0:
+        raise ValueError("Scenario mix is empty")
+    return weights
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _git_commit() -> str | None:
+    result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True)
+    return result.stdout.strip() or None
+
+
+@asynccontextmanager
+async def _asgi_client(concurrency: int):
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            yield client
+
+
+@asynccontextmanager
+async def _http_client(base_url: str, concurrency: int):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        yield client
+
+
+@asynccontextmanager
+async def _gunicorn_client(workers: int, concurrency: int):
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "app.main:app", "-k", "uvicorn.workers.UvicornWorker",
+         "-w", str(workers), "-b", f"127.0.0.1:{port}", "--log-level", "warning"],
+        cwd=BASE_DIR,
+    )
+    try:
+        async with _http_client(f"http://127.0.0.1:{port}", concurrency) as client:
+            deadline = time.monotonic() + 30
+            while True:
+                try:
+                    if (await client.get("/")).status_code == 200:
+                        break
+                except httpx.HTTPError:
+                    pass
+                if process.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("gunicorn did not start")
+                await asyncio.sleep(0.2)
+            yield client
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+async def _discover(client: httpx.AsyncClient) -> tuple[list[int], list[int]]:
+    """
+    Описание: Собирает ID категорий и товаров через само API, чтобы прогон
+              не зависел от прямого доступа к базе.
+    """
+    categories = (await client.get("/categories/")).json()
+    product_ids = []
+    for page in range(1, 11):
+        response = await client.get("/products/", params={"page": page, "page_size": 100})
+        items = response.json().get("items", [])
+        product_ids += [item["id"] for item in items]
+        if len(items) < 100:
+            break
+    if not categories or not product_ids:
+        raise RuntimeError("No catalog data, run `python -m app.seed` first")
+    return [category["id"] for category in categories], product_ids
+
+
+async def _login(client: httpx.AsyncClient, buyers: int, count: int) -> list[str]:
+    tokens = []
+    for i in range(min(count, buyers)):
+        response = await client.post("/users/token", data={"username": BUYER_EMAIL.format(i),
+                                                           "password": SEED_PASSWORD})
+        if response.status_code != 200:
+            raise RuntimeError(f"Login of {BUYER_EMAIL.format(i)} failed: {response.status_code}")
+        tokens.append(response.json()["access_token"])
+    return tokens
+
+
+async def run(target: str, mix: str, concurrency: int, duration: float, warmup: float, seed: int,
+              buyers: int, gunicorn_workers: int) -> dict:
+    """
+    Описание: Запускает concurrency виртуальных пользователей, каждый в цикле выбирает
+              сценарий по весам смеси. Первые warmup секунд не записываются.
+    Аргументы:
+        target: "asgi", "gunicorn" или базовый URL запущенного сервера
+        mix: смесь сценариев, например "browse=60,search=20"
+        concurrency: количество виртуальных пользователей
+        duration: длительность замера в секундах
+        warmup: длительность прогрева в секундах
+        seed: зерно генератора действий
+        buyers: среди скольких покупателей из app.seed выбирать вход
+        gunicorn_workers: число воркеров при target="gunicorn"
+    Возвращает:
+        dict: отчёт build_report
+    """
+    weights = parse_mix(mix)
+    names = [name for name, _ in weights]
+    scenario_weights = [weight for _, weight in weights]
+
+    if target == "asgi":
+        client_cm = _asgi_client(concurrency)
+    elif target == "gunicorn":
+        client_cm = _gunicorn_client(gunicorn_workers, concurrency)
+    else:
+        client_cm = _http_client(target, concurrency)
+
+    recorder = Recorder()
+    async with client_cm as client:
+        category_ids, product_ids = await _discover(client)
+        # У каждого виртуального пользователя своя корзина, иначе сценарии мешали бы друг другу
+        tokens = await _login(client, buyers, concurrency) if {"cart", "review"} & set(names) else []
+        base = Context(client=client, recorder=recorder, product_ids=product_ids, category_ids=category_ids,
+                       buyer_tokens=tokens, buyers=buyers)
+        stop_at = time.monotonic() + warmup + duration
+
+        async def virtual_user(index: int):
+            rng = random.Random(seed * 100_003 + index)
+            ctx = dataclasses.replace(base, buyer_tokens=[tokens[index % len(tokens)]]) if tokens else base
+            while time.monotonic() < stop_at:
+                name = rng.choices(names, scenario_weights)[0]
+                await SCENARIOS[name](ctx, rng)
+
+        users = [asyncio.create_task(virtual_user(i)) for i in range(concurrency)]
+        await asyncio.sleep(warmup)
+        recorder.enabled = True
+        measure_started = time.monotonic()
+        await asyncio.gather(*users)
+        measured = time.monotonic() - measure_started
+
+    meta = {
+        "target": target if target != "gunicorn" else f"gunicorn x{gunicorn_workers}",
+        "mix": mix, "concurrency": concurrency, "duration_s": round(measured, 2), "warmup_s": warmup,
+        "seed": seed, "commit": _git_commit(), "python": platform.python_version(),
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+    return build_report(meta, recorder.latencies, recorder.statuses, measured)
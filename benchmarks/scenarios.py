@@ -0,0 +1,115 @@
+"""
+Сценарии нагрузки. Один вызов сценария - одно действие пользователя из нескольких запросов.
+Каждый запрос записывается под шаблоном маршрута ("GET /products/{product_id}"),
+чтобы отчёты разных прогонов сравнивались по маршрутам, а не по конкретным URL.
+"""
+import random
+import time
+from dataclasses import dataclass, field
+
+import httpx
+
+from app.seed import BUYER_EMAIL, REVIEW_PHRASES, SEARCH_TERMS, SEED_PASSWORD
+
+
+@dataclass
+class Recorder:
+    """Сырые замеры: задержки и коды ответов по шаблонам маршрутов."""
+    latencies: dict[str, list[float]] = field(default_factory=dict)
+    statuses: dict[str, dict[str, int]] = field(default_factory=dict)
+    enabled: bool = False
+
+    def add(self, route: str, status: str, elapsed: float) -> None:
+        if not self.enabled:
+            return
+        self.latencies.setdefault(route, []).append(elapsed)
+        codes = self.statuses.setdefault(route, {})
+        codes[status] = codes.get(status, 0) + 1
+
+
+@dataclass
+class Context:
+    """Общие для виртуальных пользователей данные прогона."""
+    client: httpx.AsyncClient
+    recorder: Recorder
+    product_ids: list[int]
+    category_ids: list[int]
+    buyer_tokens: list[str]
+    buyers: int
+
+    async def request(self, method: str, route: str, url: str, **kwargs) -> httpx.Response | None:
+        """
+        Описание: Выполняет запрос и записывает задержку под шаблоном маршрута route.
+                  Сетевые ошибки записываются со статусом "error" и не прерывают прогон.
+        """
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.recorder.add(route, "error", time.perf_counter() - started)
+            return None
+        self.recorder.add(route, str(response.status_code), time.perf_counter() - started)
+        return response
+
+    def auth(self, rng: random.Random) -> dict[str, str]:
+        return {"Authorization": f"Bearer {rng.choice(self.buyer_tokens)}"}
+
+
+async def browse(ctx: Context, rng: random.Random) -> None:
+    """Анонимный просмотр: категории, страница каталога, карточка товара и его отзывы."""
+    await ctx.request("GET", "GET /categories/", "/categories/")
+    category_id = rng.choice(ctx.category_ids)
+    await ctx.request("GET", "GET /products/?category_id", "/products/",
+                      params={"category_id": category_id, "page": rng.randint(1, 5), "page_size": 20})
+    await ctx.request("GET", "GET /products/category/{category_id}", f"/products/category/{category_id}",
+                      params={"include_subcategories": "true", "page_size": 20})
+    product_id = rng.choice(ctx.product_ids)
+    await ctx.request("GET", "GET /products/{product_id}", f"/products/{product_id}")
+    await ctx.request("GET", "GET /reviews/products/{product_id}", f"/reviews/products/{product_id}")
+
+
+async def search(ctx: Context, rng: random.Random) -> None:
+    """Полнотекстовый поиск по одному или двум словам, иногда с фильтром цены."""
+    query = " ".join(rng.sample(SEARCH_TERMS, rng.choice((1, 1, 2))))
+    params = {"search": query, "page_size": 20}
+    if rng.random() < 0.3:
+        params["max_price"] = rng.choice((1000, 5000, 20000))
+    await ctx.request("GET", "GET /products/?search", "/products/", params=params)
+
+
+async def cart_churn(ctx: Context, rng: random.Random) -> None:
+    """Покупатель кладёт товар в корзину, меняет количество, смотрит корзину и удаляет товар."""
+    headers = ctx.auth(rng)
+    product_id = rng.choice(ctx.product_ids)
+    await ctx.request("POST", "POST /cart/items", "/cart/items", headers=headers,
+                      json={"product_id": product_id, "quantity": 1})
+    await ctx.request("PUT", "PUT /cart/items/{product_id}", f"/cart/items/{product_id}", headers=headers,
+                      json={"quantity": 2})
+    await ctx.request("GET", "GET /cart/", "/cart/", headers=headers)
+    await ctx.request("DELETE", "DELETE /cart/items/{product_id}", f"/cart/items/{product_id}", headers=headers)
+
+
+async def login_storm(ctx: Context, rng: random.Random) -> None:
+    """Вход случайного покупателя; каждая десятая попытка - с неверным паролем."""
+    password = SEED_PASSWORD if rng.random() > 0.1 else "wrong-password"
+    await ctx.request("POST", "POST /users/token", "/users/token",
+                      data={"username": BUYER_EMAIL.format(rng.randrange(ctx.buyers)), "password": password})
+
+
+async def review_burst(ctx: Context, rng: random.Random) -> None:
+    """Отзыв на случайный товар (повторный отзыв того же покупателя даёт ожидаемый 400)."""
+    await ctx.request("POST", "POST /reviews/", "/reviews/", headers=ctx.auth(rng),
+                      json={"product_id": rng.choice(ctx.product_ids), "comment": rng.choice(REVIEW_PHRASES),
+                            "grade": rng.randint(1, 5)})
+
+
+SCENARIOS = {
+    "browse": browse,
+    "search": search,
+    "cart": cart_churn,
+    "login": login_storm,
+    "review": review_burst,
+}
+
+# Смесь по умолчанию: в основном чтение каталога
+DEFAULT_MIX = "browse=60,search=20,cart=10,login=5,review=5"
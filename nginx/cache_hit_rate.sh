@@ -0,0 +1,22 @@
+#!/bin/sh
+# Считает hit rate микрокэша по access-логу nginx (формат catalog_cache).
+# Использование: sh nginx/cache_hit_rate.sh [compose-файлы...]
+set -e
+
+if [ "$#" -eq 0 ]; then
+    set -- -f docker-compose.prod.yml -f docker-compose.loadtest.yml
+fi
+
+docker compose "$@" logs --no-log-prefix nginx | awk '
+    match($0, /cache=[A-Z-]+/) {
+        status = substr($0, RSTART + 6, RLENGTH - 6)
+        total++
+        count[status]++
+    }
+    END {
+        if (total == 0) { print "no catalog requests in log"; exit 1 }
+        for (s in count) printf "%-12s %8d  %6.2f%%\n", s, count[s], 100 * count[s] / total
+        hits = count["HIT"] + count["STALE"] + count["UPDATING"] + count["REVALIDATED"]
+        cacheable = total - count["BYPASS"]
+        if (cacheable > 0) printf "hit rate (anonymous): %.2f%%\n", 100 * hits / cacheable
+    }'
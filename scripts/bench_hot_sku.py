@@ -0,0 +1,162 @@
+"""
+Бенчмарк конкуренции за один "горячий" товар.
+
+Создаёт временный товар с остатком --stock и запускает --workers параллельных покупателей,
+каждый в своём соединении списывает по --quantity единиц, пока товар не кончится.
+Сравниваются стратегии списания:
+    atomic      - условный UPDATE ... WHERE stock >= :q RETURNING stock (app.inventory.decrement_stock)
+    for-update  - SELECT ... FOR UPDATE, проверка в Python, затем UPDATE
+    naive       - SELECT без блокировки, затем UPDATE SET stock = <прочитанное - q> (теряет обновления)
+Для каждой выводится пропускная способность, p50/p95/p99 задержки одной покупки
+и проверка на перепродажу: продано единиц должно быть ровно --stock.
+
+Использование (база из .env, миграции применены):
+    python scripts/bench_hot_sku.py --workers 32 --stock 1000
+    python scripts/bench_hot_sku.py --strategy atomic --strategy naive
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import delete, insert, select, update  # noqa: E402
+
+from app.db.database import async_session_maker, dispose_engine, init_engine  # noqa: E402
+from app.inventory import decrement_stock  # noqa: E402
+from app.models import Category as CategoryModel, Product as ProductModel, User as UserModel  # noqa: E402
+
+STRATEGIES = ("atomic", "for-update", "naive")
+
+
+async def _buy_atomic(product_id: int, quantity: int) -> bool:
+    async with async_session_maker() as session:
+        stock = await decrement_stock(session, product_id, quantity)
+        await session.commit()
+        return stock is not None
+
+
+async def _buy_for_update(product_id: int, quantity: int) -> bool:
+    async with async_session_maker() as session:
+        stock = await session.scalar(select(ProductModel.stock).where(ProductModel.id == product_id).with_for_update())
+        if stock < quantity:
+            await session.rollback()
+            return False
+        await session.execute(update(ProductModel).where(ProductModel.id == product_id)
+                              .values(stock=stock - quantity))
+        await session.commit()
+        return True
+
+
+async def _buy_naive(product_id: int, quantity: int) -> bool:
+    async with async_session_maker() as session:
+        stock = await session.scalar(select(ProductModel.stock).where(ProductModel.id == product_id))
+        if stock < quantity:
+            await session.rollback()
+            return False
+        await session.execute(update(ProductModel).where(ProductModel.id == product_id)
+                              .values(stock=stock - quantity))
+        await session.commit()
+        return True
+
+
+BUYERS = {"atomic": _buy_atomic, "for-update": _buy_for_update, "naive": _buy_naive}
+
+
+async def _create_product(stock: int) -> int:
+    async with async_session_maker() as session:
+        seller_id = await session.scalar(select(UserModel.id).order_by(UserModel.id).limit(1))
+        category_id = await session.scalar(select(CategoryModel.id).where(CategoryModel.is_active == True)
+                                           .order_by(CategoryModel.id).limit(1))
+        if seller_id is None or category_id is None:
+            raise SystemExit("Нужен хотя бы один пользователь и одна активная категория")
+        product_id = await session.scalar(insert(ProductModel).values(
+            name="bench hot sku", price=1, stock=stock, category_id=category_id, seller_id=seller_id,
+            is_active=True).returning(ProductModel.id))
+        await session.commit()
+        return product_id
+
+
+async def _drop_product(product_id: int) -> None:
+    async with async_session_maker() as session:
+        await session.execute(delete(ProductModel).where(ProductModel.id == product_id))
+        await session.commit()
+
+
+async def run(strategy: str, workers: int, stock: int, quantity: int) -> dict:
+    """
+    Описание: Один прогон стратегии на новом товаре.
+    Возвращает:
+        dict: метрики прогона
+    """
+    product_id = await _create_product(stock)
+    buy = BUYERS[strategy]
+    latencies, sold, errors = [], 0, 0
+
+    async def buyer():
+        nonlocal sold, errors
+        while True:
+            started = time.perf_counter()
+            try:
+                ok = await buy(product_id, quantity)
+            except Exception:  # naive-стратегия упирается в CHECK stock >= 0 - считаем как ошибку
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+            if not ok:
+                return
+            sold += quantity
+
+    started = time.perf_counter()
+    await asyncio.gather(*(buyer() for _ in range(workers)))
+    elapsed = time.perf_counter() - started
+
+    async with async_session_maker() as session:
+        final_stock = await session.scalar(select(ProductModel.stock).where(ProductModel.id == product_id))
+    await _drop_product(product_id)
+
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0.0] * 99
+    return {
+        "strategy": strategy, "elapsed": elapsed, "ops_per_s": len(latencies) / elapsed,
+        "p50_ms": quantiles[49] * 1000, "p95_ms": quantiles[94] * 1000, "p99_ms": quantiles[98] * 1000,
+        "sold": sold, "final_stock": final_stock, "errors": errors,
+        "oversold": sold + final_stock != stock,
+    }
+
+
+async def main_async(args) -> int:
+    init_engine()
+    failed = False
+    try:
+        print(f"workers={args.workers} stock={args.stock} quantity={args.quantity}")
+        for strategy in args.strategy or STRATEGIES:
+            r = await run(strategy, args.workers, args.stock, args.quantity)
+            print(f"{r['strategy']:>10}: {r['ops_per_s']:8.0f} ops/s  p50 {r['p50_ms']:6.2f} ms  "
+                  f"p95 {r['p95_ms']:6.2f} ms  p99 {r['p99_ms']:6.2f} ms  "
+                  f"sold {r['sold']} final {r['final_stock']} errors {r['errors']}"
+                  f"{'  OVERSOLD/LOST UPDATES' if r['oversold'] else ''}")
+            failed |= r["oversold"] and r["strategy"] != "naive"
+    finally:
+        await dispose_engine()
+    return 1 if failed else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--stock", type=int, default=1000)
+    parser.add_argument("--quantity", type=int, default=1)
+    parser.add_argument("--strategy", action="append", choices=STRATEGIES)
+    args = parser.parse_args()
+    # У каждого покупателя своё соединение: очередь к пулу не должна подменять очередь к строке
+    os.environ["DB_POOL_SIZE"] = str(args.workers)
+    os.environ["DB_MAX_OVERFLOW"] = "0"
+    return asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
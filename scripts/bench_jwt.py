@@ -0,0 +1,92 @@
+"""
+Бенчмарк проверки JWT: сколько токенов в секунду проверяет один процесс.
+
+Для каждого алгоритма (HS256 на общем секрете, EdDSA, ES256 на временных ключах) измеряются:
+    sign        - app.auth.keys.encode_token
+    jwt.decode  - прежний путь get_current_user: jwt.decode с разбором опций на каждый вызов
+    verify      - decode_token без кэша: заранее разобранный ключ по kid и общий экземпляр PyJWT
+    cached      - decode_token для --tokens "горячих" токенов, повторно проверенных через LRU
+База не нужна.
+
+Использование:
+    python scripts/bench_jwt.py
+    python scripts/bench_jwt.py --iterations 20000 --tokens 100
+"""
+import argparse
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import jwt  # noqa: E402
+from cryptography.hazmat.primitives import serialization  # noqa: E402
+
+from app.auth import keys  # noqa: E402
+
+ALGORITHMS = ("HS256", "EdDSA", "ES256")
+BENCH_SECRET = "bench-secret-" + "0" * 32
+
+
+def install_key_set(algorithm: str, directory: Path) -> None:
+    """
+    Описание: Подменяет набор ключей процесса: HS256 - общий секрет, иначе новый ключ в directory.
+    """
+    if algorithm == "HS256":
+        keys._key_set = keys.KeySet({None: keys.VerificationKey("HS256", BENCH_SECRET)}, None,
+                                    BENCH_SECRET, "HS256")
+    else:
+        kid = f"bench-{algorithm.lower()}"
+        (directory / f"{kid}.pem").write_bytes(keys.generate_key(algorithm).private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()))
+        keys._key_set = keys.load_key_set(str(directory), kid)
+    keys._verified.clear()
+    keys._keys_by_header.clear()
+
+
+def rate(func, iterations: int) -> float:
+    started = time.perf_counter()
+    for i in range(iterations):
+        func(i)
+    return iterations / (time.perf_counter() - started)
+
+
+def bench(algorithm: str, iterations: int, hot_tokens: int) -> dict[str, float]:
+    expire = datetime.now(timezone.utc) + timedelta(minutes=15)
+    payloads = [{"sub": f"buyer-{i}@example.com", "role": "buyer", "id": i, "exp": expire}
+                for i in range(iterations)]
+    sign = rate(lambda i: keys.encode_token(payloads[i]), iterations)
+
+    tokens = [keys.encode_token(payload) for payload in payloads]
+    key_set = keys.get_key_set()
+    kid = key_set.signing_kid
+    legacy_key = key_set.verification[kid].key
+    legacy = rate(lambda i: jwt.decode(tokens[i], legacy_key, algorithms=[algorithm]), iterations)
+    verify = rate(lambda i: keys.decode_token(tokens[i], use_cache=False), iterations)
+
+    hot = tokens[:hot_tokens]
+    for token in hot:
+        keys.decode_token(token)
+    cached = rate(lambda i: keys.decode_token(hot[i % len(hot)]), iterations)
+    return {"sign": sign, "jwt.decode": legacy, "verify": verify, "cached": cached}
+
+
+def main(args: argparse.Namespace) -> int:
+    print(f"{'algorithm':10s} {'sign/s':>12s} {'jwt.decode/s':>14s} {'verify/s':>12s} {'cached/s':>12s}")
+    with tempfile.TemporaryDirectory() as directory:
+        for algorithm in args.algorithm or ALGORITHMS:
+            install_key_set(algorithm, Path(directory))
+            result = bench(algorithm, args.iterations, args.tokens)
+            print(f"{algorithm:10s} {result['sign']:12,.0f} {result['jwt.decode']:14,.0f} "
+                  f"{result['verify']:12,.0f} {result['cached']:12,.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--algorithm", action="append", choices=ALGORITHMS, help="можно указать несколько раз")
+    parser.add_argument("--iterations", type=int, default=10000, help="токенов на каждое измерение")
+    parser.add_argument("--tokens", type=int, default=100, help="горячих токенов для кэша")
+    sys.exit(main(parser.parse_args()))
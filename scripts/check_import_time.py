@@ -0,0 +1,71 @@
+"""
+Проверка времени импорта приложения (регрессия холодного старта воркеров и тестов).
+
+Запускает `python -X importtime -c "import app.main"` в отдельном процессе несколько раз,
+берёт минимальное кумулятивное время импорта и сравнивает его с бюджетом. Тяжёлые библиотеки,
+нужные только фоновым пересчётам (--forbid, по умолчанию numpy и scipy), импортироваться не должны вовсе.
+
+Использование:
+    python scripts/check_import_time.py --budget-ms 1200
+    python scripts/check_import_time.py --module app.routers.products --top 20
+"""
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def measure(module: str) -> dict[str, tuple[int, int]]:
+    """
+    Описание: Один прогон импорта модуля в чистом интерпретаторе.
+    Возвращает:
+        dict[str, tuple[int, int]]: модуль -> (self, cumulative) в микросекундах
+    """
+    env = {**os.environ, "PYTHONPATH": str(BASE_DIR)}
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=BASE_DIR, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise SystemExit(f"import {module} failed:\n{result.stderr[-2000:]}")
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_TIME_BUDGET_MS", 1200)))
+    parser.add_argument("--forbid", default="numpy,scipy", help="модули, которых не должно быть в импорте")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(args.runs)]
+    best = min(runs, key=lambda timings: timings[args.module][1])
+    total_ms = best[args.module][1] / 1000
+
+    print(f"import {args.module}: {total_ms:.1f} ms (best of {args.runs}), budget {args.budget_ms:.0f} ms")
+    print("heaviest modules by self time:")
+    for name, (self_us, cumulative_us) in sorted(best.items(), key=lambda kv: kv[1][0], reverse=True)[:args.top]:
+        print(f"  {self_us / 1000:8.1f} ms self {cumulative_us / 1000:8.1f} ms cumulative  {name}")
+
+    failed = False
+    forbidden = sorted(name for name in best if name.split(".")[0] in args.forbid.split(",") and "." not in name)
+    if forbidden:
+        print(f"FAIL: {args.module} imports {', '.join(forbidden)}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print(f"FAIL: import time exceeds budget by {total_ms - args.budget_ms:.1f} ms")
+        failed = True
+    return int(failed)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+"""
+Проверка планов запросов каталога на засеянной базе (регрессия индексов products и product_listing).
+
+Для каждой комбинации фильтров GET /products/ строит те же запросы, что и get_all_products
+(COUNT для total и первая страница, отсортированная по id), для обоих источников - products
+и product_listing - и прогоняет EXPLAIN (FORMAT JSON). Если хоть один план читает products
+или product_listing последовательным сканированием, скрипт завершается с кодом 1.
+
+Значения фильтров берутся из самой базы: самая большая корневая категория, самая мелкая
+непустая категория, продавец с наибольшим числом товаров и узкий ценовой диапазон.
+Поиск (search) не проверяется: условие word_similarity(...) > 0.3 по определению не индексируется.
+stock в products намеренно не индексируется, чтобы списания остатка оставались HOT-обновлениями,
+поэтому неселективные комбинации с in_stock ("category + in stock" по корневой категории) проверяются только
+для product_listing, где остаток лежит в покрывающем индексе по категории.
+
+Использование (база из .env, данные загружены через python -m app.seed):
+    python scripts/check_query_plans.py
+    python scripts/check_query_plans.py --source listing --analyze --verbose
+"""
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import func, select, text  # noqa: E402
+from sqlalchemy.dialects import postgresql  # noqa: E402
+
+from app.db.database import async_session_maker, dispose_engine, init_engine  # noqa: E402
+from app.models import Category as CategoryModel, CategoryClosure, Product as ProductModel  # noqa: E402
+from app.models import ProductListing  # noqa: E402
+from app.routers.products import PRODUCT_COLUMNS, PRODUCT_LISTING_COLUMNS, catalog_filters  # noqa: E402
+
+SOURCES = {"products": (ProductModel, PRODUCT_COLUMNS), "listing": (ProductListing, PRODUCT_LISTING_COLUMNS)}
+CHECKED_TABLES = {"products", "product_listing"}
+PAGE_SIZE = 20
+# Комбинации, которые в products без индекса по stock читают десятки процентов кучи
+LISTING_ONLY = {"category + in stock"}
+
+
+async def pick_filter_values(session) -> dict:
+    """
+    Описание: Выбирает из базы значения фильтров, на которых проверяются планы.
+    Исключения:
+        SystemExit: в базе нет активных товаров
+    """
+    per_category = (select(ProductModel.category_id, func.count().label("n"))
+                    .where(ProductModel.is_active).group_by(ProductModel.category_id).subquery())
+    big_category = await session.scalar(
+        select(CategoryClosure.ancestor_id)
+        .join(per_category, per_category.c.category_id == CategoryClosure.descendant_id)
+        .join(CategoryModel, CategoryModel.id == CategoryClosure.ancestor_id)
+        .where(CategoryModel.parent_id.is_(None))
+        .group_by(CategoryClosure.ancestor_id).order_by(func.sum(per_category.c.n).desc()).limit(1)
+    )
+    small_category = await session.scalar(select(per_category.c.category_id).order_by(per_category.c.n).limit(1))
+    seller_id = await session.scalar(select(ProductModel.seller_id).where(ProductModel.is_active)
+                                     .group_by(ProductModel.seller_id).order_by(func.count().desc()).limit(1))
+    if seller_id is None:
+        raise SystemExit("No active products, run `python -m app.seed` first")
+    low, high = (await session.execute(select(
+        func.percentile_cont(0.10).within_group(ProductModel.price),
+        func.percentile_cont(0.12).within_group(ProductModel.price),
+    ).where(ProductModel.is_active))).one()
+    return {"big_category": big_category, "small_category": small_category, "seller_id": seller_id,
+            "min_price": round(low, 2), "max_price": round(high, 2)}
+
+
+def filter_combinations(values: dict) -> dict[str, dict]:
+    """
+    Описание: Комбинации фильтров GET /products/, под которые заведены индексы.
+    Возвращает:
+        dict[str, dict]: название -> аргументы catalog_filters
+    """
+    big, small, seller = values["big_category"], values["small_category"], values["seller_id"]
+    price = {"min_price": values["min_price"], "max_price": values["max_price"]}
+    return {
+        "no filters": {},
+        "category (root)": {"category_id": big},
+        "category (leaf)": {"category_id": small},
+        "seller": {"seller_id": seller},
+        "price range": price,
+        "min price (wide)": {"min_price": values["max_price"]},
+        "category + price": {"category_id": big, **price},
+        "category + in stock": {"category_id": big, "in_stock": True},  # только listing, см. LISTING_ONLY
+        "category + price + in stock": {"category_id": big, **price, "in_stock": True},
+        "seller + in stock": {"seller_id": seller, "in_stock": True},
+        "seller + price": {"seller_id": seller, **price},
+        "category + seller": {"category_id": big, "seller_id": seller},
+    }
+
+
+def catalog_statements(source, columns, kwargs: dict) -> dict:
+    """
+    Описание: Запросы get_all_products без поиска: total и первая страница.
+    """
+    filters = catalog_filters(source, **kwargs)
+    return {
+        "count": select(func.count()).select_from(source).where(*filters),
+        "page": select(*columns).where(*filters).order_by(source.id).limit(PAGE_SIZE),
+    }
+
+
+def scan_nodes(plan: dict) -> list[dict]:
+    """
+    Описание: Все узлы плана, читающие проверяемые таблицы, в порядке обхода.
+    """
+    nodes = [plan] if plan.get("Relation Name") in CHECKED_TABLES else []
+    for child in plan.get("Plans", []):
+        nodes += scan_nodes(child)
+    return nodes
+
+
+def describe(node: dict) -> str:
+    name = node["Node Type"]
+    if node.get("Parallel Aware"):
+        name = f"Parallel {name}"
+    return f"{name} ({node['Index Name']})" if "Index Name" in node else f"{name} on {node['Relation Name']}"
+
+
+async def explain(session, statement, analyze: bool) -> dict:
+    sql = str(statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+    options = "ANALYZE, BUFFERS, FORMAT JSON" if analyze else "FORMAT JSON"
+    result = await session.scalar(text(f"EXPLAIN ({options}) {sql}"))
+    return (json.loads(result) if isinstance(result, str) else result)[0]
+
+
+async def main(args: argparse.Namespace) -> int:
+    init_engine()
+    failures = 0
+    try:
+        async with async_session_maker() as session:
+            values = await pick_filter_values(session)
+            print("filter values: " + ", ".join(f"{key}={value}" for key, value in values.items()))
+            sources = SOURCES if args.source == "both" else {args.source: SOURCES[args.source]}
+            for source_name, (source, columns) in sources.items():
+                print(f"\n[{source_name}]")
+                for combo, kwargs in filter_combinations(values).items():
+                    if combo in LISTING_ONLY and source is not ProductListing:
+                        continue
+                    for kind, statement in catalog_statements(source, columns, kwargs).items():
+                        result = await explain(session, statement, args.analyze)
+                        nodes = scan_nodes(result["Plan"])
+                        seq_scans = [node for node in nodes if node["Node Type"] == "Seq Scan"]
+                        failures += bool(seq_scans)
+                        timing = f" {result['Execution Time']:9.2f} ms" if args.analyze else ""
+                        print(f"  {'FAIL' if seq_scans else 'ok  '} {combo:28s} {kind:5s}{timing}  "
+                              + ", ".join(describe(node) for node in nodes))
+                        if args.verbose:
+                            print(json.dumps(result["Plan"], ensure_ascii=False, indent=2))
+    finally:
+        await dispose_engine()
+
+    if failures:
+        print(f"\nFAIL: {failures} plan(s) use a sequential scan")
+        return 1
+    print("\nall plans use indexes")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", choices=("both", *SOURCES), default="both")
+    parser.add_argument("--analyze", action="store_true", help="EXPLAIN ANALYZE: выполнить запросы и показать время")
+    parser.add_argument("--verbose", action="store_true", help="печатать планы целиком")
+    sys.exit(asyncio.run(main(parser.parse_args())))
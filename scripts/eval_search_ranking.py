@@ -0,0 +1,129 @@
+"""
+Офлайн-оценка ранжирования поиска по журналу запросов.
+
+Журнал - NDJSON: по строке на поиск, {"query": "...", "product_id": 123}, где product_id - товар,
+который пользователь в итоге выбрал (клик или покупка). Для каждого набора весов (--weights, формат
+SEARCH_RANK_WEIGHTS; "legacy" - прежний порядок по рангу FTS, затем по схожести триграмм) каждый запрос
+выполняется так же, как первая страница GET /products?search=..., и считаются:
+    MRR@k   - средняя обратная позиция выбранного товара (0, если его нет в первых k)
+    hit@k   - доля запросов, где выбранный товар попал в первые k
+    nDCG@k  - с одним релевантным товаром: 1 / log2(позиция + 1)
+    p50/p95 - время запроса в миллисекундах
+Популярность берётся из product_listing.popularity как есть - журнал должен быть снят после пересчёта,
+иначе продажи из самого журнала подсказывают ответ.
+
+Без журнала --sample-orders N строит грубое приближение из последних заказов: запрос - название
+купленного товара, выбранный товар - он сам.
+
+Использование (база из .env):
+    python scripts/eval_search_ranking.py --log search.ndjson --weights legacy --weights text=1,popularity=0.3,stock=0.1
+    python scripts/eval_search_ranking.py --sample-orders 300 --k 20
+"""
+import argparse
+import asyncio
+import json
+import math
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import desc, select, text  # noqa: E402
+
+from app.db.database import async_session_maker, dispose_engine, init_engine  # noqa: E402
+from app.models import ProductListing  # noqa: E402
+from app.ranking import SEARCH_WEIGHTS, SearchWeights, search_score  # noqa: E402
+from app.routers.products import catalog_filters, catalog_search  # noqa: E402
+from app.utils import SEARCH_RANK_WEIGHTS  # noqa: E402
+
+LEGACY = "legacy"
+_SAMPLE_SQL = text("""
+    SELECT p.name, oi.product_id
+    FROM orders o
+    JOIN order_items oi ON oi.order_id = o.id
+    JOIN products p ON p.id = oi.product_id
+    WHERE o.status <> 'cancelled'
+    ORDER BY o.id DESC
+    LIMIT :limit
+""")
+
+
+def read_log(path: str) -> list[tuple[str, int]]:
+    entries = []
+    with open(path, encoding="utf-8") as log:
+        for line in log:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record.get("query", "").strip() and record.get("product_id") is not None:
+                entries.append((record["query"].strip(), int(record["product_id"])))
+    return entries
+
+
+def search_statement(query: str, weights: SearchWeights | None, k: int):
+    """
+    Описание: Первая страница поиска, как в get_all_products; weights=None - прежний порядок.
+    """
+    search_condition, rank_col, word_sim_col = catalog_search(ProductListing, query)
+    statement = select(ProductListing.id).where(*catalog_filters(ProductListing), search_condition)
+    if weights is None:
+        statement = statement.order_by(desc(rank_col), desc(word_sim_col), ProductListing.id)
+    else:
+        statement = statement.order_by(desc(search_score(ProductListing, rank_col, word_sim_col, weights)),
+                                       ProductListing.id)
+    return statement.limit(k)
+
+
+async def evaluate(entries: list[tuple[str, int]], weights: SearchWeights | None, k: int) -> dict[str, float]:
+    reciprocal, hits, gains, latencies = [], 0, [], []
+    async with async_session_maker() as db:
+        for query, product_id in entries:
+            started = time.perf_counter()
+            ids = (await db.scalars(search_statement(query, weights, k))).all()
+            latencies.append((time.perf_counter() - started) * 1000)
+            position = ids.index(product_id) + 1 if product_id in ids else None
+            reciprocal.append(1 / position if position else 0.0)
+            gains.append(1 / math.log2(position + 1) if position else 0.0)
+            hits += position is not None
+    latencies.sort()
+    return {"mrr": statistics.fmean(reciprocal), "hit": hits / len(entries), "ndcg": statistics.fmean(gains),
+            "p50": latencies[len(latencies) // 2], "p95": latencies[int(len(latencies) * 0.95)]}
+
+
+async def run(args: argparse.Namespace) -> int:
+    init_engine()
+    try:
+        if args.log:
+            entries = read_log(args.log)
+        else:
+            async with async_session_maker() as db:
+                entries = [tuple(row) for row in (await db.execute(_SAMPLE_SQL, {"limit": args.sample_orders}))]
+        if not entries:
+            print("no queries with a chosen product in the log")
+            return 1
+        configs = args.weights or [LEGACY, SEARCH_RANK_WEIGHTS]
+        # Прогрев: первый запрос платит за холодный кэш страниц
+        await evaluate(entries[:10], SEARCH_WEIGHTS, args.k)
+
+        print(f"{len(entries)} queries, k={args.k}")
+        print(f"{'weights':40s} {'MRR':>7s} {'hit':>7s} {'nDCG':>7s} {'p50 ms':>8s} {'p95 ms':>8s}")
+        for config in configs:
+            result = await evaluate(entries, None if config == LEGACY else SearchWeights.parse(config), args.k)
+            print(f"{config:40s} {result['mrr']:7.3f} {result['hit']:7.3f} {result['ndcg']:7.3f} "
+                  f"{result['p50']:8.1f} {result['p95']:8.1f}")
+    finally:
+        await dispose_engine()
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--log", help="журнал запросов NDJSON")
+    source.add_argument("--sample-orders", type=int, help="построить журнал из позиций последних заказов")
+    parser.add_argument("--weights", action="append",
+                        help=f'веса "text=..,popularity=..,stock=.." или {LEGACY}; можно указать несколько раз')
+    parser.add_argument("--k", type=int, default=20, help="глубина выдачи (размер первой страницы)")
+    sys.exit(asyncio.run(run(parser.parse_args())))